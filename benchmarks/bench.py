@@ -0,0 +1,272 @@
+"""性能基准测试
+
+用合成的固件镜像（64 KB 到 512 MB，以及地址相距很远的稀疏布局）测量各阶段的耗时、吞吐量和内存峰值:
+    load          GUI 加载池的加载任务（loadpool.LoadJob：读取/映射文件并计算 CRC32、MD5，不使用校验和缓存）
+    merge         merge_layout（含向量表修复）
+    fill          遍历合并结果的全部数据块（生成段之间的填充）
+    checksum.*    各校验算法
+    format_hex    HexViewer.format_hex 使用的十六进制格式化（hexdump.format_hex）
+    vectors       向量表解析
+    save_bin      save_file 保存为 BIN
+    save_ihex     save_file 保存为 Intel HEX
+    load_ihex     加载 Intel HEX
+每个阶段先自动确定重复次数（单次很快的阶段循环多次），取多轮中最快的一轮；
+内存峰值为另外单独执行一次时 tracemalloc 记录的 Python 分配峰值（内存映射的文件不计入）。
+
+示例:
+    python benchmarks/bench.py --quick --output results.json
+    python benchmarks/bench.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench.py --baseline benchmarks/baseline.json --threshold 0.25
+
+指定 --baseline 时与基线比较，任一阶段耗时或内存峰值超过基线的 (1 + threshold) 倍时返回 1。
+基线与机器相关，应在同一台机器（或同一种 CI 环境）上生成。
+"""
+import os
+import sys
+import json
+import time
+import random
+import struct
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binmerge import checksum, core, hexdump, loadpool, vectors  # noqa: E402
+from binmerge.layout import Layout, Region  # noqa: E402
+
+SIZES = ('64K', '1M', '16M', '128M', '512M')
+QUICK_SIZES = ('64K', '1M', '16M')
+# 文本输出（十六进制格式化、Intel HEX）只测量不超过此大小的数据，更大的镜像生成的文本过大
+TEXT_LIMIT = 64 * 1024 * 1024
+# 稀疏布局中外部 Flash 区域的地址
+SPARSE_EXT_START = 0x90000000
+
+BOOT_START = 0x08000000
+BOOT_REGION_SIZE = 0x10000
+APP_START = BOOT_START + BOOT_REGION_SIZE
+CHECKSUMS = ('crc32', 'crc32-mpeg2', 'md5', 'sha256')
+
+# 每个阶段每轮至少运行的时间（秒）
+MIN_ROUND_TIME = 0.2
+# 内存峰值低于此值时不做回归比较（避免小数值的波动）
+MIN_COMPARED_PEAK = 1024 * 1024
+
+
+def parse_size(text):
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1:] in units:
+        return int(text[:-1]) * units[text[-1]]
+    return int(text)
+
+
+def synthetic_firmware(path, size, link_address, seed=0):
+    """生成固件样式的 BIN 文件：有效的向量表、约 70% 随机“代码”、其余为 0xFF，分块写入"""
+    rng = random.Random(seed)
+    table = [0x20020000] + [link_address + 0x201 + 4 * i for i in range(63)]
+    header = struct.pack(f'<{len(table)}I', *table)[:size]
+    code = max(0, size * 7 // 10 - len(header))
+    with open(path, 'wb') as f:
+        f.write(header)
+        written = len(header)
+        while written < len(header) + code:
+            n = min(16 * 1024 * 1024, len(header) + code - written)
+            f.write(rng.randbytes(n))
+            written += n
+        while written < size:
+            n = min(16 * 1024 * 1024, size - written)
+            f.write(b'\xFF' * n)
+            written += n
+
+
+class Bench:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, case, stage, nbytes, fn, setup=None):
+        """测量 fn()，setup() 在每次调用前执行且不计时"""
+        def call():
+            if setup:
+                setup()
+            started = time.perf_counter()
+            fn()
+            return time.perf_counter() - started
+
+        # 确定每轮的调用次数
+        number = 1
+        while True:
+            elapsed = sum(call() for _ in range(number))
+            if elapsed >= MIN_ROUND_TIME or number >= 1 << 16:
+                break
+            number *= 2
+        best = elapsed / number
+        for _ in range(self.repeat - 1):
+            best = min(best, sum(call() for _ in range(number)) / number)
+
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            'case': case,
+            'stage': stage,
+            'bytes': nbytes,
+            'seconds': best,
+            'throughput_mb_s': round(nbytes / best / 1024 / 1024, 2) if best > 0 else None,
+            'peak_bytes': peak,
+        }
+        self.results.append(result)
+        throughput = f"{result['throughput_mb_s']:10.1f} MB/s" if result['throughput_mb_s'] is not None else ' ' * 15
+        print(f"{case:<14} {stage:<20} {best * 1000:12.3f} ms {throughput} {peak / 1024 / 1024:10.1f} MB",
+              flush=True)
+        return result
+
+
+def bench_dense(bench, workdir, label, size):
+    case = f"dense-{label}"
+    boot_path = os.path.join(workdir, 'boot.bin')
+    app_path = os.path.join(workdir, f'app_{label}.bin')
+    synthetic_firmware(boot_path, min(48 * 1024, BOOT_REGION_SIZE), BOOT_START)
+    synthetic_firmware(app_path, size, BOOT_START, seed=1)
+
+    bench.measure(case, 'load', size, lambda: loadpool.LoadJob('app', app_path).run())
+    boot = core.load_file(boot_path)
+    app = core.load_file(app_path)
+    layout = core.two_region_layout(BOOT_START, BOOT_REGION_SIZE, APP_START, size)
+    inputs = {core.BOOT_REGION: boot, core.APP_REGION: app}
+    bench.measure(case, 'merge', len(boot) + size, lambda: core.merge_layout(layout, inputs))
+    merged = core.merge_layout(layout, inputs).data
+
+    def consume():
+        for _ in core.iter_chunks(merged):
+            pass
+    bench.measure(case, 'fill', len(merged), consume)
+    for name in CHECKSUMS:
+        bench.measure(case, f'checksum.{name}', len(merged),
+                      lambda name=name: checksum.compute(core.iter_chunks(merged), (name,)))
+
+    text_size = min(size, TEXT_LIMIT)
+    text_data = app[:text_size]
+    bench.measure(case, 'format_hex', text_size, lambda: hexdump.format_hex(text_data, APP_START))
+    bench.measure(case, 'vectors', 1024, lambda: vectors.analyze(app, APP_START, APP_START + size))
+
+    out_bin = os.path.join(workdir, 'out.bin')
+    bench.measure(case, 'save_bin', len(merged), lambda: core.save_file(out_bin, merged))
+    os.remove(out_bin)
+    if size <= TEXT_LIMIT:
+        out_hex = os.path.join(workdir, 'out.hex')
+        bench.measure(case, 'save_ihex', len(merged), lambda: core.save_file(out_hex, merged))
+        bench.measure(case, 'load_ihex', len(merged), lambda: core.load_input(out_hex))
+        os.remove(out_hex)
+    del boot, app, merged, text_data, inputs
+    os.remove(app_path)
+
+
+def bench_sparse(bench, workdir, label, size):
+    """BOOT、APP 在片内 Flash，另一半数据在 0x90000000 的外部 Flash，地址跨度约 2.2 GB"""
+    case = f"sparse-{label}"
+    half = max(1024, size // 2)
+    paths = {name: os.path.join(workdir, f'{name.lower()}_{label}.bin') for name in ('BOOT', 'APP1', 'EXT')}
+    synthetic_firmware(paths['BOOT'], min(48 * 1024, BOOT_REGION_SIZE), BOOT_START)
+    synthetic_firmware(paths['APP1'], half, BOOT_START, seed=1)
+    synthetic_firmware(paths['EXT'], half, SPARSE_EXT_START, seed=2)
+    layout = Layout([Region('BOOT', BOOT_START, BOOT_REGION_SIZE),
+                     Region('APP1', APP_START, half, vector_table=True),
+                     Region('EXT', SPARSE_EXT_START, half)])
+    inputs = {name: core.load_file(path) for name, path in paths.items()}
+    data_bytes = sum(len(data) for data in inputs.values())
+    bench.measure(case, 'merge', data_bytes, lambda: core.merge_layout(layout, inputs))
+    merged = core.merge_layout(layout, inputs).data
+    out_hex = os.path.join(workdir, 'sparse.hex')
+    # 文件中只有数据段，但校验和针对包括填充在内的整个地址跨度，吞吐量按跨度计算
+    bench.measure(case, 'save_ihex', len(merged), lambda: core.save_file(out_hex, merged))
+    os.remove(out_hex)
+    del inputs, merged
+    for path in paths.values():
+        os.remove(path)
+
+
+def compare(results, baseline, threshold):
+    """与基线比较，返回回归列表 [描述]"""
+    previous = {(item['case'], item['stage']): item for item in baseline.get('results', [])}
+    regressions = []
+    for item in results:
+        base = previous.get((item['case'], item['stage']))
+        if base is None:
+            continue
+        if item['seconds'] > base['seconds'] * (1 + threshold):
+            regressions.append(f"{item['case']} {item['stage']}: 耗时 {item['seconds'] * 1000:.3f} ms，"
+                               f"基线 {base['seconds'] * 1000:.3f} ms（+{item['seconds'] / base['seconds'] - 1:.0%}）")
+        if (base['peak_bytes'] >= MIN_COMPARED_PEAK and
+                item['peak_bytes'] > base['peak_bytes'] * (1 + threshold)):
+            regressions.append(f"{item['case']} {item['stage']}: 内存峰值 {item['peak_bytes'] / 1024 / 1024:.1f} MB，"
+                               f"基线 {base['peak_bytes'] / 1024 / 1024:.1f} MB")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="BIN文件合并工具性能基准测试")
+    parser.add_argument("--sizes", help=f"镜像大小列表，逗号分隔 (默认: {','.join(SIZES)})")
+    parser.add_argument("--quick", action="store_true", help=f"只测量 {','.join(QUICK_SIZES)}")
+    parser.add_argument("--no-sparse", action="store_true", help="不测量稀疏布局")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段测量的轮数，取最快的一轮 (默认: %(default)s)")
+    parser.add_argument("--output", metavar="PATH", help="结果 JSON 文件")
+    parser.add_argument("--baseline", metavar="PATH", help="与基线 JSON 比较，有回归时返回 1")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="允许的回归比例，0.25 表示比基线慢 25%% 以内不算回归 (默认: %(default)s)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="把本次结果保存为基线")
+    parser.add_argument("--workdir", metavar="DIR", help="生成临时文件的目录 (默认: 系统临时目录)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sizes = args.sizes.split(',') if args.sizes else (QUICK_SIZES if args.quick else SIZES)
+    bench = Bench(max(1, args.repeat))
+    started = time.perf_counter()
+    print(f"{'case':<14} {'stage':<20} {'time':>15} {'throughput':>15} {'peak':>13}")
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for label in sizes:
+            size = parse_size(label)
+            bench_dense(bench, workdir, label, size)
+            if not args.no_sparse and size <= TEXT_LIMIT:
+                bench_sparse(bench, workdir, label, size)
+
+    report = {
+        'version': 1,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seconds': round(time.perf_counter() - started, 2),
+        'results': bench.results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=4, ensure_ascii=False)
+            print(f"结果已保存: {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(bench.results, baseline, args.threshold)
+        if regressions:
+            print(f"发现 {len(regressions)} 项性能回归（阈值 {args.threshold:.0%}）:", file=sys.stderr)
+            for line in regressions:
+                print("  " + line, file=sys.stderr)
+            return 1
+        print(f"与基线相比没有超过 {args.threshold:.0%} 的回归")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""启动时间检查
+
+多次启动 GUI（源码 `python bin_merger.py`，或用 --exe 指定 PyInstaller 打包的可执行文件），
+测量从创建进程到主窗口第一次显示的时间，中位数超过预算时返回 1。
+程序通过环境变量 BIN_MERGER_STARTUP_REPORT 得知要报告启动时间：窗口显示后把各阶段的时间点写入该文件并退出，
+由此还能拆分出解释器启动（打包版本包括解压）、模块导入、窗口创建和显示各用了多少时间。
+
+同时检查启动时没有导入 DEFERRED_MODULES 中的模块（这些模块应在第一次使用对应功能时才导入）。
+
+示例:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --exe dist/bin_merger.exe --budget 5
+    python benchmarks/startup.py --output startup.json
+
+无显示器的 Linux 上可设置 QT_QPA_PLATFORM=offscreen 运行。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'bin_merger.py')
+
+# 启动时不应导入的模块
+DEFERRED_MODULES = ('binmerge.search', 'binmerge.diff', 'binmerge.mergecache', 'binmerge.watch',
+                    'binmerge.loadpool', 'binmerge.batch', 'binmerge.patch', 'binmerge.bundle', 'binmerge.cli')
+# 单次启动的超时时间（秒）
+TIMEOUT = 60
+# 各阶段: (名称, 起点, 终点)，None 表示创建进程的时间
+PHASES = (
+    ('interpreter', None, 'started'),
+    ('imports', 'started', 'imported'),
+    ('construct', 'imported', 'constructed'),
+    ('show', 'constructed', 'shown'),
+    ('total', None, 'shown'),
+)
+
+
+def launch(command, report_path):
+    """启动一次，返回启动报告（其中 'spawned' 为创建进程的时间）"""
+    env = dict(os.environ, BIN_MERGER_STARTUP_REPORT=report_path)
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    spawned = time.time()
+    process = subprocess.run(command, env=env, cwd=ROOT, timeout=TIMEOUT,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if not os.path.exists(report_path):
+        raise RuntimeError(f"程序没有写入启动报告（退出码 {process.returncode}）: "
+                           f"{process.stderr.decode(errors='replace').strip()}")
+    with open(report_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    report['spawned'] = spawned
+    return report
+
+
+def phases(report):
+    """{阶段: 秒}"""
+    return {name: report[end] - report[start or 'spawned'] for name, start, end in PHASES}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="BIN文件合并工具启动时间检查")
+    parser.add_argument("--exe", metavar="PATH", help="检查打包的可执行文件 (默认: 用当前解释器运行 bin_merger.py)")
+    parser.add_argument("--runs", type=int, default=5, help="启动次数，取中位数 (默认: %(default)s)")
+    parser.add_argument("--budget", type=float, default=2.0, help="启动时间预算（秒） (默认: %(default)s)")
+    parser.add_argument("--output", metavar="PATH", help="结果 JSON 文件")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command = [os.path.abspath(args.exe)] if args.exe else [sys.executable, SCRIPT]
+    target = args.exe or SCRIPT
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report_path = os.path.join(workdir, 'startup.json')
+        reports = []
+        for run in range(args.runs):
+            try:
+                reports.append(launch(command, report_path))
+            except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+                print(f"错误: 第 {run + 1} 次启动失败: {e}", file=sys.stderr)
+                return 1
+
+    runs = [phases(report) for report in reports]
+    median = {name: statistics.median(run[name] for run in runs) for name, _, _ in PHASES}
+    print(f"{target}（{'打包版本' if reports[0]['frozen'] else '源码'}，{args.runs} 次）")
+    for name, _, _ in PHASES:
+        print(f"  {name:<12} 中位数 {median[name] * 1000:8.1f} ms   "
+              f"最快 {min(run[name] for run in runs) * 1000:8.1f} ms")
+
+    failures = []
+    if median['total'] > args.budget:
+        failures.append(f"启动时间 {median['total']:.2f} s 超过预算 {args.budget:.2f} s")
+    eager = [name for name in DEFERRED_MODULES if name in reports[0]['modules']]
+    if eager:
+        failures.append(f"启动时导入了应推迟导入的模块: {', '.join(eager)}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'target': target, 'frozen': reports[0]['frozen'], 'budget': args.budget,
+                       'median': median, 'runs': runs, 'modules': reports[0]['modules']}, f, indent=2)
+
+    for failure in failures:
+        print(f"失败: {failure}")
+    if not failures:
+        print(f"通过: 启动时间在预算 {args.budget:.2f} s 之内")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,186 +1,473 @@
 import sys
+import time
+
+# 启动计时的起点（脚本开始执行的时间，打包版本不含解压时间）
+STARTED = time.time()
+
+if __name__ == '__main__' and getattr(sys, 'frozen', False):
+    # 打包后的可执行文件也用来启动批量合并的工作进程，必须先交给 multiprocessing 处理
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+if __name__ == '__main__' and len(sys.argv) > 1:
+    # 命令行模式：直接调用合并核心，不加载 PyQt5
+    from binmerge.cli import main
+    sys.exit(main())
+
 import os
-import zlib
-import hashlib
+import json
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QLineEdit, QPushButton, QTextEdit, QFileDialog, QMessageBox,
+                             QLabel, QLineEdit, QPushButton, QAbstractScrollArea, QFileDialog, QMessageBox,
                              QGroupBox, QGridLayout, QScrollArea, QSizePolicy, QDialog, QDialogButtonBox,
                              QFormLayout, QSpinBox, QCheckBox, QProgressBar, QSplitter, QToolBar, QAction,
-                             QTabWidget, QTableWidget, QTableWidgetItem, QHeaderView, QComboBox, QToolButton)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QRect, QSize
-from PyQt5.QtGui import QFont, QColor, QPainter, QPen, QIcon, QTextCursor, QTextCharFormat
-import struct
+                             QTabWidget, QTableWidget, QTableWidgetItem, QHeaderView, QComboBox, QToolButton,
+                             QPlainTextEdit)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QRect, QRectF, QPointF, QSize, QEvent, QFileSystemWatcher, QTimer
+from PyQt5.QtGui import QFont, QColor, QPainter, QPen, QIcon, QFontMetricsF, QKeySequence
 import re
+from bisect import bisect_right
+
+# 启动界面只导入必需的模块；search、diff、mergecache、watch、loadpool 在第一次使用时才导入
+from binmerge import core, hexdump, checksum, loaders, hexwriter, vectors, occupancy, trace
 
 class MemoryMapWidget(QWidget):
-    """内存映射可视化控件"""
+    """内存映射可视化控件，按地址比例绘制布局中的每个区域
+
+    区域有逐页扫描结果（occupancy.PageMap）时绘制占用热图：上部按页显示擦除/部分/数据，底部色条显示熵估计。
+    每个区域按像素宽度聚合后的色块按宽度缓存，重绘时只画预先算好的矩形。
+    """
+    # 每个区域的 (背景色, 已用部分颜色)，按区域顺序循环使用
+    REGION_COLORS = [
+        (QColor(200, 200, 255), QColor(100, 100, 255)),
+        (QColor(255, 200, 200), QColor(255, 100, 100)),
+        (QColor(200, 255, 200), QColor(60, 180, 60)),
+        (QColor(255, 235, 180), QColor(230, 160, 40)),
+        (QColor(230, 200, 255), QColor(150, 90, 220)),
+        (QColor(190, 240, 240), QColor(40, 160, 170)),
+    ]
+    # 熵色条的高度
+    ENTROPY_HEIGHT = 10
+    
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.boot_start = 0x8000000
-        self.boot_size = 0x100000
-        self.app_start = 0x8020000
-        self.app_size = 0x20000
-        self.boot_used = 0
-        self.app_used = 0
+        # [(名称, 起始地址, 大小, 已用字节数)]
+        self.regions = []
+        # {区域名: PageMap}
+        self.page_maps = {}
+        # {(区域名, 像素宽度): [(x, 宽度, 状态颜色, 熵颜色)]}
+        self.heatmap_cache = {}
+        self.set_memory_info(core.DEFAULT_BOOT_START, core.DEFAULT_BOOT_SIZE,
+                             core.DEFAULT_APP_START, core.DEFAULT_APP_SIZE, 0, 0)
         self.setMinimumHeight(150)
         
     def set_memory_info(self, boot_start, boot_size, app_start, app_size, boot_used, app_used):
-        self.boot_start = boot_start
-        self.boot_size = boot_size
-        self.app_start = app_start
-        self.app_size = app_size
-        self.boot_used = boot_used
-        self.app_used = app_used
+        self.set_regions([("BOOT", boot_start, boot_size, boot_used),
+                          ("APP", app_start, app_size, app_used)])
+        
+    def set_regions(self, regions):
+        """设置要绘制的区域 [(名称, 起始地址, 大小, 已用字节数)]"""
+        self.regions = sorted(regions, key=lambda region: region[1])
         self.update()
         
+    def set_page_map(self, name, page_map):
+        """设置区域的逐页扫描结果，None 表示没有"""
+        if page_map is None:
+            self.page_maps.pop(name, None)
+        else:
+            self.page_maps[name] = page_map
+        self.heatmap_cache = {key: value for key, value in self.heatmap_cache.items() if key[0] != name}
+        self.update()
+        
+    def heatmap(self, name, page_map, region_width, background, used_color):
+        """区域按像素列聚合的色块，相邻颜色相同的列合并为一个矩形"""
+        key = (name, region_width)
+        rects = self.heatmap_cache.get(key)
+        if rects is not None:
+            return rects
+        mixed_color = QColor((background.red() + used_color.red()) // 2,
+                             (background.green() + used_color.green()) // 2,
+                             (background.blue() + used_color.blue()) // 2)
+        state_colors = {occupancy.ERASED: background, occupancy.MIXED: mixed_color, occupancy.DATA: used_color}
+        columns = page_map.columns(max(1, min(region_width, len(page_map))))
+        rects = []
+        for column, (state, entropy) in enumerate(columns):
+            x = column * region_width // len(columns)
+            end = (column + 1) * region_width // len(columns)
+            color = state_colors[state]
+            # 熵按 16 级从低到高对应蓝色到红色（分级后相邻列更容易合并），擦除页不显示
+            entropy_color = None if state == occupancy.ERASED else QColor.fromHsv(240 - (entropy >> 4) * 16, 200, 230)
+            if rects and rects[-1][2] == color and rects[-1][3] == entropy_color:
+                rects[-1][1] = end - rects[-1][0]
+            else:
+                rects.append([x, end - x, color, entropy_color])
+        self.heatmap_cache[key] = rects
+        return rects
+        
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         
         # 绘制背景
         painter.fillRect(self.rect(), QColor(240, 240, 240))
+        if not self.regions:
+            return
         
         # 计算可用空间
         width = self.width() - 20
         height = self.height() - 40
         
         # 计算总内存范围
-        total_start = min(self.boot_start, self.app_start)
-        total_end = max(self.boot_start + self.boot_size, self.app_start + self.app_size)
-        total_size = total_end - total_start
-        
-        # 计算相对位置
-        boot_start_rel = (self.boot_start - total_start) / total_size
-        boot_size_rel = self.boot_size / total_size
-        app_start_rel = (self.app_start - total_start) / total_size
-        app_size_rel = self.app_size / total_size
+        total_start = min(start for _, start, _, _ in self.regions)
+        total_end = max(start + size for _, start, size, _ in self.regions)
+        total_size = max(total_end - total_start, 1)
         
         # 绘制整个内存区域
         painter.setPen(QPen(Qt.black, 1))
         painter.drawRect(10, 10, width, height)
         
-        # 绘制BOOT区域
-        boot_x = int(10 + boot_start_rel * width)
-        boot_width = int(boot_size_rel * width)
-        boot_used_rel = min(self.boot_used / self.boot_size, 1.0)
-        boot_used_width = int(boot_width * boot_used_rel)
-        
-        painter.fillRect(QRect(boot_x, 10, boot_width, height), QColor(200, 200, 255))
-        painter.fillRect(QRect(boot_x, 10, boot_used_width, height), QColor(100, 100, 255))
-        painter.drawRect(QRect(boot_x, 10, boot_width, height))
-        
-        # 绘制APP区域
-        app_x = int(10 + app_start_rel * width)
-        app_width = int(app_size_rel * width)
-        app_used_rel = min(self.app_used / self.app_size, 1.0)
-        app_used_width = int(app_width * app_used_rel)
-        
-        painter.fillRect(QRect(app_x, 10, app_width, height), QColor(255, 200, 200))
-        painter.fillRect(QRect(app_x, 10, app_used_width, height), QColor(255, 100, 100))
-        painter.drawRect(QRect(app_x, 10, app_width, height))
-        
-        # 添加标签
-        painter.drawText(QRect(boot_x, height + 20, boot_width, 20), Qt.AlignCenter, f"BOOT: {self.boot_used}/{self.boot_size} bytes")
-        painter.drawText(QRect(app_x, height + 20, app_width, 20), Qt.AlignCenter, f"APP: {self.app_used}/{self.app_size} bytes")
+        metrics = painter.fontMetrics()
+        for index, (name, start, size, used) in enumerate(self.regions):
+            background, used_color = self.REGION_COLORS[index % len(self.REGION_COLORS)]
+            
+            # 计算相对位置，区域太小时至少保留2像素以便看到
+            x = int(10 + (start - total_start) / total_size * width)
+            region_width = max(int(size / total_size * width), 2)
+            
+            page_map = self.page_maps.get(name)
+            if page_map is not None and page_map.size == size:
+                # 占用热图
+                painter.fillRect(QRect(x, 10, region_width, height), background)
+                bar_height = height - self.ENTROPY_HEIGHT
+                for rect_x, rect_width, color, entropy_color in self.heatmap(name, page_map, region_width,
+                                                                             background, used_color):
+                    painter.fillRect(QRect(x + rect_x, 10, rect_width, bar_height), color)
+                    if entropy_color is not None:
+                        painter.fillRect(QRect(x + rect_x, 10 + bar_height, rect_width, self.ENTROPY_HEIGHT),
+                                         entropy_color)
+                label = f"{name}: {page_map.summary()}"
+            else:
+                used_rel = min(used / size, 1.0) if size > 0 else 0.0
+                used_width = int(region_width * used_rel)
+                painter.fillRect(QRect(x, 10, region_width, height), background)
+                painter.fillRect(QRect(x, 10, used_width, height), used_color)
+                label = f"{name}: {used}/{size} bytes"
+            painter.drawRect(QRect(x, 10, region_width, height))
+            
+            # 添加标签，放不下时只显示名称，仍放不下则省略
+            if metrics.horizontalAdvance(label) > region_width:
+                label = name
+            if metrics.horizontalAdvance(label) <= region_width:
+                painter.drawText(QRect(x, height + 20, region_width, 20), Qt.AlignCenter, label)
         
         # 添加地址标签
         painter.drawText(QRect(10, 10, 100, 20), Qt.AlignLeft, f"0x{total_start:08X}")
         painter.drawText(QRect(width - 80, 10, 100, 20), Qt.AlignRight, f"0x{total_end:08X}")
 
-class FileLoaderThread(QThread):
-    """文件加载线程，避免界面卡顿"""
-    finished = pyqtSignal(str, bytes, str, int, int)  # 文件类型, 数据, 错误信息, 起始地址, 大小
-    progress = pyqtSignal(int)  # 进度更新
+class OccupancyThread(QThread):
+    """区域占用扫描线程，每扫描完一个区域发送一次结果，结果由 occupancy 模块缓存"""
+    scanned = pyqtSignal(str, object)  # 区域名, PageMap
     
-    def __init__(self, file_path, file_type, start_addr, size):
+    def __init__(self, regions, page_size, fill):
         super().__init__()
-        self.file_path = file_path
-        self.file_type = file_type
-        self.start_addr = start_addr
-        self.size = size
+        # [(区域名, 数据, 内容摘要, 区域起始地址, 区域大小)]
+        self.regions = regions
+        self.page_size = page_size
+        self.fill = fill
+        self.cancelled = False
+        
+    def cancel(self):
+        self.cancelled = True
         
+    def run(self):
+        for name, data, digest, start, size in self.regions:
+            page_map = occupancy.scan_cached(data, digest, start, size, self.page_size, self.fill,
+                                             lambda: self.cancelled)
+            if self.cancelled:
+                return
+            self.scanned.emit(name, page_map)
+
+class TaskThread(QThread):
+    """后台任务线程（合并、保存），避免界面卡顿
+
+    执行 fn(progress)，progress(已处理字节数, 总字节数) 报告进度；cancel() 后下一次报告进度时抛出 Cancelled，
+    任务在处理完当前数据块时停止。结果对象原样通过 done 信号传回界面线程，不做复制。
+    """
+    progress = pyqtSignal(int)  # 进度更新
+    done = pyqtSignal(object, object)  # 结果, 异常（成功时为 None）
+    
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.cancelled = False
+        self.percent = -1
+        
+    def cancel(self):
+        self.cancelled = True
+        
+    def report_progress(self, done, total):
+        if self.cancelled:
+            raise core.Cancelled("操作已取消")
+        percent = int(done * 100 / total) if total else 100
+        if percent != self.percent:
+            self.percent = percent
+            self.progress.emit(percent)
+            
     def run(self):
         try:
-            file_size = os.path.getsize(self.file_path)
-            chunk_size = 1024 * 1024  # 1MB
-            data = bytearray()
-            
-            with open(self.file_path, 'rb') as f:
-                while True:
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    data.extend(chunk)
-                    progress = len(data) / file_size * 100
-                    self.progress.emit(int(progress))
-            
-            self.finished.emit(self.file_type, bytes(data), "", self.start_addr, self.size)
+            result = self.fn(self.report_progress)
         except Exception as e:
-            self.finished.emit(self.file_type, None, str(e), self.start_addr, self.size)
+            self.done.emit(None, e)
+        else:
+            self.done.emit(result, None)
+
+class SearchThread(QThread):
+    """内容搜索线程
+
+    所有模式一次遍历完成搜索，依次搜索每个数据源；结果分批发送给界面，避免逐条发送信号。
+    cancel() 后在处理完当前数据块时停止。
+    """
+    found = pyqtSignal(list)  # [(数据源, 地址, 模式文本)]
+    progress = pyqtSignal(int)  # 进度更新
+    done = pyqtSignal(int, bool)  # 结果数, 是否被取消
+    
+    # 结果数上限，超过后停止搜索
+    MAX_RESULTS = 10000
+    # 每批发送的结果数
+    BATCH_RESULTS = 200
+    
+    def __init__(self, patterns, sources):
+        super().__init__()
+        self.patterns = patterns
+        # [(数据源, 数据, 基地址)]
+        self.sources = sources
+        self.cancelled = False
+        
+    def cancel(self):
+        self.cancelled = True
+        
+    def run(self):
+        from binmerge import search
+        total = sum(search.searchable_size(data) for _, data, _ in self.sources) or 1
+        searched = 0
+        count = 0
+        batch = []
+        for source, data, base_address in self.sources:
+            def report_progress(done, searched=searched):
+                self.progress.emit(int((searched + done) / total * 100))
+                
+            for address, pattern in self.patterns.search(data, base_address, lambda: self.cancelled,
+                                                         report_progress):
+                batch.append((source, address, pattern.text))
+                count += 1
+                if count >= self.MAX_RESULTS:
+                    self.cancelled = True
+                    break
+                if len(batch) >= self.BATCH_RESULTS:
+                    self.found.emit(batch)
+                    batch = []
+            searched += search.searchable_size(data)
+            if self.cancelled:
+                break
+        if batch:
+            self.found.emit(batch)
+        self.done.emit(count, self.cancelled)
+
+class HexViewer(QAbstractScrollArea):
+    """十六进制查看器
+
+    只保存数据缓冲区的引用，绘制时按需格式化可见行，
+    因此数据大小不影响内存占用和滚动速度，地址跳转为 O(1)。
+    """
+    BYTES_PER_LINE = hexdump.LINE_BYTES
+    # 地址部分占10字符，每个字节占3字符(2十六进制+1空格)
+    HEX_COLUMN = hexdump.HEX_COLUMN
+    ASCII_COLUMN = hexdump.ASCII_COLUMN
+    LINE_CHARS = ASCII_COLUMN + BYTES_PER_LINE
+    MARGIN = 4
 
-class HexViewer(QTextEdit):
-    """十六进制查看器"""
     def __init__(self):
         super().__init__()
-        self.setReadOnly(True)
-        self.setFont(QFont("Courier New", 9))
-        self.setLineWrapMode(QTextEdit.NoWrap)
         self.data = None
         self.base_address = 0
-        self.highlight_format = QTextCharFormat()
-        self.highlight_format.setBackground(QColor(255, 255, 0))  # 黄色高亮
-        
-    def setData(self, data, base_address=0):
-        """显示二进制数据"""
+        self.selected_offset = None
+        self.highlight_color = QColor(255, 255, 0)  # 黄色高亮
+        # 标记的偏移区间 [(起始, 结束)]，按起始偏移排序（比较镜像时标记不同的字节）
+        self.marked_ranges = []
+        self.mark_color = QColor(255, 190, 190)
+        font = QFont("Courier New", 9)
+        font.setStyleHint(QFont.TypeWriter)
+        self.setFont(font)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.update_metrics()
+
+    def update_metrics(self):
+        metrics = QFontMetricsF(self.font())
+        self.char_width = metrics.horizontalAdvance('0')
+        self.line_height = int(metrics.height())
+        self.ascent = metrics.ascent()
+
+    def setData(self, data, base_address=0, keep_position=False):
+        """显示二进制数据，keep_position 为 True 时保留滚动位置和选中的字节（监视模式下刷新同一文件）"""
         self.data = data
         self.base_address = base_address
-        if data is None:
-            self.clear()
-            return
-            
-        hex_str = self.format_hex(data, base_address)
-        self.setPlainText(hex_str)
-        
+        if not keep_position:
+            self.selected_offset = None
+            self.marked_ranges = []
+            self.verticalScrollBar().setValue(0)
+            self.horizontalScrollBar().setValue(0)
+        self.update_scrollbars()
+        self.viewport().update()
+
+    def clear(self):
+        self.setData(None)
+
+    def set_marked_ranges(self, ranges):
+        """标记偏移区间 [(起始, 结束)]，区间按起始偏移排序且互不重叠"""
+        self.marked_ranges = list(ranges)
+        self.viewport().update()
+
+    def paint_marks(self, painter, first, last, x):
+        """绘制可见行内的标记区间，只查找与可见范围相交的区间"""
+        lo = first * self.BYTES_PER_LINE
+        hi = last * self.BYTES_PER_LINE
+        i = max(0, bisect_right(self.marked_ranges, (lo,)) - 1)
+        while i < len(self.marked_ranges) and self.marked_ranges[i][0] < hi:
+            start, end = self.marked_ranges[i]
+            i += 1
+            offset = max(start, lo)
+            end = min(end, hi)
+            while offset < end:
+                line, column = divmod(offset, self.BYTES_PER_LINE)
+                count = min(end - offset, self.BYTES_PER_LINE - column)
+                y = (line - first) * self.line_height
+                hex_x = x + (self.HEX_COLUMN + column * 3) * self.char_width
+                ascii_x = x + (self.ASCII_COLUMN + column) * self.char_width
+                painter.fillRect(QRectF(hex_x, y, (count * 3 - 1) * self.char_width, self.line_height),
+                                 self.mark_color)
+                painter.fillRect(QRectF(ascii_x, y, count * self.char_width, self.line_height), self.mark_color)
+                offset += count
+
+    def line_count(self):
+        if not self.data:
+            return 0
+        return (len(self.data) + self.BYTES_PER_LINE - 1) // self.BYTES_PER_LINE
+
+    def visible_lines(self):
+        return max(1, self.viewport().height() // self.line_height)
+
+    def update_scrollbars(self):
+        vbar = self.verticalScrollBar()
+        page = self.visible_lines()
+        vbar.setRange(0, max(0, self.line_count() - page))
+        vbar.setPageStep(page)
+        vbar.setSingleStep(1)
+
+        hbar = self.horizontalScrollBar()
+        content_width = int(self.LINE_CHARS * self.char_width) + 2 * self.MARGIN
+        hbar.setRange(0, max(0, content_width - self.viewport().width()))
+        hbar.setPageStep(self.viewport().width())
+        hbar.setSingleStep(int(self.char_width))
+
+    def format_line(self, line):
+        """格式化单行"""
+        return hexdump.format_line(self.data, line * self.BYTES_PER_LINE, self.base_address)
+
     def format_hex(self, data, base_address):
         """将二进制数据格式化为十六进制字符串"""
-        hex_str = ""
-        for i in range(0, len(data), 16):
-            line = data[i:i+16]
-            hex_line = ' '.join(f'{b:02x}' for b in line)
-            ascii_line = ''.join(chr(b) if 32 <= b < 127 else '.' for b in line)
-            addr = base_address + i
-            hex_str += f"{addr:08x}: {hex_line:<48} {ascii_line}\n"
-        return hex_str
-    
+        return hexdump.format_hex(data, base_address)
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), self.palette().base())
+        if not self.data:
+            return
+
+        first = self.verticalScrollBar().value()
+        last = min(self.line_count(), first + self.visible_lines() + 1)
+        with trace.span('render', (last - first) * self.BYTES_PER_LINE):
+            x = self.MARGIN - self.horizontalScrollBar().value()
+            if self.marked_ranges:
+                self.paint_marks(painter, first, last, x)
+
+            # 高亮选中的字节（十六进制和ASCII两处）
+            if self.selected_offset is not None:
+                line, column = divmod(self.selected_offset, self.BYTES_PER_LINE)
+                if first <= line < last:
+                    y = (line - first) * self.line_height
+                    hex_x = x + (self.HEX_COLUMN + column * 3) * self.char_width
+                    ascii_x = x + (self.ASCII_COLUMN + column) * self.char_width
+                    painter.fillRect(QRectF(hex_x, y, 2 * self.char_width, self.line_height), self.highlight_color)
+                    painter.fillRect(QRectF(ascii_x, y, self.char_width, self.line_height), self.highlight_color)
+
+            painter.setPen(self.palette().text().color())
+            for line in range(first, last):
+                y = (line - first) * self.line_height + self.ascent
+                painter.drawText(QPointF(x, y), self.format_line(line))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbars()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.update_metrics()
+            self.update_scrollbars()
+
+    def offset_at(self, pos):
+        """根据视口坐标计算字节偏移，不在数据上时返回 None"""
+        if not self.data:
+            return None
+        line = self.verticalScrollBar().value() + pos.y() // self.line_height
+        char = int((pos.x() - self.MARGIN + self.horizontalScrollBar().value()) // self.char_width)
+        if self.HEX_COLUMN <= char < self.ASCII_COLUMN - 1:
+            column = (char - self.HEX_COLUMN) // 3
+        elif self.ASCII_COLUMN <= char < self.LINE_CHARS:
+            column = char - self.ASCII_COLUMN
+        else:
+            return None
+        offset = line * self.BYTES_PER_LINE + column
+        return offset if offset < len(self.data) else None
+
+    def mousePressEvent(self, event):
+        offset = self.offset_at(event.pos())
+        if offset is not None:
+            self.selected_offset = offset
+            self.viewport().update()
+        super().mousePressEvent(event)
+
+    def keyPressEvent(self, event):
+        vbar = self.verticalScrollBar()
+        if event.matches(QKeySequence.Copy):
+            if self.selected_offset is not None:
+                QApplication.clipboard().setText(self.format_line(self.selected_offset // self.BYTES_PER_LINE))
+        elif event.key() == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+            vbar.setValue(vbar.minimum())
+        elif event.key() == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+            vbar.setValue(vbar.maximum())
+        else:
+            super().keyPressEvent(event)
+
     def search_address(self, address):
         """搜索并定位到指定地址"""
         if self.data is None:
             return False
-            
+
         # 转换为文件内的偏移
         offset = address - self.base_address
-        
+
         # 确保地址在有效范围内
         if offset < 0 or offset >= len(self.data):
             return False
-            
-        # 计算行号和列号
-        line = offset // 16
-        column = (offset % 16) * 3 + 10  # 地址部分占10字符，每个字节占3字符(2十六进制+1空格)
-        
-        # 移动到指定位置
-        cursor = self.textCursor()
-        cursor.movePosition(QTextCursor.Start)
-        for _ in range(line):
-            cursor.movePosition(QTextCursor.Down)
-        
-        # 高亮显示
-        cursor.movePosition(QTextCursor.Right, QTextCursor.MoveAnchor, column)
-        cursor.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 2)  # 选择2个字符(一个字节)
-        
-        self.setTextCursor(cursor)
+
+        # 直接滚动到目标行（居中显示）并高亮该字节
+        line = offset // self.BYTES_PER_LINE
+        self.selected_offset = offset
+        self.verticalScrollBar().setValue(line - self.visible_lines() // 2)
+        self.horizontalScrollBar().setValue(0)
+        self.viewport().update()
         self.setFocus()
-        
+
         return True
 
 class AddressDialog(QDialog):
@@ -196,7 +483,7 @@ class AddressDialog(QDialog):
         layout = QFormLayout(self)
         
         self.start_addr = QLineEdit("0x8000000" if self.file_type == "BOOT" else "0x8020000")
-        self.size = QLineEdit("0x100000" if self.file_type == "BOOT" else "0x20000")
+        self.size = QLineEdit("0x20000")
         
         layout.addRow("起始地址:", self.start_addr)
         layout.addRow("大小:", self.size)
@@ -216,46 +503,437 @@ class AddressDialog(QDialog):
             return None
 
 class VectorTableDialog(QDialog):
-    """中断向量表对话框"""
-    def __init__(self, vector_table, parent=None):
+    """中断向量表对话框
+
+    按选择的内核型号解析整张向量表并标出有问题的项；APP 按其他地址链接时，可以设置合并时重定位全部处理程序。
+    分析结果按内容摘要（digest）缓存，重复打开不会重新解析。
+    """
+    def __init__(self, app_data, app_start, app_size, link_address=None, parent=None, digest=None):
         super().__init__(parent)
+        self.app_data = app_data
+        self.digest = digest
+        self.app_start = app_start
+        self.app_size = app_size
         self.setWindowTitle("中断向量表")
         self.setModal(True)
-        self.resize(500, 400)
-        self.initUI(vector_table)
+        self.resize(760, 560)
+        self.initUI(link_address)
+        self.analyze()
         
-    def initUI(self, vector_table):
+    def initUI(self, link_address):
         layout = QVBoxLayout(self)
         
-        # 创建表格
-        table = QTableWidget()
-        table.setColumnCount(2)
-        table.setHorizontalHeaderLabels(["偏移", "地址"])
-        table.setRowCount(len(vector_table))
-        
-        # 填充表格
-        for i, addr in enumerate(vector_table):
-            table.setItem(i, 0, QTableWidgetItem(f"0x{i*4:03X}"))
-            table.setItem(i, 1, QTableWidgetItem(f"0x{addr:08X}"))
+        option_layout = QHBoxLayout()
+        self.profile_combo = QComboBox()
+        for name, profile in vectors.PROFILES.items():
+            self.profile_combo.addItem(profile.label, name)
+        self.profile_combo.setCurrentIndex(list(vectors.PROFILES).index(vectors.DEFAULT_PROFILE))
+        self.profile_combo.currentIndexChanged.connect(self.analyze)
+        self.irq_spin = QSpinBox()
+        self.irq_spin.setRange(-1, 480)
+        self.irq_spin.setSpecialValueText("自动")
+        self.irq_spin.setValue(-1)
+        self.irq_spin.valueChanged.connect(self.analyze)
+        option_layout.addWidget(QLabel("内核:"))
+        option_layout.addWidget(self.profile_combo)
+        option_layout.addWidget(QLabel("外部中断数:"))
+        option_layout.addWidget(self.irq_spin)
+        option_layout.addStretch()
+        layout.addLayout(option_layout)
         
-        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        layout.addWidget(table)
+        # 创建表格
+        self.table = QTableWidget()
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(["偏移", "名称", "地址", "状态", "重定位后"])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+        
+        self.summary_label = QLabel("")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+        
+        # 重定位设置
+        relocate_layout = QHBoxLayout()
+        self.relocate_check = QCheckBox("合并时重定位全部处理程序，链接地址:")
+        self.relocate_check.setChecked(link_address is not None)
+        self.relocate_check.toggled.connect(self.update_relocation)
+        self.link_input = QLineEdit("" if link_address is None else f"0x{link_address:08X}")
+        self.link_input.setMaximumWidth(120)
+        self.link_input.editingFinished.connect(self.update_relocation)
+        relocate_layout.addWidget(self.relocate_check)
+        relocate_layout.addWidget(self.link_input)
+        relocate_layout.addStretch()
+        layout.addLayout(relocate_layout)
         
         # 按钮
-        buttons = QDialogButtonBox(QDialogButtonBox.Ok, self)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
         buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
+        
+    def analyze(self):
+        irq_count = self.irq_spin.value()
+        self.vector_table = vectors.analyze_cached(self.app_data, self.digest, self.app_start,
+                                                   self.app_start + self.app_size, self.profile_combo.currentData(),
+                                                   None if irq_count < 0 else irq_count)
+        if not self.link_input.text():
+            guess = self.vector_table.guess_link_address()
+            if guess is not None:
+                self.link_input.setText(f"0x{guess:08X}")
+        
+        problem_color = QColor(255, 200, 200)
+        self.table.setRowCount(len(self.vector_table.entries))
+        for row, entry in enumerate(self.vector_table.entries):
+            items = [f"0x{entry.offset:03X}", entry.name, f"0x{entry.value:08X}",
+                     vectors.STATUS_LABELS[entry.status]]
+            for column, text in enumerate(items):
+                item = QTableWidgetItem(text)
+                if entry.status in vectors.PROBLEMS:
+                    item.setBackground(problem_color)
+                self.table.setItem(row, column, item)
+        self.summary_label.setText(self.vector_table.summary())
+        self.update_relocation()
+        
+    def link_address(self):
+        """勾选重定位且链接地址有效时返回链接地址，否则返回 None"""
+        if not self.relocate_check.isChecked():
+            return None
+        try:
+            return int(self.link_input.text(), 0)
+        except ValueError:
+            return None
+            
+    def update_relocation(self):
+        """在最后一列预览重定位后的值"""
+        link_address = self.link_address()
+        values = self.vector_table.relocated_values(link_address) if link_address is not None else []
+        for row, entry in enumerate(self.vector_table.entries):
+            text = f"0x{values[row]:08X}" if values and values[row] != entry.value else ""
+            self.table.setItem(row, 4, QTableWidgetItem(text))
+
+class SearchDialog(QDialog):
+    """内容搜索对话框（非模态），结果列表中单击一行即跳转到对应选项卡的地址"""
+    # 数据源 -> 显示名称
+    SOURCES = {"boot": "BOOT", "app": "APP1", "merged": "合并后"}
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle("搜索内容")
+        self.resize(560, 600)
+        self.worker = None
+        self.initUI()
+        
+    def initUI(self):
+        layout = QVBoxLayout(self)
+        
+        layout.addWidget(QLabel('每行一个模式: 十六进制字节（DE AD BE EF），?? 或 D? 为通配符，'
+                                '"文本" 为 ASCII 字符串，u"文本" 为 UTF-16 字符串'))
+        self.pattern_edit = QPlainTextEdit()
+        self.pattern_edit.setMaximumHeight(120)
+        layout.addWidget(self.pattern_edit)
+        
+        # 数据源选择
+        source_layout = QHBoxLayout()
+        self.source_checks = {}
+        for source, label in self.SOURCES.items():
+            check = QCheckBox(label)
+            check.setChecked(True)
+            self.source_checks[source] = check
+            source_layout.addWidget(check)
+        source_layout.addStretch()
+        
+        self.search_btn = QPushButton("搜索")
+        self.search_btn.clicked.connect(self.start_search)
+        self.stop_btn = QPushButton("停止")
+        self.stop_btn.clicked.connect(self.stop_search)
+        self.stop_btn.setEnabled(False)
+        source_layout.addWidget(self.search_btn)
+        source_layout.addWidget(self.stop_btn)
+        layout.addLayout(source_layout)
+        
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+        
+        # 结果列表
+        self.result_table = QTableWidget()
+        self.result_table.setColumnCount(3)
+        self.result_table.setHorizontalHeaderLabels(["来源", "地址", "模式"])
+        self.result_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.result_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.result_table.cellClicked.connect(self.goto_result)
+        layout.addWidget(self.result_table)
+        
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+        # 每行结果对应的 (数据源, 地址)
+        self.results = []
+        
+    def start_search(self):
+        from binmerge import search
+        lines = [line for line in self.pattern_edit.toPlainText().splitlines() if line.strip()]
+        try:
+            patterns = search.PatternSet(search.parse_pattern(line) for line in lines)
+        except search.PatternError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+            
+        sources = []
+        for source, check in self.source_checks.items():
+            viewer = self.parent().viewer(source)
+            if check.isChecked() and viewer.data is not None:
+                sources.append((source, viewer.data, viewer.base_address))
+        if not sources:
+            QMessageBox.warning(self, "警告", "选择的数据源都没有数据")
+            return
+            
+        self.stop_search()
+        self.results = []
+        self.result_table.setRowCount(0)
+        self.progress_bar.setValue(0)
+        self.status_label.setText("正在搜索...")
+        self.search_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        
+        self.worker = SearchThread(patterns, sources)
+        self.worker.found.connect(self.add_results)
+        self.worker.progress.connect(self.progress_bar.setValue)
+        self.worker.done.connect(self.on_search_done)
+        self.worker.start()
+        
+    def stop_search(self):
+        """取消正在进行的搜索并等待线程结束"""
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+            
+    def add_results(self, batch):
+        row = self.result_table.rowCount()
+        self.result_table.setRowCount(row + len(batch))
+        for source, address, text in batch:
+            self.result_table.setItem(row, 0, QTableWidgetItem(self.SOURCES[source]))
+            self.result_table.setItem(row, 1, QTableWidgetItem(f"0x{address:08X}"))
+            self.result_table.setItem(row, 2, QTableWidgetItem(text))
+            self.results.append((source, address))
+            row += 1
+            
+    def on_search_done(self, count, cancelled):
+        self.search_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        if count >= SearchThread.MAX_RESULTS:
+            self.status_label.setText(f"结果超过 {SearchThread.MAX_RESULTS} 条，搜索已停止")
+        elif cancelled:
+            self.status_label.setText(f"搜索已取消，找到 {count} 处")
+        else:
+            self.progress_bar.setValue(100)
+            self.status_label.setText(f"搜索完成，找到 {count} 处")
+            
+    def goto_result(self, row, column):
+        source, address = self.results[row]
+        self.parent().show_address(source, address)
+        
+    def closeEvent(self, event):
+        self.stop_search()
+        super().closeEvent(event)
+        
+    def reject(self):
+        self.stop_search()
+        super().reject()
+
+class DiffDialog(QDialog):
+    """镜像比较对话框（非模态）：左侧为不同区间列表，右侧按地址对齐并排显示两个镜像，不同的字节标为红色"""
+    # 列表中最多显示的区间数
+    MAX_ROWS = 10000
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle("比较镜像")
+        self.resize(1300, 700)
+        # 每侧选择的文件路径
+        self.paths = {}
+        self.ranges = []
+        self.initUI()
+        
+    def initUI(self):
+        layout = QVBoxLayout(self)
+        
+        # 比较对象选择：已加载的数据或文件（例如从 Flash 读回的数据）
+        select_layout = QHBoxLayout()
+        self.source_combos = {}
+        for side in ("A", "B"):
+            combo = QComboBox()
+            for source, label in SearchDialog.SOURCES.items():
+                combo.addItem(label, source)
+            combo.addItem("文件...", "file")
+            combo.activated.connect(lambda index, side=side: self.on_source_selected(side))
+            self.source_combos[side] = combo
+            select_layout.addWidget(QLabel(f"{side}:"))
+            select_layout.addWidget(combo)
+        self.source_combos["B"].setCurrentIndex(2)
+        
+        select_layout.addWidget(QLabel("BIN 文件起始地址:"))
+        self.base_input = QLineEdit(f"0x{self.parent().boot_start:08X}")
+        self.base_input.setMaximumWidth(120)
+        select_layout.addWidget(self.base_input)
+        self.compare_btn = QPushButton("比较")
+        self.compare_btn.clicked.connect(self.compare)
+        select_layout.addWidget(self.compare_btn)
+        select_layout.addStretch()
+        layout.addLayout(select_layout)
+        
+        splitter = QSplitter(Qt.Horizontal)
+        
+        self.range_table = QTableWidget()
+        self.range_table.setColumnCount(3)
+        self.range_table.setHorizontalHeaderLabels(["地址", "长度", "类型"])
+        self.range_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.range_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.range_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.range_table.cellClicked.connect(self.goto_range)
+        splitter.addWidget(self.range_table)
+        
+        # 两个查看器显示相同的地址范围，垂直滚动同步
+        self.viewers = {}
+        self.viewer_labels = {}
+        for side in ("A", "B"):
+            panel = QWidget()
+            panel_layout = QVBoxLayout(panel)
+            panel_layout.setContentsMargins(0, 0, 0, 0)
+            self.viewer_labels[side] = QLabel(side)
+            self.viewers[side] = HexViewer()
+            panel_layout.addWidget(self.viewer_labels[side])
+            panel_layout.addWidget(self.viewers[side])
+            splitter.addWidget(panel)
+        bar_a = self.viewers["A"].verticalScrollBar()
+        bar_b = self.viewers["B"].verticalScrollBar()
+        bar_a.valueChanged.connect(bar_b.setValue)
+        bar_b.valueChanged.connect(bar_a.setValue)
+        splitter.setSizes([300, 500, 500])
+        layout.addWidget(splitter)
+        
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        
+    def on_source_selected(self, side):
+        """选择"文件..."时打开文件对话框"""
+        combo = self.source_combos[side]
+        if combo.currentData() != "file":
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, f"选择比较文件 {side}", "", loaders.FILE_FILTER)
+        if file_path:
+            self.paths[side] = file_path
+            combo.setItemText(combo.count() - 1, os.path.basename(file_path))
+        elif side not in self.paths:
+            combo.setCurrentIndex(0)
+            
+    def side_data(self, side, base_address):
+        """返回 (数据, 起始地址, 名称)，没有数据时返回 None"""
+        source = self.source_combos[side].currentData()
+        if source == "file":
+            path = self.paths[side]
+            data = core.load_input(path)
+            return data, self.parent().data_base_address(data, base_address), os.path.basename(path)
+        viewer = self.parent().viewer(source)
+        if viewer.data is None:
+            return None
+        return viewer.data, viewer.base_address, SearchDialog.SOURCES[source]
+        
+    def compare(self):
+        from binmerge import diff
+        try:
+            base_address = int(self.base_input.text(), 0)
+        except ValueError:
+            QMessageBox.warning(self, "警告", "请输入有效的起始地址")
+            return
+            
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            sides = {side: self.side_data(side, base_address) for side in ("A", "B")}
+            missing = [side for side, value in sides.items() if value is None]
+            if missing:
+                raise core.MergeError(f"{'、'.join(missing)} 没有数据")
+            (data_a, base_a, name_a), (data_b, base_b, name_b) = sides["A"], sides["B"]
+            result = diff.compare(data_a, data_b, base_a, base_b)
+        except (OSError, core.MergeError) as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.warning(self, "警告", f"比较失败: {e}")
+            return
+        QApplication.restoreOverrideCursor()
+        
+        # 两侧扩展到相同的地址范围，同一行显示相同的地址
+        marks = [(r.address - result.start, r.end - result.start) for r in result.ranges]
+        for side, image, name in (("A", result.a, name_a), ("B", result.b, name_b)):
+            viewer = self.viewers[side]
+            viewer.setData(diff.aligned(image, result.start, result.end), result.start)
+            viewer.set_marked_ranges(marks)
+            self.viewer_labels[side].setText(
+                f"{side}: {name} (0x{image.base_address:08X}-0x{image.end_address:08X})")
+        
+        self.ranges = result.ranges[:self.MAX_ROWS]
+        self.range_table.setRowCount(len(self.ranges))
+        for row, r in enumerate(self.ranges):
+            self.range_table.setItem(row, 0, QTableWidgetItem(f"0x{r.address:08X}"))
+            self.range_table.setItem(row, 1, QTableWidgetItem(str(r.length)))
+            self.range_table.setItem(row, 2, QTableWidgetItem(diff.KIND_LABELS[r.kind]))
+        summary = result.summary()
+        if len(result.ranges) > self.MAX_ROWS:
+            summary += f"（只列出前 {self.MAX_ROWS} 个区间）"
+        self.status_label.setText(summary)
+        if self.ranges:
+            self.goto_range(0, 0)
+            
+    def goto_range(self, row, column):
+        address = self.ranges[row].address
+        for viewer in self.viewers.values():
+            viewer.search_address(address)
 
 class BinMergerApp(QMainWindow):
+    # 内容选项卡: (类型, 标题, 地址示例)
+    CONTENT_TABS = (("boot", "BOOT 内容", "0x8000100"),
+                    ("app", "APP1 内容", "0x8020100"),
+                    ("merged", "合并后内容", "0x8000100"))
+    
+    # 监视模式下输入文件最后一次变化后等待的时间，编译器写完文件后才重新加载
+    WATCH_DELAY_MS = 100
+    # 单个输入文件的加载超时（秒）和加载进度的刷新间隔
+    LOAD_TIMEOUT = 120
+    PROGRESS_INTERVAL_MS = 100
+    
+    # 加载任务结束（在加载线程中发出，由界面线程处理）
+    load_finished = pyqtSignal(object)
+    
     def __init__(self):
         super().__init__()
-        self.boot_start = 0x8000000
-        self.boot_size = 0x100000
-        self.app_start = 0x8020000
-        self.app_size = 0x20000
+        self.boot_start = core.DEFAULT_BOOT_START
+        self.boot_size = core.DEFAULT_BOOT_SIZE
+        self.app_start = core.DEFAULT_APP_START
+        self.app_size = core.DEFAULT_APP_SIZE
         self.boot_data = None
         self.app_data = None
         self.merged_data = None
+        self.merge_result = None
+        # 布局文件中除BOOT/APP1以外的区域及其数据
+        self.extra_regions = []
+        self.region_data = {}
+        # 占用热图的 Flash 页大小和扫描线程
+        self.page_size = occupancy.DEFAULT_PAGE_SIZE
+        self.occupancy_thread = None
+        # APP 的链接地址，不为 None 时合并时重定位全部中断处理程序
+        self.app_link_address = None
+        # 布局文件中的扇区 CRC 表设置，不为 None 时合并时写入镜像头和扇区 CRC 表
+        self.sector_table = None
+        # 加载文件时计算并显示的校验算法
+        self.checksum_algorithms = checksum.DEFAULT_ALGORITHMS
+        # {区域名: 输入内容的 SHA256}，用作合并结果缓存的键
+        self.input_digests = {}
+        # 监视模式：{文件类型: 输入文件路径}、等待重新加载的文件和可增量更新的合并结果
+        self.input_paths = {}
+        self.changed_inputs = set()
+        self.incremental = None
+        # 性能跟踪：开启后各阶段的耗时汇总显示在状态栏，可导出为 Chrome 跟踪文件
+        self.tracer = None
         self.initUI()
         
     def initUI(self):
@@ -278,6 +956,54 @@ class BinMergerApp(QMainWindow):
         settings_action.triggered.connect(self.show_settings)
         toolbar.addAction(settings_action)
         
+        # 加载布局动作
+        layout_action = QAction("加载布局", self)
+        layout_action.triggered.connect(self.load_layout)
+        toolbar.addAction(layout_action)
+        
+        # 导出十六进制转储动作
+        export_hex_action = QAction("导出十六进制", self)
+        export_hex_action.triggered.connect(self.export_hex_dump)
+        toolbar.addAction(export_hex_action)
+        
+        # 导出压缩固件包动作
+        export_bundle_action = QAction("导出压缩包", self)
+        export_bundle_action.triggered.connect(self.export_bundle)
+        toolbar.addAction(export_bundle_action)
+        
+        # 内容搜索动作
+        search_action = QAction("搜索内容", self)
+        search_action.setShortcut(QKeySequence.Find)
+        search_action.triggered.connect(self.show_search_dialog)
+        toolbar.addAction(search_action)
+        
+        # 镜像比较动作
+        diff_action = QAction("比较镜像", self)
+        diff_action.triggered.connect(self.show_diff_dialog)
+        toolbar.addAction(diff_action)
+        
+        # 监视输入文件动作：文件变化后自动重新加载并增量更新合并结果
+        self.watch_action = QAction("监视输入", self)
+        self.watch_action.setCheckable(True)
+        self.watch_action.toggled.connect(self.set_watch_enabled)
+        toolbar.addAction(self.watch_action)
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_input_changed)
+        self.file_watcher.directoryChanged.connect(self.on_input_directory_changed)
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(self.WATCH_DELAY_MS)
+        self.watch_timer.timeout.connect(self.reload_changed_inputs)
+        
+        # 性能跟踪动作：记录加载、校验、合并、向量表修复、绘制和保存的耗时
+        self.trace_action = QAction("性能跟踪", self)
+        self.trace_action.setCheckable(True)
+        self.trace_action.toggled.connect(self.set_trace_enabled)
+        toolbar.addAction(self.trace_action)
+        export_trace_action = QAction("导出跟踪", self)
+        export_trace_action.triggered.connect(self.export_trace)
+        toolbar.addAction(export_trace_action)
+        
         # 文件选择区域
         file_group = QGroupBox("文件选择")
         file_layout = QGridLayout()
@@ -341,78 +1067,15 @@ class BinMergerApp(QMainWindow):
         content_layout = QVBoxLayout()
         
         self.tab_widget = QTabWidget()
-        
-        # BOOT 内容显示
-        boot_tab = QWidget()
-        boot_layout = QVBoxLayout(boot_tab)
-        
-        # BOOT 搜索区域
-        boot_search_layout = QHBoxLayout()
-        self.boot_search_label = QLabel("搜索地址:")
-        self.boot_search_input = QLineEdit()
-        self.boot_search_input.setPlaceholderText("十六进制地址，如: 0x8000100")
-        self.boot_search_btn = QPushButton("搜索")
-        self.boot_search_btn.clicked.connect(lambda: self.search_address("boot"))
-        
-        boot_search_layout.addWidget(self.boot_search_label)
-        boot_search_layout.addWidget(self.boot_search_input)
-        boot_search_layout.addWidget(self.boot_search_btn)
-        
-        self.boot_content = HexViewer()
-        
-        boot_layout.addLayout(boot_search_layout)
-        boot_layout.addWidget(self.boot_content)
-        
-        # APP 内容显示
-        app_tab = QWidget()
-        app_layout = QVBoxLayout(app_tab)
-        
-        # APP 搜索区域
-        app_search_layout = QHBoxLayout()
-        self.app_search_label = QLabel("搜索地址:")
-        self.app_search_input = QLineEdit()
-        self.app_search_input.setPlaceholderText("十六进制地址，如: 0x8020100")
-        self.app_search_btn = QPushButton("搜索")
-        self.app_search_btn.clicked.connect(lambda: self.search_address("app"))
-        
-        # APP 向量表按钮
-        self.app_vector_btn = QPushButton("查看中断向量表")
-        self.app_vector_btn.clicked.connect(self.show_app_vector_table)
-        
-        app_search_layout.addWidget(self.app_search_label)
-        app_search_layout.addWidget(self.app_search_input)
-        app_search_layout.addWidget(self.app_search_btn)
-        app_search_layout.addWidget(self.app_vector_btn)
-        
-        self.app_content = HexViewer()
-        
-        app_layout.addLayout(app_search_layout)
-        app_layout.addWidget(self.app_content)
-        
-        # 合并后内容显示
-        merged_tab = QWidget()
-        merged_layout = QVBoxLayout(merged_tab)
-        
-        # 合并后搜索区域
-        merged_search_layout = QHBoxLayout()
-        self.merged_search_label = QLabel("搜索地址:")
-        self.merged_search_input = QLineEdit()
-        self.merged_search_input.setPlaceholderText("十六进制地址，如: 0x8000100")
-        self.merged_search_btn = QPushButton("搜索")
-        self.merged_search_btn.clicked.connect(lambda: self.search_address("merged"))
-        
-        merged_search_layout.addWidget(self.merged_search_label)
-        merged_search_layout.addWidget(self.merged_search_input)
-        merged_search_layout.addWidget(self.merged_search_btn)
-        
-        self.merged_content = HexViewer()
-        
-        merged_layout.addLayout(merged_search_layout)
-        merged_layout.addWidget(self.merged_content)
-        
-        self.tab_widget.addTab(boot_tab, "BOOT 内容")
-        self.tab_widget.addTab(app_tab, "APP1 内容")
-        self.tab_widget.addTab(merged_tab, "合并后内容")
+        # 选项卡的搜索栏和十六进制查看器在第一次显示或使用时才创建，启动时只创建当前显示的选项卡
+        self.viewers = {}
+        self.search_inputs = {}
+        for _, title, _ in self.CONTENT_TABS:
+            page = QWidget()
+            QVBoxLayout(page)
+            self.tab_widget.addTab(page, title)
+        self.tab_widget.currentChanged.connect(self.build_content_tab)
+        self.build_content_tab(self.tab_widget.currentIndex())
         
         content_layout.addWidget(self.tab_widget)
         content_group.setLayout(content_layout)
@@ -438,17 +1101,45 @@ class BinMergerApp(QMainWindow):
         
         main_layout.addLayout(button_layout)
         
-        # 进度条
+        # 进度条（同时加载的全部文件按字节汇总）和取消加载按钮
+        progress_layout = QHBoxLayout()
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
-        main_layout.addWidget(self.progress_bar)
+        self.cancel_load_btn = QPushButton("取消加载")
+        self.cancel_load_btn.setVisible(False)
+        self.cancel_load_btn.clicked.connect(self.cancel_loads)
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_load_btn)
+        main_layout.addLayout(progress_layout)
+        
+        # 合并、保存任务的进度条和取消按钮
+        task_layout = QHBoxLayout()
+        self.task_progress_bar = QProgressBar()
+        self.task_progress_bar.setVisible(False)
+        self.cancel_task_btn = QPushButton("取消")
+        self.cancel_task_btn.setVisible(False)
+        self.cancel_task_btn.clicked.connect(self.cancel_task)
+        task_layout.addWidget(self.task_progress_bar)
+        task_layout.addWidget(self.cancel_task_btn)
+        main_layout.addLayout(task_layout)
         
         # 状态栏
         self.statusBar().showMessage('就绪')
         
-        # 加载线程
-        self.boot_loader = None
-        self.app_loader = None
+        # 加载池在第一次加载时创建；{文件类型: (加载任务, 起始地址, 大小, 跟踪记录位置)}
+        self.loader_pool = None
+        self.loads = {}
+        self.load_finished.connect(self.on_load_finished)
+        self.load_timer = QTimer(self)
+        self.load_timer.setInterval(self.PROGRESS_INTERVAL_MS)
+        self.load_timer.timeout.connect(self.update_load_progress)
+        # 正在执行的合并或保存任务；任务期间监视模式重新加载的输入 {区域名: 数据}，任务结束后再更新合并结果
+        self.task = None
+        self.deferred_remerge = {}
+        
+        # 内容搜索对话框，首次使用时创建
+        self.search_dialog = None
+        self.diff_dialog = None
         
     def show_settings(self):
         """显示设置对话框"""
@@ -461,20 +1152,175 @@ class BinMergerApp(QMainWindow):
                 self.boot_start, self.boot_size = settings
                 self.update_memory_map()
                 self.statusBar().showMessage('内存设置已更新')
+                self.validate_layout()
+                
+    def current_layout(self):
+        """当前的内存布局：BOOT、APP1 以及布局文件中的其他区域"""
+        layout = core.two_region_layout(self.boot_start, self.boot_size, self.app_start, self.app_size,
+                                        self.app_link_address, self.sector_table)
+        for region in self.extra_regions:
+            layout.add(region)
+        return layout
+        
+    def current_inputs(self):
+        """{区域名: 已加载的数据}"""
+        inputs = {name: data for name, data in self.region_data.items() if data is not None}
+        if self.boot_data is not None:
+            inputs[core.BOOT_REGION] = self.boot_data
+        if self.app_data is not None:
+            inputs[core.APP_REGION] = self.app_data
+        return inputs
+        
+    def validate_layout(self):
+        """检查区域是否重叠，有问题时给出警告"""
+        try:
+            self.current_layout().validate()
+            return True
+        except core.LayoutError as e:
+            QMessageBox.warning(self, "警告", f"内存布局无效: {e}")
+            return False
                 
     def update_memory_map(self):
-        """更新内存映射显示"""
-        boot_used = len(self.boot_data) if self.boot_data else 0
-        app_used = len(self.app_data) if self.app_data else 0
-        self.memory_map.set_memory_info(
-            self.boot_start, self.boot_size,
-            self.app_start, self.app_size,
-            boot_used, app_used
-        )
+        """更新内存映射显示，没有扫描结果的区域在后台扫描占用情况"""
+        inputs = self.current_inputs()
+        layout = self.current_layout()
+        self.memory_map.set_regions([
+            (region.name, region.start, region.size, len(inputs.get(region.name) or b''))
+            for region in layout
+        ])
+        
+        pending = []
+        for region in layout:
+            data = inputs.get(region.name)
+            page_map = None
+            if data is not None:
+                digest = self.input_digests.get(region.name)
+                page_map = occupancy.cached(data, digest, region.start, region.size, self.page_size, layout.fill)
+                if page_map is None:
+                    pending.append((region.name, data, digest, region.start, region.size))
+            self.memory_map.set_page_map(region.name, page_map)
+        if self.occupancy_thread is not None and self.occupancy_thread.isRunning():
+            self.occupancy_thread.cancel()
+            self.occupancy_thread.wait()
+        self.occupancy_thread = None
+        if pending:
+            self.occupancy_thread = OccupancyThread(pending, self.page_size, layout.fill)
+            self.occupancy_thread.scanned.connect(self.memory_map.set_page_map)
+            self.occupancy_thread.start()
+        
+    def load_layout(self):
+        """加载布局文件，BOOT/APP1 区域更新地址设置，其他区域作为附加区域加载"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择布局文件", "", "Layout Files (*.json)")
+        if not file_path:
+            return
+            
+        try:
+            layout = core.Layout.load(file_path)
+            layout.validate()
+        except (OSError, core.LayoutError) as e:
+            QMessageBox.critical(self, "错误", f"加载布局失败: {str(e)}")
+            return
+            
+        self.extra_regions = []
+        self.region_data = {}
+        self.sector_table = layout.sector_table
+        self.input_paths = {name: path for name, path in self.input_paths.items() if name in ("boot", "app")}
+        for region in layout:
+            if region.name == core.BOOT_REGION:
+                self.boot_start, self.boot_size = region.start, region.size
+                self.boot_addr_value.setText(f"0x{region.start:08X} (大小: 0x{region.size:08X})")
+                if region.path:
+                    self.boot_path.setText(region.path)
+                    self.start_loader("boot", region.path, region.start, region.size)
+            elif region.name == core.APP_REGION:
+                self.app_start, self.app_size = region.start, region.size
+                self.app_addr_value.setText(f"0x{region.start:08X} (大小: 0x{region.size:08X})")
+                if region.path:
+                    self.app_path.setText(region.path)
+                    self.start_loader("app", region.path, region.start, region.size)
+            else:
+                self.extra_regions.append(region)
+                self.region_data[region.name] = None
+                if region.path:
+                    self.start_loader(region.name, region.path, region.start, region.size)
+                    
+        self.update_memory_map()
+        self.statusBar().showMessage(f'布局已加载: {file_path} ({len(layout)} 个区域)')
+        
+    def start_loader(self, file_type, file_path, start_addr, size):
+        """在加载池中加载文件，file_type 为 "boot"、"app" 或附加区域名；该类型正在加载的旧文件被取消
+
+        大文件以内存映射方式加载，数据以 memoryview 原样传给界面，不做额外复制；
+        监视输入时文件随时会被改写，一律读入内存。
+        校验和在读取过程中逐块计算，文件未变化时直接使用磁盘缓存中的结果。
+        """
+        from binmerge import loadpool, mergecache
+        if self.loader_pool is None:
+            self.loader_pool = loadpool.LoaderPool(timeout=self.LOAD_TIMEOUT, cache=checksum.default_cache())
+        self.input_paths[file_type] = file_path
+        watching = self.watch_action.isChecked()
+        if watching:
+            self.watch_path(file_path)
+        mark = self.trace_mark()
+        job = self.loader_pool.submit(file_type, file_path, self.checksum_algorithms + (mergecache.KEY_ALGORITHM,),
+                                      done=self.load_finished.emit, use_mmap=False if watching else None)
+        self.loads[file_type] = (job, start_addr, size, mark)
+        if not self.load_timer.isActive():
+            self.progress_bar.setValue(0)
+            self.progress_bar.setVisible(True)
+            self.cancel_load_btn.setVisible(True)
+            self.cancel_load_btn.setEnabled(True)
+            self.load_timer.start()
+            
+    def update_load_progress(self):
+        """按已处理的字节数显示全部加载任务的总进度"""
+        done, total = self.loader_pool.progress()
+        self.progress_bar.setValue(int(done * 100 / total) if total else 0)
+        
+    def cancel_loads(self):
+        """取消全部正在进行和排队的加载"""
+        if self.loader_pool is not None:
+            self.loader_pool.cancel()
+        self.cancel_load_btn.setEnabled(False)
+        self.statusBar().showMessage('正在取消加载...')
+        
+    def closeEvent(self, event):
+        # 取消未完成的加载，不等待加载线程结束；取消合并或保存并等待其删除临时文件
+        if self.loader_pool is not None:
+            self.loader_pool.shutdown()
+        if self.task is not None:
+            self.task.cancel()
+            self.task.wait()
+        super().closeEvent(event)
+        
+    def on_load_finished(self, job):
+        """加载任务结束（完成、失败、取消或超时）"""
+        from binmerge import loadpool
+        entry = self.loads.get(job.key)
+        if entry is None or entry[0] is not job:
+            # 已被同一类型的新加载替换
+            return
+        del self.loads[job.key]
+        if not self.loads:
+            self.load_timer.stop()
+            self.progress_bar.setVisible(False)
+            self.cancel_load_btn.setVisible(False)
+            
+        _, start_addr, size, mark = entry
+        try:
+            data, checksums = job.result()
+        except loadpool.LoadTimeout as e:
+            self.on_file_loaded(job.key, None, str(e), start_addr, size)
+        except loadpool.LoadCancelled:
+            self.statusBar().showMessage(f'已取消加载{job.key.upper()}文件')
+        except Exception as e:
+            self.on_file_loaded(job.key, None, str(e), start_addr, size)
+        else:
+            self.on_file_loaded(job.key, data, "", start_addr, size, checksums, mark)
         
     def select_file(self, file_type):
         """选择文件并设置地址"""
-        file_path, _ = QFileDialog.getOpenFileName(self, f"选择{file_type.upper()} BIN文件", "", "BIN Files (*.bin)")
+        file_path, _ = QFileDialog.getOpenFileName(self, f"选择{file_type.upper()}文件", "", loaders.FILE_FILTER)
         if file_path:
             # 显示地址设置对话框
             dialog = AddressDialog(file_type.upper(), self)
@@ -496,171 +1342,305 @@ class BinMergerApp(QMainWindow):
                         self.boot_size = size
                         self.boot_addr_value.setText(f"0x{start_addr:08X} (大小: 0x{size:08X})")
                         self.statusBar().showMessage('正在加载BOOT文件...')
-                        self.progress_bar.setVisible(True)
                         
                         # 使用线程加载文件
-                        self.boot_loader = FileLoaderThread(file_path, "boot", start_addr, size)
-                        self.boot_loader.finished.connect(self.on_file_loaded)
-                        self.boot_loader.progress.connect(self.progress_bar.setValue)
-                        self.boot_loader.start()
+                        self.start_loader("boot", file_path, start_addr, size)
                     else:
                         self.app_path.setText(file_path)
                         self.app_start = start_addr
                         self.app_size = size
                         self.app_addr_value.setText(f"0x{start_addr:08X} (大小: 0x{size:08X})")
                         self.statusBar().showMessage('正在加载APP1文件...')
-                        self.progress_bar.setVisible(True)
                         
                         # 使用线程加载文件
-                        self.app_loader = FileLoaderThread(file_path, "app", start_addr, size)
-                        self.app_loader.finished.connect(self.on_file_loaded)
-                        self.app_loader.progress.connect(self.progress_bar.setValue)
-                        self.app_loader.start()
+                        self.start_loader("app", file_path, start_addr, size)
+                        
+                    self.validate_layout()
             
-    def on_file_loaded(self, file_type, data, error, start_addr, size):
-        """文件加载完成回调"""
-        self.progress_bar.setVisible(False)
+    def on_file_loaded(self, file_type, data, error, start_addr, size, checksums=None, mark=None):
+        """文件加载完成回调，mark 为开始加载时的跟踪记录位置"""
+        from binmerge import mergecache
         
         if error:
             QMessageBox.critical(self, "错误", f"加载{file_type.upper()}文件失败: {error}")
             self.statusBar().showMessage('文件加载失败')
             return
             
+        if checksums is None:
+            checksums = checksum.compute(core.iter_chunks(data), self.checksum_algorithms + (mergecache.KEY_ALGORITHM,))
+        region_name = {"boot": core.BOOT_REGION, "app": core.APP_REGION}.get(file_type, file_type)
+        self.input_digests[region_name] = checksums.get(mergecache.KEY_ALGORITHM)
+        # 只显示选定的校验算法
+        checksums = {name: checksums[name] for name in self.checksum_algorithms if name in checksums}
+            
         if file_type == "boot":
             self.boot_data = data
-            self.boot_content.setData(data, start_addr)
+            self.viewer("boot").setData(data, self.data_base_address(data, start_addr), self.watch_action.isChecked())
             
-            # 计算并显示校验和
-            crc32 = zlib.crc32(data) & 0xFFFFFFFF
-            md5 = hashlib.md5(data).hexdigest()
-            self.boot_checksum_value.setText(f"CRC32: 0x{crc32:08X}, MD5: {md5}")
+            # 显示加载时计算的校验和
+            self.boot_checksum_value.setText(checksum.format_checksums(checksums))
             
             # 验证地址范围
             if len(data) > size:
                 QMessageBox.warning(self, "警告", 
                                    f"BOOT文件大小({len(data)}字节)超过分配的空间({size}字节)")
             
-            self.statusBar().showMessage(f'BOOT文件加载成功，大小: {len(data)} 字节')
-        else:
+            self.statusBar().showMessage(self.trace_message(f'BOOT文件加载成功，大小: {len(data)} 字节', mark))
+        elif file_type == "app":
             self.app_data = data
-            self.app_content.setData(data, start_addr)
+            self.viewer("app").setData(data, self.data_base_address(data, start_addr), self.watch_action.isChecked())
             
-            # 计算并显示校验和
-            crc32 = zlib.crc32(data) & 0xFFFFFFFF
-            md5 = hashlib.md5(data).hexdigest()
-            self.app_checksum_value.setText(f"CRC32: 0x{crc32:08X}, MD5: {md5}")
+            # 显示加载时计算的校验和
+            self.app_checksum_value.setText(checksum.format_checksums(checksums))
             
             # 验证地址范围
             if len(data) > size:
                 QMessageBox.warning(self, "警告", 
                                    f"APP1文件大小({len(data)}字节)超过分配的空间({size}字节)")
             
-            self.statusBar().showMessage(f'APP1文件加载成功，大小: {len(data)} 字节')
+            self.statusBar().showMessage(self.trace_message(f'APP1文件加载成功，大小: {len(data)} 字节', mark))
+        else:
+            # 布局文件中的附加区域
+            self.region_data[file_type] = data
+            if len(data) > size:
+                QMessageBox.warning(self, "警告", 
+                                   f"{file_type}文件大小({len(data)}字节)超过分配的空间({size}字节)")
+            self.statusBar().showMessage(self.trace_message(f'{file_type}文件加载成功，大小: {len(data)} 字节 | '
+                                                            f'{checksum.format_checksums(checksums)}', mark))
             
+        if self.watch_action.isChecked() and self.incremental is not None:
+            if self.task is not None:
+                # 后台任务正在使用合并结果，结束后再更新
+                self.deferred_remerge[region_name] = data
+            else:
+                self.remerge_input(region_name, data)
         self.update_memory_map()
         self.check_merge_ability()
             
+    @staticmethod
+    def data_base_address(data, start_addr):
+        """HEX/S-record/ELF 加载结果带有自身的地址，BIN 数据从区域起始地址开始"""
+        return data.base_address if isinstance(data, core.SparseImage) else start_addr
+            
     def check_merge_ability(self):
-        """检查是否可以合并文件"""
-        if self.boot_data is not None and self.app_data is not None:
+        """检查是否可以合并文件（后台任务执行期间不能合并）"""
+        if self.boot_data is not None and self.app_data is not None and self.task is None:
             self.merge_btn.setEnabled(True)
             
-    def merge_files(self):
-        try:
-            # 检查文件大小是否超过限制
-            if len(self.boot_data) > self.boot_size:
-                QMessageBox.warning(self, "警告", 
-                                   f"BOOT文件大小({len(self.boot_data)}字节)超过分配的空间({self.boot_size}字节)")
-                return
-                
-            if len(self.app_data) > self.app_size:
-                QMessageBox.warning(self, "警告", 
-                                   f"APP1文件大小({len(self.app_data)}字节)超过分配的空间({self.app_size}字节)")
-                return
-            
-            # 创建合并后的数据
-            # 从BOOT起始地址到APP结束地址
-            total_size = (self.app_start - self.boot_start) + self.app_size
-            self.merged_data = bytearray(total_size)
-            
-            # 填充0xFF（模拟擦除后的Flash）
-            for i in range(total_size):
-                self.merged_data[i] = 0xFF
+    def start_task(self, description, fn, on_done):
+        """在后台执行合并或保存任务 fn(progress)，结束后在界面线程调用 on_done(结果, 异常)
+
+        任务期间合并和另存为按钮不可用，任务结束后恢复。
+        """
+        self.merge_btn.setEnabled(False)
+        self.save_btn.setEnabled(False)
+        self.task_progress_bar.setValue(0)
+        self.task_progress_bar.setFormat(f'{description} %p%')
+        self.task_progress_bar.setVisible(True)
+        self.cancel_task_btn.setText(f'取消{description}')
+        self.cancel_task_btn.setEnabled(True)
+        self.cancel_task_btn.setVisible(True)
+        self.statusBar().showMessage(f'正在{description}...')
+        
+        self.task = TaskThread(fn)
+        self.task.progress.connect(self.task_progress_bar.setValue)
+        self.task.done.connect(lambda result, error: self.finish_task(on_done, result, error))
+        self.task.start()
+        
+    def finish_task(self, on_done, result, error):
+        self.task.wait()
+        self.task = None
+        self.task_progress_bar.setVisible(False)
+        self.cancel_task_btn.setVisible(False)
+        self.check_merge_ability()
+        self.save_btn.setEnabled(self.merged_data is not None)
+        on_done(result, error)
+        
+        # 任务期间重新加载的输入
+        deferred, self.deferred_remerge = self.deferred_remerge, {}
+        for name, data in deferred.items():
+            if self.incremental is not None:
+                self.remerge_input(name, data)
                 
-            # 写入BOOT数据
-            boot_offset = 0  # BOOT从地址0开始
-            self.merged_data[boot_offset:boot_offset + len(self.boot_data)] = self.boot_data
+    def cancel_task(self):
+        """取消正在执行的合并或保存"""
+        if self.task is not None:
+            self.task.cancel()
+            self.cancel_task_btn.setEnabled(False)
             
-            # 写入APP数据
-            app_offset = self.app_start - self.boot_start  # 计算APP在合并文件中的偏移
-            self.merged_data[app_offset:app_offset + len(self.app_data)] = self.app_data
-            
-            # 自动填充中断向量表
-            self.fix_interrupt_vector_table()
-            
-            # 显示合并后的内容
-            self.merged_content.setData(self.merged_data, self.boot_start)
-            self.tab_widget.setCurrentIndex(2)  # 切换到合并后内容选项卡
+    def merge_files(self):
+        """在后台按布局合并（检查区域重叠和文件大小），空隙填充0xFF，并自动修复APP中断向量表
+
+        输入和布局都未变化时直接使用缓存的合并结果。
+        """
+        from binmerge import mergecache, watch
+        mark = self.trace_mark()
+        try:
+            layout = self.current_layout()
+        except core.MergeError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        # 输入数据只读，后台线程直接引用，不复制
+        inputs = self.current_inputs()
+        digests = dict(self.input_digests)
+        
+        def merge(progress):
+            result = mergecache.merge_cached(layout, inputs, digests, progress=progress)
+            return watch.IncrementalMerge(layout, inputs, result=result)
             
-            self.statusBar().showMessage(f'文件合并成功，总大小: {total_size} 字节')
-            self.save_btn.setEnabled(True)
-            QMessageBox.information(self, "成功", "文件合并完成！")
+        self.start_task("合并", merge, lambda incremental, error: self.on_merged(incremental, error, mark))
+        
+    def on_merged(self, incremental, error, mark):
+        """合并任务结束"""
+        if isinstance(error, core.Cancelled):
+            self.statusBar().showMessage('已取消合并')
+            return
+        if isinstance(error, core.MergeError):
+            self.statusBar().showMessage('合并失败')
+            QMessageBox.warning(self, "警告", str(error))
+            return
+        if error is not None:
+            self.statusBar().showMessage('合并失败')
+            QMessageBox.critical(self, "错误", f"合并文件失败: {str(error)}")
+            return
             
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"合并文件失败: {str(e)}")
+        result = incremental.result
+        self.incremental = incremental
+        self.merge_result = result
+        self.merged_data = result.data
+        total_size = result.size
+        
+        # 显示合并后的内容
+        self.viewer("merged").setData(self.merged_data, result.base_address)
+        self.tab_widget.setCurrentIndex(2)  # 切换到合并后内容选项卡
+        
+        message = f'文件合并成功，总大小: {total_size} 字节'
+        for name, reset_vector in result.reset_vectors.items():
+            message += f' | 已修复{name}中断向量表，复位向量: 0x{reset_vector:08X}'
+        table = incremental.layout.sector_table
+        if table is not None:
+            message += f' | 扇区 CRC 表: 0x{table.address:08X}（{table.region}，扇区 0x{table.sector_size:X}）'
+        if result.cached:
+            message += ' | 使用缓存的合并结果'
+            if result.checksums:
+                message += f' | {checksum.format_checksums(result.checksums)}'
+        self.statusBar().showMessage(self.trace_message(message, mark))
+        self.save_btn.setEnabled(True)
+        QMessageBox.information(self, "成功", "文件合并完成！")
             
-    def fix_interrupt_vector_table(self):
-        """修复APP的中断向量表"""
-        if not self.app_data or len(self.app_data) < 512:  # 确保有足够的数据
+    def remerge_input(self, name, data):
+        """监视模式下输入重新加载后，只更新合并结果中该区域的数据并刷新显示"""
+        from binmerge import watch
+        started = time.perf_counter()
+        mark = self.trace_mark()
+        layout = self.current_layout()
+        try:
+            if self.incremental.layout.to_dict() != layout.to_dict():
+                # 合并后修改过地址设置，按新布局完整合并
+                self.incremental = watch.IncrementalMerge(layout, self.current_inputs())
+            else:
+                self.incremental.update(name, data)
+        except core.MergeError as e:
+            self.statusBar().showMessage(f'{name}已重新加载，但无法合并: {e}')
             return
             
-        # 检查是否需要修复向量表
-        # 对于STM32，前两个字是初始堆栈指针和复位向量
-        # 复位向量应该指向APP区域的复位处理程序
-        
-        # 读取当前的复位向量
-        reset_vector = struct.unpack_from('<I', self.app_data, 4)[0]
-        
-        # 如果复位向量不在APP区域内，可能需要修复
-        if not (self.app_start <= reset_vector < self.app_start + len(self.app_data)):
-            # 计算新的复位向量（假设复位处理程序在APP起始地址+1处）
-            new_reset_vector = self.app_start + 1
-            
-            # 更新合并数据中的向量表
-            app_offset = self.app_start - self.boot_start
-            struct.pack_into('<I', self.merged_data, app_offset + 4, new_reset_vector)
+        result = self.incremental.result
+        self.merge_result = result
+        self.merged_data = result.data
+        self.viewer("merged").setData(self.merged_data, result.base_address, keep_position=True)
+        result.checksums = {'crc32': self.incremental.crc32()}
+        elapsed = (time.perf_counter() - started) * 1000
+        self.statusBar().showMessage(self.trace_message(f'{name}已更新，合并结果已刷新（用时 {elapsed:.1f} 毫秒）| '
+                                                        f'{checksum.format_checksums(result.checksums)}', mark))
+        
+    def set_watch_enabled(self, enabled):
+        """开启或关闭输入文件监视"""
+        watched = self.file_watcher.files() + self.file_watcher.directories()
+        if watched:
+            self.file_watcher.removePaths(watched)
+        self.changed_inputs.clear()
+        if enabled:
+            inputs = {"boot": self.boot_data, "app": self.app_data, **self.region_data}
+            for file_type, path in list(self.input_paths.items()):
+                self.watch_path(path)
+                if core.is_mapped(inputs.get(file_type)) or file_type in self.loads:
+                    # 以映射方式加载（或正在加载）的文件重新读入内存，合并结果不再引用会被改写的文件
+                    start, size = self.region_bounds(file_type)
+                    self.start_loader(file_type, path, start, size)
+            self.statusBar().showMessage('正在监视输入文件，文件变化后自动重新加载并更新合并结果')
+        else:
+            self.statusBar().showMessage('已停止监视输入文件')
             
-            self.statusBar().showMessage(f'已修复中断向量表，复位向量: 0x{new_reset_vector:08X}')
+    def watch_path(self, path):
+        """监视文件及其所在目录（编译器常删除后重新生成文件，此时对文件本身的监视会失效）"""
+        path = os.path.abspath(path)
+        watched = set(self.file_watcher.files()) | set(self.file_watcher.directories())
+        paths = [p for p in (path, os.path.dirname(path)) if p not in watched and os.path.exists(p)]
+        if paths:
+            self.file_watcher.addPaths(paths)
             
+    def on_input_changed(self, path):
+        """输入文件变化，等待 WATCH_DELAY_MS 内不再变化后重新加载"""
+        self.changed_inputs.add(os.path.abspath(path))
+        self.watch_timer.start()
+        
+    def on_input_directory_changed(self, directory):
+        """目录变化时检查被删除后重新生成的输入文件"""
+        watched = set(self.file_watcher.files())
+        for path in self.input_paths.values():
+            path = os.path.abspath(path)
+            if os.path.dirname(path) == directory and path not in watched and os.path.exists(path):
+                self.changed_inputs.add(path)
+                self.watch_timer.start()
+                
+    def region_bounds(self, file_type):
+        """文件类型对应区域的 (起始地址, 大小)"""
+        if file_type == "boot":
+            return self.boot_start, self.boot_size
+        if file_type == "app":
+            return self.app_start, self.app_size
+        region = next(region for region in self.extra_regions if region.name == file_type)
+        return region.start, region.size
+        
+    def reload_changed_inputs(self):
+        """重新加载变化过的输入文件"""
+        changed, self.changed_inputs = self.changed_inputs, set()
+        for file_type, path in list(self.input_paths.items()):
+            if os.path.abspath(path) in changed and os.path.exists(path):
+                start, size = self.region_bounds(file_type)
+                self.start_loader(file_type, path, start, size)
+                
     def show_app_vector_table(self):
         """显示APP的中断向量表"""
-        if not self.app_data or len(self.app_data) < 512:
+        if self.app_data is None or len(self.app_data) < vectors.SYSTEM_VECTORS * 4:
             QMessageBox.warning(self, "警告", "APP数据不足或未加载，无法显示中断向量表")
             return
             
-        # 提取前16个中断向量（通常足够显示主要的中断）
-        vector_table = []
-        for i in range(0, min(64, len(self.app_data) // 4)):
-            try:
-                vector = struct.unpack_from('<I', self.app_data, i * 4)[0]
-                vector_table.append(vector)
-            except:
-                break
-                
-        dialog = VectorTableDialog(vector_table, self)
-        dialog.exec_()
+        dialog = VectorTableDialog(self.app_vector_data(), self.app_start, self.app_size, self.app_link_address, self,
+                                   self.input_digests.get(core.APP_REGION))
+        accepted = dialog.exec_() == QDialog.Accepted
+        link_address = dialog.link_address()
+        # 对话框引用着 APP 数据，关闭后立即删除，重新加载后不再保留旧数据
+        dialog.deleteLater()
+        if accepted and link_address != self.app_link_address:
+            self.app_link_address = link_address
+            if link_address is None:
+                self.statusBar().showMessage('合并时只修复复位向量')
+            else:
+                self.statusBar().showMessage(f'合并时按链接地址 0x{link_address:08X} 重定位向量表')
+                    
+    def app_vector_data(self):
+        """从 APP 区域起始地址开始的数据（向量表所在位置）"""
+        data = self.app_data
+        if isinstance(data, core.SparseImage) and data.base_address != self.app_start:
+            if data.base_address < self.app_start < data.end_address:
+                return data.slice(self.app_start, data.end_address - self.app_start)
+        return data
             
     def search_address(self, file_type):
         """搜索指定地址"""
-        if file_type == "boot":
-            viewer = self.boot_content
-            input_field = self.boot_search_input
-        elif file_type == "app":
-            viewer = self.app_content
-            input_field = self.app_search_input
-        else:  # merged
-            viewer = self.merged_content
-            input_field = self.merged_search_input
+        viewer = self.viewer(file_type)
+        input_field = self.search_inputs[file_type]
             
         # 获取输入的地址
         addr_text = input_field.text().strip()
@@ -683,28 +1663,207 @@ class BinMergerApp(QMainWindow):
         except ValueError:
             QMessageBox.warning(self, "警告", "请输入有效的十六进制或十进制地址")
             
+    def viewer(self, file_type):
+        """返回 "boot"、"app" 或 "merged" 对应的十六进制查看器（尚未创建时创建）"""
+        if file_type not in self.viewers:
+            self.build_content_tab([tab[0] for tab in self.CONTENT_TABS].index(file_type))
+        return self.viewers[file_type]
+        
+    def build_content_tab(self, index):
+        """创建第 index 个选项卡的搜索栏和十六进制查看器，已创建时不做任何事"""
+        file_type, _, example = self.CONTENT_TABS[index]
+        if file_type in self.viewers:
+            return
+        page_layout = self.tab_widget.widget(index).layout()
+        
+        # 搜索区域
+        search_layout = QHBoxLayout()
+        search_input = QLineEdit()
+        search_input.setPlaceholderText(f"十六进制地址，如: {example}")
+        search_btn = QPushButton("搜索")
+        search_btn.clicked.connect(lambda: self.search_address(file_type))
+        
+        search_layout.addWidget(QLabel("搜索地址:"))
+        search_layout.addWidget(search_input)
+        search_layout.addWidget(search_btn)
+        
+        if file_type == "app":
+            # APP 向量表按钮
+            vector_btn = QPushButton("查看中断向量表")
+            vector_btn.clicked.connect(self.show_app_vector_table)
+            search_layout.addWidget(vector_btn)
+            
+        viewer = HexViewer()
+        page_layout.addLayout(search_layout)
+        page_layout.addWidget(viewer)
+        self.search_inputs[file_type] = search_input
+        self.viewers[file_type] = viewer
+        
+    def show_address(self, file_type, address):
+        """切换到对应选项卡并定位到地址"""
+        self.tab_widget.setCurrentIndex(["boot", "app", "merged"].index(file_type))
+        if self.viewer(file_type).search_address(address):
+            self.statusBar().showMessage(f"已定位到地址: 0x{address:08X}")
+            
+    def show_search_dialog(self):
+        """显示内容搜索对话框"""
+        if self.search_dialog is None:
+            self.search_dialog = SearchDialog(self)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+        
+    def show_diff_dialog(self):
+        """显示镜像比较对话框"""
+        if self.diff_dialog is None:
+            self.diff_dialog = DiffDialog(self)
+        self.diff_dialog.show()
+        self.diff_dialog.raise_()
+        self.diff_dialog.activateWindow()
+        
+    def set_trace_enabled(self, enabled):
+        """开启或关闭性能跟踪，关闭后保留已记录的内容供导出"""
+        if enabled:
+            self.tracer = trace.enable()
+            self.tracer.clear()
+            self.statusBar().showMessage('性能跟踪已开启，各操作的阶段耗时将显示在状态栏')
+        else:
+            trace.disable()
+            self.statusBar().showMessage('性能跟踪已关闭')
+            
+    def trace_mark(self):
+        """操作开始前的跟踪记录位置，未开启跟踪时为 None"""
+        tracer = trace.current()
+        return tracer.mark() if tracer is not None else None
+        
+    def trace_message(self, message, mark):
+        """开启跟踪时在状态栏消息后附加自 mark 以来各阶段的耗时汇总"""
+        tracer = trace.current()
+        if tracer is None or mark is None:
+            return message
+        summary = tracer.summary(mark)
+        return f'{message} | {summary}' if summary else message
+        
+    def export_trace(self):
+        """把记录的阶段耗时导出为 Chrome 跟踪 JSON（chrome://tracing 或 Perfetto 打开）"""
+        if self.tracer is None or not self.tracer.events():
+            QMessageBox.warning(self, "警告", "没有跟踪记录，请先开启性能跟踪并执行加载、合并或保存")
+            return
+            
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出性能跟踪", "trace.json", "JSON Files (*.json)")
+        if file_path:
+            try:
+                self.tracer.export(file_path)
+                self.statusBar().showMessage(f'性能跟踪已导出: {file_path} | {self.tracer.summary()}')
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"导出性能跟踪失败: {str(e)}")
+            
+    def export_hex_dump(self):
+        """把当前选项卡的内容导出为十六进制转储文本"""
+        viewer = self.viewer(self.CONTENT_TABS[self.tab_widget.currentIndex()][0])
+        if not viewer.data:
+            QMessageBox.warning(self, "警告", "当前选项卡没有可导出的数据")
+            return
+            
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出十六进制转储", "", "Text Files (*.txt)")
+        if file_path:
+            try:
+                written = hexdump.save_hex_dump(file_path, viewer.data, viewer.base_address)
+                self.statusBar().showMessage(f'十六进制转储已导出: {file_path} ({written} 字节)')
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"导出十六进制转储失败: {str(e)}")
+            
     def save_file(self):
+        from binmerge import mergecache
         if self.merged_data is None:
             return
             
-        file_path, _ = QFileDialog.getSaveFileName(self, "保存合并的BIN文件", "", "BIN Files (*.bin)")
+        file_path, selected_filter = QFileDialog.getSaveFileName(self, "保存合并的文件", "",
+                                                                 ";;".join(hexwriter.SAVE_FILTERS))
         if file_path:
-            try:
-                with open(file_path, 'wb') as f:
-                    f.write(self.merged_data)
-                    
-                # 计算合并文件的校验和
-                crc32 = zlib.crc32(self.merged_data) & 0xFFFFFFFF
-                md5 = hashlib.md5(self.merged_data).hexdigest()
-                
-                self.statusBar().showMessage(f'文件已保存: {file_path} | CRC32: 0x{crc32:08X}, MD5: {md5}')
-                QMessageBox.information(self, "成功", f"文件保存成功!\nCRC32: 0x{crc32:08X}\nMD5: {md5}")
+            # 没有输入扩展名时按选择的过滤器补全，否则按扩展名决定格式
+            if not os.path.splitext(file_path)[1]:
+                file_path += hexwriter.SAVE_FILTERS.get(selected_filter, ('bin', '.bin'))[1]
+            mark = self.trace_mark()
+            result = self.merge_result
+            # 在后台写入文件，同时计算合并文件的校验和（缓存中已有时直接使用）
+            self.start_task("保存", lambda progress: mergecache.save_merged(file_path, result, progress=progress),
+                            lambda sums, error: self.on_saved(file_path, sums, error, mark))
+            
+    def export_bundle(self):
+        """在后台把合并结果分块并行压缩为压缩固件包"""
+        from binmerge import bundle
+        if self.merged_data is None:
+            QMessageBox.warning(self, "警告", "请先合并文件")
+            return
+        if self.task is not None:
+            QMessageBox.warning(self, "警告", "请等待当前任务完成")
+            return
+            
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出压缩固件包", "",
+                                                   f"Firmware Bundle (*{bundle.EXTENSION})")
+        if file_path:
+            if not os.path.splitext(file_path)[1]:
+                file_path += bundle.EXTENSION
+            mark = self.trace_mark()
+            result = self.merge_result
+            layout = self.incremental.layout if self.incremental is not None else None
+            
+            def compress(progress):
+                return bundle.write_bundle(file_path, result.data, result.base_address, layout,
+                                           reset_vectors=result.reset_vectors, progress=progress)
                 
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"保存文件失败: {str(e)}")
+            self.start_task("压缩", compress, lambda manifest, error: self.on_bundle_saved(file_path, manifest, error, mark))
+            
+    def on_bundle_saved(self, file_path, manifest, error, mark):
+        """压缩包导出任务结束"""
+        if isinstance(error, core.Cancelled):
+            self.statusBar().showMessage('已取消导出压缩包，目标文件未改变')
+            return
+        if error is not None:
+            self.statusBar().showMessage('导出压缩包失败')
+            QMessageBox.critical(self, "错误", f"导出压缩包失败: {str(error)}")
+            return
+        self.statusBar().showMessage(self.trace_message(
+            f'压缩包已导出: {file_path} ({manifest["bundle_size"]} 字节, '
+            f'{manifest["bundle_size"] / max(1, manifest["size"]):.1%}, {len(manifest["chunks"])} 块)', mark))
+        
+    def on_saved(self, file_path, sums, error, mark):
+        """保存任务结束"""
+        if isinstance(error, core.Cancelled):
+            self.statusBar().showMessage('已取消保存，目标文件未改变')
+            return
+        if error is not None:
+            self.statusBar().showMessage('保存失败')
+            QMessageBox.critical(self, "错误", f"保存文件失败: {str(error)}")
+            return
+        self.statusBar().showMessage(self.trace_message(f'文件已保存: {file_path} | '
+                                                        f'{checksum.format_checksums(sums)}', mark))
+        QMessageBox.information(self, "成功", "文件保存成功!\n" + checksum.format_checksums(sums, "\n"))
+
+def report_startup(path, imported, constructed):
+    """窗口第一次显示后把启动各阶段的时间点写入 path（JSON）并退出，供 benchmarks/startup.py 测量启动时间"""
+    report = {
+        'started': STARTED,
+        'imported': imported,
+        'constructed': constructed,
+        'shown': time.time(),
+        'frozen': bool(getattr(sys, 'frozen', False)),
+        'modules': sorted(name for name in sys.modules if name.split('.')[0] in ('binmerge', 'PyQt5')),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f)
+    QApplication.quit()
+
 
 if __name__ == '__main__':
+    imported = time.time()
     app = QApplication(sys.argv)
     window = BinMergerApp()
+    constructed = time.time()
     window.show()
+    startup_report = os.environ.get('BIN_MERGER_STARTUP_REPORT')
+    if startup_report:
+        # 事件循环处理完显示和第一次绘制后再记录
+        QTimer.singleShot(0, lambda: report_startup(startup_report, imported, constructed))
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,12 @@
+"""BIN 文件合并核心库（不依赖 PyQt5，可供 GUI、命令行和脚本共用）"""
+from .core import (FILL_BYTE, MergeResult, load_file, merge_layout, merge_images,
+                   fix_interrupt_vector_table, compute_checksums, save_file)
+from .errors import MergeError, LayoutError, Cancelled
+from .image import SparseImage
+from .layout import Layout, Region
+
+__all__ = [
+    "FILL_BYTE", "MergeResult", "load_file", "merge_layout", "merge_images",
+    "fix_interrupt_vector_table", "compute_checksums", "save_file",
+    "MergeError", "LayoutError", "Cancelled", "SparseImage", "Layout", "Region",
+]
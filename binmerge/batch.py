@@ -0,0 +1,255 @@
+"""批量合并
+
+按清单文件（JSON）中的作业列表批量生成合并文件，作业在进程池中并行执行:
+    {
+        "layout": "layout.json",
+        "inputs": {"BOOT": "boot.bin"},
+        "format": "ihex",
+        "checksums": ["crc32", "sha256"],
+        "jobs": [
+            {"name": "rev-a", "inputs": {"APP1": "app_rev_a.hex"}, "output": "out/rev_a.hex"},
+            {"name": "rev-b", "layout": "layout_rev_b.json", "inputs": {"APP1": "app_rev_b.hex"},
+             "output": "out/rev_b.bin", "fix_vector": false}
+        ]
+    }
+顶层的 layout、inputs、format、record_length、checksums、fix_vector、cache 是所有作业的默认值，作业中的同名项覆盖默认值
+（inputs 按区域合并）。cache 为 false 时不使用合并结果缓存。layout 可以是布局文件路径或内联的布局对象，相对路径都相对清单文件所在目录。
+
+被多个作业共用的输入（通常是 BOOT）只在主进程中加载和计算校验和一次：
+BIN 文件由各工作进程直接映射（共享系统页缓存，不复制），HEX/S-record/ELF 解码后的镜像在进程启动时传给每个工作进程一次。
+只被一个作业使用的输入由执行该作业的工作进程加载。
+"""
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import checksum, loaders, mergecache
+from .core import load_file, load_file_with_checksums, merge_layout, save_file
+from .errors import MergeError
+from .hexwriter import DEFAULT_RECORD_LENGTH, OUTPUT_FORMATS
+from .layout import Layout, parse_int
+from .writer import SAVE_ALGORITHMS
+
+
+class ManifestError(MergeError):
+    """批量清单格式错误"""
+
+
+class Job:
+    """一个合并作业"""
+    def __init__(self, name, layout, inputs, output, fmt=None, record_length=DEFAULT_RECORD_LENGTH,
+                 algorithms=SAVE_ALGORITHMS, fix_vector=True, use_cache=True):
+        self.name = name
+        self.layout = layout
+        # {区域名: 输入文件绝对路径}
+        self.inputs = inputs
+        self.output = output
+        self.fmt = fmt
+        self.record_length = record_length
+        self.algorithms = tuple(algorithms)
+        self.fix_vector = fix_vector
+        # 是否使用合并结果缓存（mergecache）
+        self.use_cache = use_cache
+
+    def __repr__(self):
+        return f"Job({self.name!r}, {self.output!r})"
+
+
+def _resolve(base_dir, path):
+    return os.path.abspath(os.path.join(base_dir, path))
+
+
+def _load_layout(value, base_dir):
+    if isinstance(value, dict):
+        return Layout.from_dict(value, base_dir)
+    if isinstance(value, str):
+        return Layout.load(_resolve(base_dir, value))
+    raise ManifestError(f"无效的布局: {value!r}")
+
+
+def parse_manifest(content, base_dir='.'):
+    """把清单内容（已解析的 JSON 对象）转换为作业列表"""
+    if not isinstance(content, dict) or not isinstance(content.get('jobs'), list):
+        raise ManifestError("清单缺少 jobs 列表")
+
+    jobs = []
+    names = set()
+    for index, entry in enumerate(content['jobs']):
+        if not isinstance(entry, dict):
+            raise ManifestError(f"第{index + 1}个作业不是对象: {entry!r}")
+        settings = {**content, **entry}
+        name = str(entry.get('name') or f"job{index + 1}")
+        if name in names:
+            raise ManifestError(f"作业名称重复: {name}")
+        names.add(name)
+        if not entry.get('output'):
+            raise ManifestError(f"作业 {name} 缺少 output")
+        if 'layout' not in settings:
+            raise ManifestError(f"作业 {name} 没有指定 layout")
+
+        layout = _load_layout(settings['layout'], base_dir)
+        # 布局文件中的 file < 清单顶层 inputs < 作业 inputs
+        inputs = {region.name: os.path.abspath(region.path) for region in layout if region.path}
+        for source in (content.get('inputs') or {}, entry.get('inputs') or {}):
+            for region_name, path in source.items():
+                layout.get(region_name)
+                inputs[region_name] = _resolve(base_dir, path)
+
+        fmt = settings.get('format')
+        if fmt is not None and fmt not in OUTPUT_FORMATS:
+            raise ManifestError(f"作业 {name} 的输出格式无效: {fmt}")
+        algorithms = settings.get('checksums') or SAVE_ALGORITHMS
+        unknown = [alg for alg in algorithms if alg not in checksum.ALGORITHMS]
+        if unknown:
+            raise ManifestError(f"作业 {name} 使用了未知的校验算法: {', '.join(unknown)}")
+        jobs.append(Job(name, layout, inputs, _resolve(base_dir, entry['output']), fmt,
+                        parse_int(settings.get('record_length', DEFAULT_RECORD_LENGTH)), algorithms,
+                        bool(settings.get('fix_vector', True)), bool(settings.get('cache', True))))
+    return jobs
+
+
+def load_manifest(path):
+    """从 JSON 文件加载作业列表"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+    except ValueError as e:
+        raise ManifestError(f"清单文件格式错误: {e}")
+    return parse_manifest(content, os.path.dirname(os.path.abspath(path)))
+
+
+# 输入的校验算法：报告中的校验和，以及合并缓存键使用的内容摘要
+INPUT_ALGORITHMS = checksum.DEFAULT_ALGORITHMS + (mergecache.KEY_ALGORITHM,)
+
+# 工作进程中的共享输入 {路径: (数据或 None, {算法: 结果})}，数据为 None 时由工作进程自行映射文件
+_shared_inputs = {}
+
+
+def _init_worker(shared):
+    global _shared_inputs
+    _shared_inputs = shared
+
+
+def _load(path):
+    """加载输入，共用的输入使用主进程预先计算的结果"""
+    shared = _shared_inputs.get(path)
+    if shared is None:
+        return load_file_with_checksums(path, INPUT_ALGORITHMS, cache=checksum.default_cache())
+    data, sums = shared
+    return (load_file(path) if data is None else data), sums
+
+
+def run_job(job):
+    """执行一个作业，返回结果字典（失败时包含 error，不抛出异常，一个作业出错不影响其他作业）"""
+    started = time.perf_counter()
+    result = {'name': job.name, 'output': job.output}
+    try:
+        inputs = {}
+        digests = {}
+        input_report = {}
+        for region_name, path in job.inputs.items():
+            inputs[region_name], sums = _load(path)
+            digests[region_name] = sums.get(mergecache.KEY_ALGORITHM)
+            input_report[region_name] = {'path': path, 'checksums': _format_results(sums)}
+        directory = os.path.dirname(job.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if job.use_cache:
+            merged = mergecache.merge_cached(job.layout, inputs, digests, job.fix_vector)
+            sums = mergecache.save_merged(job.output, merged, job.algorithms, job.fmt, job.record_length)
+        else:
+            merged = merge_layout(job.layout, inputs, job.fix_vector)
+            sums = save_file(job.output, merged.data, job.algorithms, job.fmt, record_length=job.record_length)
+        result.update(status='ok', size=merged.size, cached=merged.cached, base_address=f"0x{merged.base_address:08X}",
+                      reset_vectors={name: f"0x{value:08X}" for name, value in merged.reset_vectors.items()},
+                      checksums=_format_results(sums), inputs=input_report)
+    except (OSError, MergeError) as e:
+        result.update(status='error', error=str(e))
+    except Exception as e:
+        # 输入内容等引起的意外错误，同样只记录在该作业的结果中
+        result.update(status='error', error=f"{type(e).__name__}: {e}")
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def _format_results(sums):
+    return {name: checksum.format_value(value) for name, value in sums.items()}
+
+
+def _preload_shared(jobs, keep_bin=False):
+    """加载被多个作业共用的输入，返回 {路径: (数据或 None, 校验和)}
+
+    keep_bin 为 False 时不保留 BIN 数据（传给工作进程的只有校验和，数据由工作进程映射文件）。
+    """
+    usage = {}
+    for job in jobs:
+        for path in set(job.inputs.values()):
+            usage[path] = usage.get(path, 0) + 1
+    shared = {}
+    for path, count in usage.items():
+        if count < 2:
+            continue
+        try:
+            data, sums = load_file_with_checksums(path, INPUT_ALGORITHMS, cache=checksum.default_cache())
+        except (OSError, MergeError):
+            # 交给各作业加载，错误记录在作业结果中
+            continue
+        if not keep_bin and loaders.detect_format(path) == 'bin':
+            data = None
+        shared[path] = (data, sums)
+    return shared
+
+
+def worker_count(jobs, workers=None):
+    """实际使用的进程数：默认为 CPU 核心数，不超过作业数"""
+    return max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+
+
+def run_batch(jobs, workers=None, on_result=None):
+    """并行执行作业，返回与 jobs 顺序一致的结果列表
+
+    workers 为进程数，默认使用全部 CPU 核心；实际只有一个进程时在当前进程中顺序执行。
+    on_result(result) 在每个作业完成时调用（按完成顺序）。
+    """
+    workers = worker_count(jobs, workers)
+    shared = _preload_shared(jobs, keep_bin=workers <= 1) if len(jobs) > 1 else {}
+    results = [None] * len(jobs)
+
+    if workers <= 1:
+        _init_worker(shared)
+        try:
+            for i, job in enumerate(jobs):
+                results[i] = run_job(job)
+                if on_result:
+                    on_result(results[i])
+        finally:
+            _init_worker({})
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # 工作进程异常退出、结果无法传回等，作业没有返回结果
+                results[i] = {'name': jobs[i].name, 'output': jobs[i].output, 'status': 'error',
+                              'error': f"{type(e).__name__}: {e}", 'seconds': 0}
+            if on_result:
+                on_result(results[i])
+    return results
+
+
+def write_report(path, results, workers, seconds):
+    """把批量结果写成 JSON 报告"""
+    report = {
+        'workers': workers,
+        'seconds': round(seconds, 4),
+        'succeeded': sum(1 for result in results if result['status'] == 'ok'),
+        'failed': sum(1 for result in results if result['status'] != 'ok'),
+        'jobs': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
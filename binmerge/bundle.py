@@ -0,0 +1,339 @@
+"""压缩固件包
+
+把合并镜像（保存为 BIN 时的完整内容）按固定大小分块、各块独立压缩后打包，用于下发到设备和归档发布版本:
+    MAGIC | 清单长度 (uint32 LE) | 清单 (JSON, UTF-8) | 各块压缩数据依次拼接
+清单记录格式版本、压缩算法和级别、分块大小、镜像基地址、大小、填充值、布局（不含文件路径）、复位向量、
+整个镜像的校验和（与保存文件时报告的 CRC32/MD5/SHA256 相同），以及每块的:
+    offset / length                    在镜像中的偏移和原始长度
+    data_offset / compressed_length    压缩数据相对第一块数据的偏移和长度
+    crc32 / sha256                     原始数据的校验和
+清单在数据之前，使用方可以顺序读取、逐块解压并校验（iter_chunks），不必先得到整个文件；
+也可以按 data_offset 直接定位、只解压和校验其中一块（read_chunk）。
+
+各块在线程池中并行压缩：zlib、lzma 和 zstandard 压缩时都释放 GIL，多个块真正同时在多个核心上压缩。
+zstd 需要安装可选的 zstandard 包，未安装时选择 zstd 会报错，zlib 和 lzma 不受影响。
+压缩后的数据在内存中收齐后再与清单一起写入（压缩数据通常远小于镜像），写入方式与其他输出文件相同（原子替换）。
+"""
+import os
+import json
+import zlib
+import lzma
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import checksum, trace
+from .errors import MergeError
+from .image import SparseImage
+from .writer import SAVE_ALGORITHMS, atomic_write
+
+MAGIC = b'BMBUNDL1'
+VERSION = 1
+_HEADER_SIZE = struct.Struct('<I')
+
+DEFAULT_CODEC = 'lzma'
+DEFAULT_CHUNK_SIZE = 256 * 1024
+DEFAULT_WORKERS = os.cpu_count() or 1
+# 压缩包文件的扩展名（GUI 保存对话框使用）
+EXTENSION = '.fwb'
+
+
+class BundleError(MergeError):
+    """压缩包格式错误或数据校验失败"""
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise BundleError("zstd 压缩需要安装 zstandard 包（pip install zstandard），也可以改用 zlib 或 lzma")
+    return zstandard
+
+
+def _zstd_compress(data, level):
+    return _zstandard().ZstdCompressor(level=level).compress(data)
+
+
+def _zstd_decompress(data):
+    return _zstandard().ZstdDecompressor().decompress(data)
+
+
+# 压缩算法: (压缩函数, 解压函数, 默认级别, 最低级别, 最高级别)
+CODECS = {
+    'zlib': (lambda data, level: zlib.compress(data, level), zlib.decompress, 6, 0, 9),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 6, 0, 9),
+    'zstd': (_zstd_compress, _zstd_decompress, 3, 1, 22),
+}
+
+
+def _codec(name):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise BundleError(f"不支持的压缩算法: {name}")
+
+
+def check_level(codec, level=None):
+    """返回有效的压缩级别（None 为该算法的默认级别），超出范围时抛出 BundleError"""
+    _, _, default, low, high = _codec(codec)
+    if codec == 'zstd':
+        # 未安装 zstandard 时在合并、压缩之前就报错
+        _zstandard()
+    if level is None:
+        return default
+    if not low <= level <= high:
+        raise BundleError(f"{codec} 的压缩级别应为 {low}-{high}: {level}")
+    return level
+
+
+def _compress_chunk(codec, level, data):
+    """在工作线程中压缩一块，返回 (压缩数据, CRC32, SHA256)"""
+    import hashlib
+    compressed = _codec(codec)[0](data, level)
+    return compressed, zlib.crc32(data), hashlib.sha256(data).hexdigest()
+
+
+def _layout_dict(layout):
+    if layout is None:
+        return None
+    content = layout.to_dict()
+    content['regions'] = [{k: v for k, v in region.items() if k != 'file'} for region in content['regions']]
+    return content
+
+
+def make_bundle(data, base_address=0, layout=None, codec=DEFAULT_CODEC, level=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                algorithms=SAVE_ALGORITHMS, workers=DEFAULT_WORKERS, reset_vectors=None, progress=None):
+    """压缩镜像，返回 (清单, [各块压缩数据])
+
+    data 为 BIN 数据或 SparseImage（此时基地址和填充值取自镜像）。
+    progress(已压缩字节数, 总字节数) 每压缩完一块调用一次，抛出异常（例如 Cancelled）时停止，尚未开始的块不再压缩。
+    """
+    level = check_level(codec, level)
+    if chunk_size <= 0:
+        raise BundleError(f"分块大小必须大于 0: {chunk_size}")
+    if isinstance(data, SparseImage):
+        base_address, fill, view = data.base_address, data.fill, data
+    else:
+        fill, view = 0xFF, memoryview(data).cast('B')
+    total = len(view)
+
+    sums = checksum.ChecksumSet(algorithms)
+    chunks = []
+    streams = []
+    data_offset = 0
+    with trace.span('compress', total, codec=codec, level=level), \
+            ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='bundle') as executor:
+        # 同时提交的块数有上限，未压缩的数据不会一次全部读入内存（SparseImage 的填充区段按需生成）
+        pending = deque()
+        offsets = iter(range(0, total, chunk_size))
+        try:
+            while True:
+                while len(pending) < 2 * max(1, workers):
+                    offset = next(offsets, None)
+                    if offset is None:
+                        break
+                    chunk = view[offset:offset + chunk_size]
+                    # 整个镜像的校验和按顺序在当前线程中计算，与工作线程的压缩同时进行
+                    sums.update(chunk)
+                    pending.append((offset, len(chunk), executor.submit(_compress_chunk, codec, level, chunk)))
+                if not pending:
+                    break
+                offset, length, future = pending.popleft()
+                compressed, crc, sha256 = future.result()
+                chunks.append({
+                    'offset': offset,
+                    'length': length,
+                    'data_offset': data_offset,
+                    'compressed_length': len(compressed),
+                    'crc32': checksum.format_value(crc),
+                    'sha256': sha256,
+                })
+                streams.append(compressed)
+                data_offset += len(compressed)
+                if progress:
+                    progress(offset + length, total)
+        except BaseException:
+            for _, _, future in pending:
+                future.cancel()
+            raise
+
+    manifest = {
+        'version': VERSION,
+        'codec': codec,
+        'level': level,
+        'chunk_size': chunk_size,
+        'base_address': base_address,
+        'size': total,
+        'fill': fill,
+        'layout': _layout_dict(layout),
+        'reset_vectors': dict(reset_vectors or {}),
+        'checksums': {name: checksum.format_value(value) for name, value in sums.results().items()},
+        'compressed_size': data_offset,
+        'chunks': chunks,
+    }
+    return manifest, streams
+
+
+def write_bundle(path, data, base_address=0, layout=None, codec=DEFAULT_CODEC, level=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, algorithms=SAVE_ALGORITHMS, workers=DEFAULT_WORKERS,
+                 reset_vectors=None, progress=None):
+    """压缩镜像并原子写入 path，返回清单（另含 'bundle_size': 文件总字节数）"""
+    manifest, streams = make_bundle(data, base_address, layout, codec, level, chunk_size, algorithms, workers,
+                                    reset_vectors, progress)
+    header = json.dumps(manifest, separators=(',', ':')).encode('utf-8')
+    with trace.span('save', manifest['compressed_size'], path=os.path.basename(path), format='bundle'):
+        with atomic_write(path) as f:
+            f.write(MAGIC + _HEADER_SIZE.pack(len(header)) + header)
+            for stream in streams:
+                f.write(stream)
+    manifest['bundle_size'] = len(MAGIC) + _HEADER_SIZE.size + len(header) + manifest['compressed_size']
+    return manifest
+
+
+def _read_exact(f, size, what):
+    data = f.read(size)
+    if len(data) != size:
+        raise BundleError(f"压缩包不完整: {what}被截断")
+    return data
+
+
+def read_manifest(f):
+    """从已打开的二进制文件对象读取清单，读完后文件位于第一块数据处
+
+    返回的清单另含 'data_start': 第一块数据在文件中的偏移。
+    """
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+        raise BundleError("不是压缩固件包文件")
+    (size,) = _HEADER_SIZE.unpack(_read_exact(f, _HEADER_SIZE.size, "清单长度"))
+    try:
+        manifest = json.loads(_read_exact(f, size, "清单").decode('utf-8'))
+        if manifest['version'] != VERSION:
+            raise BundleError(f"不支持的压缩包版本: {manifest['version']}")
+        _codec(manifest['codec'])
+        for chunk in manifest['chunks']:
+            chunk['offset'], chunk['length'], chunk['data_offset'], chunk['compressed_length']
+            chunk['crc32'], chunk['sha256']
+        manifest['size'], manifest['base_address'], manifest['checksums']
+    except (ValueError, KeyError, TypeError):
+        raise BundleError("压缩包清单损坏")
+    manifest['data_start'] = len(MAGIC) + _HEADER_SIZE.size + size
+    return manifest
+
+
+def decompress_chunk(manifest, index, compressed):
+    """解压第 index 块并校验长度、CRC32 和 SHA256，返回原始数据；不一致时抛出 BundleError"""
+    import hashlib
+    chunk = manifest['chunks'][index]
+    try:
+        data = _codec(manifest['codec'])[1](compressed)
+    except BundleError:
+        raise
+    except Exception:
+        # 各压缩库在数据损坏时抛出的异常类型不同
+        raise BundleError(f"第 {index} 块（偏移 0x{chunk['offset']:X}）无法解压")
+    if len(data) != chunk['length']:
+        raise BundleError(f"第 {index} 块（偏移 0x{chunk['offset']:X}）长度不一致: {len(data)}（应为 {chunk['length']}）")
+    if checksum.format_value(zlib.crc32(data)) != chunk['crc32']:
+        raise BundleError(f"第 {index} 块（偏移 0x{chunk['offset']:X}）CRC32 不一致")
+    if hashlib.sha256(data).hexdigest() != chunk['sha256']:
+        raise BundleError(f"第 {index} 块（偏移 0x{chunk['offset']:X}）SHA256 不一致")
+    return data
+
+
+def iter_chunks(f, manifest=None):
+    """顺序读取已打开的压缩包（可以是不能定位的流），逐块解压并校验，依次产生 (块信息, 原始数据)
+
+    manifest 为 None 时先从 f 读取清单。
+    """
+    if manifest is None:
+        manifest = read_manifest(f)
+    position = 0
+    for index, chunk in enumerate(manifest['chunks']):
+        if chunk['data_offset'] != position:
+            raise BundleError(f"第 {index} 块的数据偏移不连续")
+        compressed = _read_exact(f, chunk['compressed_length'], f"第 {index} 块")
+        position += len(compressed)
+        yield chunk, decompress_chunk(manifest, index, compressed)
+
+
+def read_chunk(path, index):
+    """只读取、解压并校验第 index 块，返回 (块信息, 原始数据)"""
+    with open(path, 'rb') as f:
+        manifest = read_manifest(f)
+        if not 0 <= index < len(manifest['chunks']):
+            raise BundleError(f"块序号超出范围: {index}（共 {len(manifest['chunks'])} 块）")
+        chunk = manifest['chunks'][index]
+        f.seek(manifest['data_start'] + chunk['data_offset'])
+        return chunk, decompress_chunk(manifest, index, _read_exact(f, chunk['compressed_length'], f"第 {index} 块"))
+
+
+def _image_checksums(manifest):
+    """清单中本程序支持的整个镜像校验算法"""
+    return checksum.ChecksumSet(tuple(name for name in manifest['checksums'] if name in checksum.ALGORITHMS))
+
+
+def _check_image(manifest, sums):
+    for name, value in sums.items():
+        actual, expected = checksum.format_value(value), manifest['checksums'][name]
+        if actual != expected:
+            raise BundleError(f"解压后镜像的{checksum.LABELS.get(name, name)}不一致: {actual}（应为 {expected}）")
+
+
+def extract_bundle(path, progress=None):
+    """解压整个压缩包，逐块校验后再校验整个镜像，返回 (清单, 镜像数据 bytes)"""
+    with open(path, 'rb') as f:
+        manifest = read_manifest(f)
+        out = bytearray(manifest['size'])
+        sums = _image_checksums(manifest)
+        end = 0
+        for chunk, data in iter_chunks(f, manifest):
+            if chunk['offset'] != end:
+                raise BundleError(f"块 0x{chunk['offset']:X} 与前一块不连续")
+            out[end:end + len(data)] = data
+            sums.update(data)
+            end += len(data)
+            if progress:
+                progress(end, manifest['size'])
+    if end != manifest['size']:
+        raise BundleError(f"压缩包数据不完整: {end} 字节（应为 {manifest['size']} 字节）")
+    _check_image(manifest, sums.results())
+    return manifest, bytes(out)
+
+
+def verify_bundle(path, workers=DEFAULT_WORKERS):
+    """在多个线程中解压并校验全部块，再校验整个镜像的校验和
+
+    返回 (清单, [(块序号, 错误信息)])，列表为空表示全部通过；整个镜像不一致时序号为 None。
+    """
+    with open(path, 'rb') as f:
+        manifest = read_manifest(f)
+        streams = [_read_exact(f, chunk['compressed_length'], f"第 {index} 块")
+                   for index, chunk in enumerate(manifest['chunks'])]
+
+    def check(index):
+        try:
+            return decompress_chunk(manifest, index, streams[index]), None
+        except BundleError as e:
+            return None, str(e)
+
+    errors = []
+    sums = _image_checksums(manifest)
+    end = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='bundle') as executor:
+        # map 按块的顺序返回结果，整个镜像的校验和可以边解压边计算
+        for index, (data, error) in enumerate(executor.map(check, range(len(streams)))):
+            if error is not None:
+                errors.append((index, error))
+                continue
+            sums.update(data)
+            end += len(data)
+    if not errors:
+        if end != manifest['size']:
+            errors.append((None, f"压缩包数据不完整: {end} 字节（应为 {manifest['size']} 字节）"))
+        else:
+            try:
+                _check_image(manifest, sums.results())
+            except BundleError as e:
+                errors.append((None, str(e)))
+    return manifest, errors
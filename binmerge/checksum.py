@@ -0,0 +1,225 @@
+"""校验和引擎与校验和缓存
+
+支持的算法:
+    crc32        zlib CRC-32（界面和保存结果中显示的 CRC32）
+    crc32-mpeg2  CRC-32/MPEG-2，STM32 硬件 CRC 单元的默认算法（多项式 0x04C11DB7，初值 0xFFFFFFFF，不反转）
+    md5
+    sha256
+
+所有算法都支持分块增量更新，加载文件时可以边读边算。
+ChecksumCache 以 (路径, 大小, 修改时间) 为键把结果保存到磁盘，文件未变化时重新打开无需再次计算。
+"""
+import os
+import json
+import zlib
+import threading
+
+from . import trace
+from .paths import user_cache_dir
+
+DEFAULT_ALGORITHMS = ('crc32', 'md5')
+
+# 字节按位反转表，用于借助 zlib 计算不反转的 CRC-32/MPEG-2
+_BIT_REVERSE = bytes(int(f'{b:08b}'[::-1], 2) for b in range(256))
+
+
+def _reverse32(value):
+    return int(f'{value:032b}'[::-1], 2)
+
+
+class Crc32:
+    """zlib CRC-32"""
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def result(self):
+        return self.value & 0xFFFFFFFF
+
+
+class Crc32Mpeg2:
+    """CRC-32/MPEG-2
+
+    不反转的 CRC 等价于对按位反转后的字节做反转 CRC 再把结果按位反转，
+    因此可以用 translate 反转字节后交给 zlib.crc32 计算，速度与 CRC-32 相当。
+    注意 STM32 以 32 位字写入 CRC 单元时按字的大端顺序处理，校验小端存储的数据前需要先按字交换字节。
+    """
+    def __init__(self):
+        # zlib 内部寄存器 = value ^ 0xFFFFFFFF，value 为 0 时寄存器初值即 0xFFFFFFFF
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(bytes(data).translate(_BIT_REVERSE), self.value)
+
+    def result(self):
+        return _reverse32(self.value ^ 0xFFFFFFFF)
+
+
+class HashlibDigest:
+    """hashlib 摘要算法"""
+    def __init__(self, name):
+        # hashlib（OpenSSL）在第一次计算摘要时才导入，缩短 GUI 启动时间
+        import hashlib
+        self.hash = hashlib.new(name)
+
+    def update(self, data):
+        self.hash.update(data)
+
+    def result(self):
+        return self.hash.hexdigest()
+
+
+ALGORITHMS = {
+    'crc32': Crc32,
+    'crc32-mpeg2': Crc32Mpeg2,
+    'md5': lambda: HashlibDigest('md5'),
+    'sha256': lambda: HashlibDigest('sha256'),
+}
+
+# 显示名称
+LABELS = {
+    'crc32': 'CRC32',
+    'crc32-mpeg2': 'CRC32/MPEG-2',
+    'md5': 'MD5',
+    'sha256': 'SHA256',
+}
+
+
+def register_algorithm(name, factory, label=None):
+    """注册新的校验算法，factory() 返回带 update(data) 和 result() 方法的对象"""
+    ALGORITHMS[name] = factory
+    LABELS[name] = label or name.upper()
+
+
+class ChecksumSet:
+    """同时计算多个校验算法"""
+    def __init__(self, algorithms=DEFAULT_ALGORITHMS):
+        unknown = [name for name in algorithms if name not in ALGORITHMS]
+        if unknown:
+            raise ValueError(f"未知的校验算法: {', '.join(unknown)}")
+        self.algorithms = tuple(algorithms)
+        self._engines = [ALGORITHMS[name]() for name in self.algorithms]
+
+    def update(self, data):
+        for engine in self._engines:
+            engine.update(data)
+
+    def results(self):
+        """返回 {算法名: 结果}，CRC 为整数，摘要为十六进制字符串"""
+        return {name: engine.result() for name, engine in zip(self.algorithms, self._engines)}
+
+
+def compute(chunks, algorithms=DEFAULT_ALGORITHMS):
+    """对可迭代的数据块计算校验和"""
+    checksums = ChecksumSet(algorithms)
+    with trace.span('checksum', algorithms=','.join(algorithms)) as span:
+        for chunk in chunks:
+            checksums.update(chunk)
+            span.add_bytes(len(chunk))
+    return checksums.results()
+
+
+def format_value(value):
+    return f"0x{value:08X}" if isinstance(value, int) else value
+
+
+def format_checksums(results, separator=", "):
+    """格式化为 "CRC32: 0x..., MD5: ..." 形式"""
+    return separator.join(f"{LABELS.get(name, name)}: {format_value(value)}" for name, value in results.items())
+
+
+class ChecksumCache:
+    """磁盘校验和缓存，键为 (绝对路径, 文件大小, 修改时间)"""
+    VERSION = 1
+    MAX_ENTRIES = 512
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    content = json.load(f)
+                self._entries = content['entries'] if content.get('version') == self.VERSION else {}
+            except (OSError, ValueError, KeyError, AttributeError):
+                self._entries = {}
+            if not isinstance(self._entries, dict):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        """写入缓存文件，失败时忽略（缓存不可用不影响加载）"""
+        import tempfile
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.checksums.', suffix='.tmp', dir=directory)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'entries': self._entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def file_key(path):
+        """返回 (绝对路径, 大小, 修改时间)，文件不存在时抛出 OSError"""
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _matches(entry, size, mtime_ns):
+        """条目格式正确且属于同一文件版本（缓存文件可能损坏或被手工修改，格式不对的条目视为未命中）"""
+        return (isinstance(entry, dict) and isinstance(entry.get('checksums'), dict) and
+                entry.get('size') == size and entry.get('mtime_ns') == mtime_ns)
+
+    def get(self, key, algorithms):
+        """命中且包含全部所需算法时返回结果字典，否则返回 None"""
+        path, size, mtime_ns = key
+        with self._lock:
+            entry = self._load().get(path)
+        if not self._matches(entry, size, mtime_ns):
+            return None
+        checksums = entry['checksums']
+        if not all(isinstance(checksums.get(name), (int, str)) for name in algorithms):
+            return None
+        return {name: checksums[name] for name in algorithms}
+
+    def put(self, key, results):
+        path, size, mtime_ns = key
+        with self._lock:
+            entries = self._load()
+            entry = entries.pop(path, None)
+            if self._matches(entry, size, mtime_ns):
+                # 同一文件版本，合并不同算法的结果
+                checksums = {**entry['checksums'], **results}
+            else:
+                checksums = dict(results)
+            # 字典保持插入顺序，最近写入的条目在末尾，超出上限时删除最早的条目
+            entries[path] = {'size': size, 'mtime_ns': mtime_ns, 'checksums': checksums}
+            while len(entries) > self.MAX_ENTRIES:
+                del entries[next(iter(entries))]
+            self._save()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """用户缓存目录下的共享校验和缓存"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ChecksumCache(os.path.join(user_cache_dir(), 'checksums.json'))
+        return _default_cache
@@ -0,0 +1,405 @@
+"""命令行批处理模式
+
+示例:
+    python bin_merger.py --boot boot.bin --app app.bin -o merged.bin
+    python bin_merger.py --boot boot.bin --boot-addr 0x8000000 --boot-size 0x20000 \\
+                         --app app.bin --app-addr 0x8020000 --app-size 0x60000 -o merged.bin
+    python bin_merger.py --layout layout.json --input APP_B=app_b.bin -o merged.bin
+    python bin_merger.py --boot boot.bin --app app.bin -o merged.hex --record-length 32
+    python bin_merger.py --boot boot.bin --app build/app.bin -o merged.bin --watch
+    python bin_merger.py --boot boot.bin --app app.bin -o merged.bin --trace trace.json
+    python bin_merger.py --batch release.json --report report.json
+    python bin_merger.py --diff merged_v1.bin merged_v2.hex --report diff.json
+    python bin_merger.py --make-patch merged_v1.bin merged_v2.bin -o v1_to_v2.patch
+    python bin_merger.py --apply-patch v1_to_v2.patch merged_v1.bin -o merged_v2.bin
+    python bin_merger.py --boot boot.bin --app app.bin -o merged.bin --bundle merged.fwb --bundle-codec zlib
+    python bin_merger.py --verify-bundle merged.fwb
+    python bin_merger.py --boot boot.bin --app app.bin -o merged.bin --sector-crc 0x803F800 --image-version 3
+    python bin_merger.py --verify-sector-crc merged.bin
+    python bin_merger.py --extract-bundle merged.fwb -o merged.hex
+"""
+import sys
+import time
+import argparse
+
+from . import batch, bundle, checksum, diff, loadpool, mergecache, patch, sectorcrc, trace, watch
+from .core import (APP_REGION, BOOT_REGION, DEFAULT_APP_SIZE, DEFAULT_APP_START, DEFAULT_BOOT_SIZE,
+                   DEFAULT_BOOT_START, MergeError, load_input, merge_layout, save_file,
+                   two_region_layout)
+from .layout import DEFAULT_SECTOR_SIZE, Layout, SectorTable
+from .writer import SAVE_ALGORITHMS
+from .hexwriter import DEFAULT_RECORD_LENGTH, MAX_RECORD_LENGTH, OUTPUT_FORMATS
+from .hexdump import save_hex_dump
+
+
+def parse_int(text):
+    """解析十六进制(0x前缀)或十进制整数"""
+    try:
+        return int(text, 0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的地址或大小: {text}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bin_merger", description="BIN文件合并工具（命令行模式）")
+    parser.add_argument("--layout", metavar="PATH", help="布局文件（JSON，可包含任意数量的区域），与 --boot/--app 二选一")
+    parser.add_argument("--input", action="append", default=[], metavar="NAME=PATH",
+                        help="指定布局中某个区域的输入文件，覆盖布局文件中的 file，可重复指定")
+    parser.add_argument("--boot", metavar="PATH", help="BOOT 文件（BIN/HEX/S-record/ELF）")
+    parser.add_argument("--boot-addr", type=parse_int, default=DEFAULT_BOOT_START, metavar="ADDR",
+                        help="BOOT起始地址 (默认: 0x%(default)X)")
+    parser.add_argument("--boot-size", type=parse_int, default=DEFAULT_BOOT_SIZE, metavar="SIZE",
+                        help="BOOT区域大小 (默认: 0x%(default)X)")
+    parser.add_argument("--app", metavar="PATH", help="APP1 文件（BIN/HEX/S-record/ELF）")
+    parser.add_argument("--app-addr", type=parse_int, default=DEFAULT_APP_START, metavar="ADDR",
+                        help="APP起始地址 (默认: 0x%(default)X)")
+    parser.add_argument("--app-size", type=parse_int, default=DEFAULT_APP_SIZE, metavar="SIZE",
+                        help="APP区域大小 (默认: 0x%(default)X)")
+    parser.add_argument("-o", "--output", metavar="PATH", help="合并后的输出文件")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="输出格式 (默认按输出文件扩展名: .hex 为 ihex, .srec/.s19/.s28/.s37 为 srec, 其余为 bin)")
+    parser.add_argument("--record-length", type=parse_int, default=DEFAULT_RECORD_LENGTH, metavar="N",
+                        help=f"HEX/S-record 每条记录的数据字节数 (1-{MAX_RECORD_LENGTH}, 默认: %(default)s)")
+    parser.add_argument("--no-vector-fix", action="store_true", help="不修复APP中断向量表")
+    parser.add_argument("--relocate-vectors", type=parse_int, metavar="LINK_ADDR",
+                        help="APP 按 LINK_ADDR 链接时，把向量表中的全部处理程序平移到 APP 区域（布局文件中用 link_address）")
+    parser.add_argument("--sector-crc", type=parse_int, metavar="ADDR",
+                        help="在 ADDR 处写入镜像头（长度、版本、CRC32）和按扇区计算的 CRC32 表，供 bootloader 按扇区校验；"
+                             "校验时用于指定镜像头地址（布局文件中用 sector_crc）")
+    parser.add_argument("--sector-crc-region", default=APP_REGION, metavar="NAME",
+                        help="扇区 CRC 表覆盖的区域 (默认: %(default)s)")
+    parser.add_argument("--sector-size", type=parse_int, default=DEFAULT_SECTOR_SIZE, metavar="SIZE",
+                        help="扇区 CRC 表的扇区大小 (默认: 0x%(default)X)")
+    parser.add_argument("--image-version", type=parse_int, default=0, metavar="N", help="写入镜像头的版本号 (默认: 0)")
+    parser.add_argument("--verify-sector-crc", metavar="IMAGE",
+                        help="按合并文件中的镜像头和扇区 CRC 表重新校验，全部一致时返回 0")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="不使用合并结果缓存（默认输入和布局都未变化时直接使用上次的合并结果）")
+    parser.add_argument("--watch", action="store_true",
+                        help="合并后继续监视输入文件，变化时只重新加载该输入并增量更新输出文件（按 Ctrl+C 退出）")
+    parser.add_argument("--hexdump", metavar="PATH", help="同时导出合并结果的十六进制转储文本")
+    parser.add_argument("--batch", metavar="MANIFEST", help="按清单文件（JSON）批量合并，作业在多个进程中并行执行")
+    parser.add_argument("--jobs", type=int, metavar="N",
+                        help="批量合并使用的进程数，或生成/校验压缩包时的线程数 (默认: CPU 核心数)")
+    parser.add_argument("--diff", nargs=2, metavar=("A", "B"),
+                        help="比较两个镜像（BIN/HEX/S-record/ELF）并列出不同的地址区间，相同时返回 0，不同时返回 1")
+    parser.add_argument("--diff-base", type=parse_int, default=DEFAULT_BOOT_START, metavar="ADDR",
+                        help="比较时 BIN 文件的起始地址 (默认: 0x%(default)X)")
+    parser.add_argument("--make-patch", nargs=2, metavar=("OLD", "NEW"),
+                        help="生成从旧镜像到新镜像的差分升级包，写入 -o 指定的文件")
+    parser.add_argument("--apply-patch", nargs=2, metavar=("PATCH", "OLD"),
+                        help="把差分包应用到旧镜像，还原的新镜像写入 -o 指定的文件（校验和不一致时失败）")
+    parser.add_argument("--bundle", metavar="PATH",
+                        help="同时生成压缩固件包：镜像分块并行压缩，清单记录布局、各块偏移和 CRC32/SHA256")
+    parser.add_argument("--bundle-codec", choices=sorted(bundle.CODECS), default=bundle.DEFAULT_CODEC,
+                        help="压缩包的压缩算法 (zstd 需要安装 zstandard 包; 默认: %(default)s)")
+    parser.add_argument("--bundle-level", type=int, metavar="N",
+                        help="压缩级别 (zlib、lzma 为 0-9，zstd 为 1-22; 默认: 各算法的默认级别)")
+    parser.add_argument("--bundle-chunk-size", type=parse_int, default=bundle.DEFAULT_CHUNK_SIZE, metavar="SIZE",
+                        help="压缩包的分块大小 (默认: 0x%(default)X)")
+    parser.add_argument("--verify-bundle", metavar="PATH",
+                        help="解压并校验压缩包的每一块和整个镜像，全部通过时返回 0")
+    parser.add_argument("--extract-bundle", metavar="PATH",
+                        help="解压压缩包（校验通过后）写入 -o 指定的文件，可以保存为任意输出格式")
+    parser.add_argument("--report", metavar="PATH", help="批量合并或比较的结果报告（JSON）")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="记录各阶段（加载、校验、合并、向量表修复、保存）的耗时、数据量和峰值内存，"
+                             "结束时输出汇总并导出 Chrome 跟踪 JSON（批量合并只记录主进程）")
+    parser.add_argument("--checksum", action="append", choices=sorted(checksum.ALGORITHMS), metavar="ALG",
+                        help="输出文件的校验算法，可重复指定 (可选: %(choices)s; 默认: crc32, md5, sha256)")
+    return parser
+
+
+def build_layout(parser, args):
+    """根据参数生成布局和各区域的输入文件 {区域名: 路径}"""
+    if args.layout:
+        if args.boot or args.app or args.relocate_vectors is not None:
+            parser.error("--layout 不能与 --boot/--app/--relocate-vectors 同时使用")
+        layout = Layout.load(args.layout)
+        paths = {region.name: region.path for region in layout if region.path}
+    else:
+        if not (args.boot and args.app):
+            parser.error("需要同时指定 --boot 和 --app，或使用 --layout")
+        layout = two_region_layout(args.boot_addr, args.boot_size, args.app_addr, args.app_size,
+                                   args.relocate_vectors)
+        paths = {BOOT_REGION: args.boot, APP_REGION: args.app}
+
+    for item in args.input:
+        name, sep, path = item.partition("=")
+        if not sep or not name or not path:
+            parser.error(f"--input 格式应为 NAME=PATH: {item}")
+        layout.get(name)
+        paths[name] = path
+    if args.sector_crc is not None:
+        layout.sector_table = SectorTable(args.sector_crc, args.sector_crc_region, args.sector_size, args.image_version)
+    return layout, paths
+
+
+def run_batch(args):
+    """批量模式：逐个输出作业结果，有作业失败时返回 1"""
+    started = time.perf_counter()
+    jobs = batch.load_manifest(args.batch)
+    if args.no_cache:
+        for job in jobs:
+            job.use_cache = False
+    workers = batch.worker_count(jobs, args.jobs)
+    print(f"共 {len(jobs)} 个作业，使用 {workers} 个进程")
+
+    def report(result):
+        if result['status'] == 'ok':
+            sums = ", ".join(f"{checksum.LABELS.get(name, name)}: {value}" for name, value in result['checksums'].items())
+            print(f"[完成] {result['name']}: {result['output']} ({result['size']} 字节, {sums})")
+        else:
+            print(f"[失败] {result['name']}: {result['error']}", file=sys.stderr)
+
+    results = batch.run_batch(jobs, workers, report)
+    seconds = time.perf_counter() - started
+    failed = sum(1 for result in results if result['status'] != 'ok')
+    if args.report:
+        batch.write_report(args.report, results, workers, seconds)
+    print(f"成功 {len(results) - failed} 个，失败 {failed} 个，用时 {seconds:.2f} 秒")
+    if args.report:
+        print(f"报告已保存: {args.report}")
+    return 1 if failed else 0
+
+
+def run_diff(args):
+    """比较模式：相同时返回 0，不同时返回 1，出错时返回 2"""
+    try:
+        a, b = (load_input(path) for path in args.diff)
+        result = diff.compare(a, b, args.diff_base, args.diff_base)
+        if args.report:
+            diff.write_report(args.report, result)
+    except (OSError, MergeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 2
+    print("\n".join(diff.format_report(result)))
+    if args.report:
+        print(f"报告已保存: {args.report}")
+    return 0 if result.identical else 1
+
+
+def run_patch(args):
+    """生成或应用差分包"""
+    started = time.perf_counter()
+    try:
+        if args.make_patch:
+            old, new = (load_input(path) for path in args.make_patch)
+            header = patch.write_patch(args.output, old, new, tuple(args.checksum or SAVE_ALGORITHMS))
+            print(f"差分包已保存: {args.output}")
+            print(f"大小: {header['size']} 字节（新镜像 {header['new_size']} 字节，"
+                  f"{header['size'] / max(1, header['new_size']):.1%}），用时 {time.perf_counter() - started:.2f} 秒")
+            print("新镜像: " + ", ".join(f"{checksum.LABELS.get(name, name)}: {value}"
+                                        for name, value in header['new_checksums'].items()))
+            return 0
+        patch_path, old_path = args.apply_patch
+        with open(patch_path, 'rb') as f:
+            content = f.read()
+        header, _ = patch.read_header(content)
+        data = patch.apply_patch(load_input(old_path), content)
+        sums = save_file(args.output, data, tuple(args.checksum or SAVE_ALGORITHMS), args.format,
+                         base_address=header['base_address'], record_length=args.record_length)
+    except (OSError, MergeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    print(f"差分包校验通过，文件已保存: {args.output}")
+    print(f"大小: {len(data)} 字节")
+    print(checksum.format_checksums(sums, "\n"))
+    return 0
+
+
+def run_bundle(args):
+    """校验或解压压缩固件包"""
+    try:
+        if args.verify_bundle:
+            manifest, errors = bundle.verify_bundle(args.verify_bundle, args.jobs or bundle.DEFAULT_WORKERS)
+        else:
+            manifest, data = bundle.extract_bundle(args.extract_bundle)
+            sums = save_file(args.output, data, tuple(args.checksum or SAVE_ALGORITHMS), args.format,
+                             base_address=manifest['base_address'], record_length=args.record_length)
+    except (OSError, MergeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    if args.verify_bundle:
+        for index, error in errors:
+            print(f"[失败] {error}", file=sys.stderr)
+        print(f"{args.verify_bundle}: {len(manifest['chunks'])} 块，"
+              f"{'全部校验通过' if not errors else f'{len(errors)} 项校验失败'}")
+        print("镜像: " + ", ".join(f"{checksum.LABELS.get(name, name)}: {value}"
+                                  for name, value in manifest['checksums'].items()))
+        return 1 if errors else 0
+    print(f"压缩包校验通过，文件已保存: {args.output}")
+    print(f"大小: {len(data)} 字节")
+    print(checksum.format_checksums(sums, "\n"))
+    return 0
+
+
+def describe_sector_table(info):
+    return (f"0x{info['address']:08X}（版本 {info['version']}，覆盖 0x{info['start']:08X}-"
+            f"0x{info['start'] + info['length']:08X}，{info['sector_count']} 个扇区 × 0x{info['sector_size']:X}，"
+            f"CRC32: 0x{info['image_crc32']:08X}）")
+
+
+def run_sector_check(args):
+    """按镜像中的镜像头和扇区 CRC 表重新校验，全部一致时返回 0"""
+    try:
+        info, bad, image_ok = sectorcrc.verify(load_input(args.verify_sector_crc), args.sector_crc)
+    except (OSError, MergeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    print(f"镜像头: {describe_sector_table(info)}")
+    for index in bad:
+        start = info['start'] + index * info['sector_size']
+        end = min(start + info['sector_size'], info['start'] + info['length'])
+        print(f"[不一致] 扇区 {index}: 0x{start:08X}-0x{end:08X}", file=sys.stderr)
+    print(f"扇区: {'全部一致' if not bad else f'{len(bad)} 个不一致'}，整个覆盖范围的 CRC32 {'一致' if image_ok else '不一致'}")
+    return 0 if not bad and image_ok else 1
+
+
+def run_watch(parser, args):
+    """监视模式：先完整合并一次，之后每当输入文件变化就增量更新并重新保存输出文件"""
+    algorithms = tuple(args.checksum or ('crc32',))
+
+    def save():
+        sums = merger.save(args.output, algorithms, args.format, args.record_length)
+        for name, reset_vector in merger.result.reset_vectors.items():
+            print(f"已修复{name}中断向量表，复位向量: 0x{reset_vector:08X}")
+        print(f"文件已保存: {args.output} ({merger.result.size} 字节, {checksum.format_checksums(sums)})")
+
+    try:
+        layout, paths = build_layout(parser, args)
+        # 监视的输入会被改写，读入内存而不映射文件（见 watch.reload_changed）
+        inputs = {name: load_input(path, use_mmap=False) for name, path in paths.items()}
+        merger = watch.IncrementalMerge(layout, inputs, fix_vector=not args.no_vector_fix)
+        save()
+    except (OSError, MergeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+
+    watcher = watch.InputWatcher(paths)
+    print("正在监视输入文件，按 Ctrl+C 退出")
+    try:
+        while True:
+            changed = watcher.wait()
+            started = time.perf_counter()
+            try:
+                updated = watch.reload_changed(merger, changed, paths)
+                save()
+            except (OSError, MergeError) as e:
+                # 文件可能仍在生成，下次变化时再试
+                print(f"[{time.strftime('%H:%M:%S')}] 错误: {e}", file=sys.stderr)
+                continue
+            ranges = ", ".join(f"{name} 0x{start:08X}-0x{end:08X}" for name, start, end in updated)
+            print(f"[{time.strftime('%H:%M:%S')}] 已更新 {ranges}，用时 {(time.perf_counter() - started) * 1000:.1f} 毫秒")
+    except KeyboardInterrupt:
+        return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.trace:
+        return run(parser, args)
+    tracer = trace.enable()
+    try:
+        return run(parser, args)
+    finally:
+        trace.disable()
+        summary = tracer.summary()
+        if summary:
+            print(f"阶段耗时: {summary}")
+        try:
+            tracer.export(args.trace)
+            print(f"跟踪已导出: {args.trace}")
+        except OSError as e:
+            print(f"错误: 导出跟踪失败: {e}", file=sys.stderr)
+
+
+def run(parser, args):
+    """按参数执行合并、批量、比较或差分包操作，返回退出码"""
+    if args.watch and (args.batch or args.diff or args.make_patch or args.apply_patch or args.bundle or
+                       args.verify_bundle or args.extract_bundle or args.verify_sector_crc):
+        parser.error("--watch 不能与 --batch/--diff/--make-patch/--apply-patch/--bundle/--verify-sector-crc 同时使用")
+    if args.batch:
+        if args.output or args.layout or args.boot or args.app:
+            parser.error("--batch 不能与 -o/--layout/--boot/--app 同时使用")
+        try:
+            return run_batch(args)
+        except (OSError, MergeError) as e:
+            print(f"错误: {e}", file=sys.stderr)
+            return 1
+    if args.diff:
+        if args.output or args.layout or args.boot or args.app:
+            parser.error("--diff 不能与 -o/--layout/--boot/--app 同时使用")
+        return run_diff(args)
+    if args.make_patch or args.apply_patch:
+        if args.make_patch and args.apply_patch:
+            parser.error("--make-patch 不能与 --apply-patch 同时使用")
+        if not args.output:
+            parser.error("需要指定 -o/--output")
+        return run_patch(args)
+    if args.verify_bundle or args.extract_bundle:
+        if args.verify_bundle and args.extract_bundle:
+            parser.error("--verify-bundle 不能与 --extract-bundle 同时使用")
+        if args.layout or args.boot or args.app or args.bundle:
+            parser.error("--verify-bundle/--extract-bundle 不能与 --layout/--boot/--app/--bundle 同时使用")
+        if args.extract_bundle and not args.output:
+            parser.error("需要指定 -o/--output")
+        return run_bundle(args)
+    if args.verify_sector_crc:
+        if args.output or args.layout or args.boot or args.app:
+            parser.error("--verify-sector-crc 不能与 -o/--layout/--boot/--app 同时使用")
+        return run_sector_check(args)
+    if not args.output:
+        parser.error("需要指定 -o/--output")
+    if args.watch:
+        return run_watch(parser, args)
+    try:
+        layout, paths = build_layout(parser, args)
+        algorithms = tuple(args.checksum or SAVE_ALGORITHMS)
+        if args.bundle:
+            bundle.check_level(args.bundle_codec, args.bundle_level)
+        # 多个输入同时加载
+        if args.no_cache:
+            loaded = loadpool.load_all(paths, ())
+            inputs = {name: data for name, (data, _) in loaded.items()}
+            result = merge_layout(layout, inputs, fix_vector=not args.no_vector_fix)
+            sums = save_file(args.output, result.data, algorithms, args.format, record_length=args.record_length)
+        else:
+            loaded = loadpool.load_all(paths, (mergecache.KEY_ALGORITHM,), cache=checksum.default_cache())
+            inputs = {name: data for name, (data, _) in loaded.items()}
+            digests = {name: sums[mergecache.KEY_ALGORITHM] for name, (_, sums) in loaded.items()}
+            result = mergecache.merge_cached(layout, inputs, digests, fix_vector=not args.no_vector_fix)
+            sums = mergecache.save_merged(args.output, result, algorithms, args.format, args.record_length)
+        if args.hexdump:
+            save_hex_dump(args.hexdump, result.data, result.base_address)
+        if layout.sector_table is not None:
+            sector_table = sectorcrc.read_table(result.data, layout.sector_table.address)
+        if args.bundle:
+            manifest = bundle.write_bundle(args.bundle, result.data, result.base_address, layout, args.bundle_codec,
+                                           args.bundle_level, args.bundle_chunk_size, algorithms,
+                                           args.jobs or bundle.DEFAULT_WORKERS, result.reset_vectors)
+    except (OSError, MergeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+
+    if result.cached:
+        print("输入和布局未变化，使用缓存的合并结果")
+    for name, reset_vector in result.reset_vectors.items():
+        print(f"已修复{name}中断向量表，复位向量: 0x{reset_vector:08X}")
+    if layout.sector_table is not None:
+        print(f"已写入镜像头和扇区 CRC 表: {describe_sector_table(sector_table)}")
+    print(f"文件已保存: {args.output}")
+    print(f"大小: {result.size} 字节")
+    print(checksum.format_checksums(sums, "\n"))
+    if args.hexdump:
+        print(f"十六进制转储已导出: {args.hexdump}")
+    if args.bundle:
+        print(f"压缩包已保存: {args.bundle} ({manifest['bundle_size']} 字节，"
+              f"{manifest['bundle_size'] / max(1, manifest['size']):.1%}，{len(manifest['chunks'])} 块，"
+              f"{manifest['codec']} 级别 {manifest['level']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""合并核心逻辑
+
+这里的函数只依赖标准库，GUI 和命令行都通过它们完成合并，保证两条路径的输出逐字节一致。
+"""
+import os
+import mmap
+import struct
+
+from . import checksum, loaders, sectorcrc, trace, vectors
+from .image import SparseImage, iter_chunks
+from .errors import MergeError, LayoutError, Cancelled
+from .layout import Layout, Region
+from .writer import SAVE_ALGORITHMS, write_image
+from .hexwriter import DEFAULT_RECORD_LENGTH, output_format, write_records
+
+# 擦除后 Flash 的默认值
+FILL_BYTE = 0xFF
+
+# 两区域合并时的区域名称和默认地址
+BOOT_REGION = "BOOT"
+APP_REGION = "APP1"
+DEFAULT_BOOT_START = 0x8000000
+DEFAULT_BOOT_SIZE = 0x20000
+DEFAULT_APP_START = 0x8020000
+DEFAULT_APP_SIZE = 0x20000
+
+# 向量表修复要求的最小 APP 数据长度
+MIN_VECTOR_TABLE_SIZE = 512
+
+# 不小于此大小的文件使用内存映射加载，更小的文件直接读入内存
+MMAP_THRESHOLD = 4 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+
+class MergeResult:
+    """合并结果"""
+    def __init__(self, data, base_address, reset_vectors=None):
+        self.data = data
+        self.base_address = base_address
+        # {区域名: 修复后的复位向量}，只包含实际修复过的区域
+        self.reset_vectors = reset_vectors or {}
+        # 合并缓存的键、已知的校验和 {算法: 结果}，以及结果是否来自缓存（见 mergecache）
+        self.cache_key = None
+        self.checksums = {}
+        self.cached = False
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def reset_vector(self):
+        """第一个修复后的复位向量，未修复时为 None"""
+        return next(iter(self.reset_vectors.values()), None)
+
+
+def load_file(path, progress=None, use_mmap=None, checksums=None):
+    """读取二进制文件
+
+    大文件通过 mmap 映射为只读 memoryview，校验、显示和合并都直接引用映射，不复制文件内容；
+    小文件读入预先分配的 bytearray。use_mmap 为 None 时按 MMAP_THRESHOLD 自动选择。
+    progress(已处理字节数, 总字节数) 用于报告进度。
+    checksums 为 checksum.ChecksumSet 时逐块更新校验和。
+    """
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if use_mmap is None:
+            use_mmap = file_size >= MMAP_THRESHOLD
+        if use_mmap and file_size > 0:
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            if checksums is None:
+                if progress:
+                    progress(file_size, file_size)
+                return data
+            done = 0
+            for chunk in iter_chunks(data, READ_CHUNK_SIZE):
+                checksums.update(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, file_size)
+            return data
+
+        data = bytearray(file_size)
+        view = memoryview(data)
+        done = 0
+        while done < file_size:
+            chunk = view[done:done + READ_CHUNK_SIZE]
+            n = f.readinto(chunk)
+            if not n:
+                # 读取过程中文件被截断
+                del view, chunk
+                del data[done:]
+                return data
+            if checksums is not None:
+                checksums.update(chunk[:n])
+            done += n
+            if progress:
+                progress(done, file_size)
+        return data
+
+
+def is_mapped(data):
+    """data 是否为 load_file 映射的文件（而不是读入内存的数据）"""
+    return isinstance(data, memoryview) and isinstance(data.obj, mmap.mmap)
+
+
+def load_input(path, progress=None, checksums=None, use_mmap=None):
+    """按文件格式加载输入
+
+    BIN 文件返回缓冲区（放在区域起始地址）；Intel HEX、S-record 和 ELF 返回带绝对地址的 SparseImage。
+    checksums 为 checksum.ChecksumSet 时对加载后的数据（HEX 等格式为解码后的镜像）计算校验和。
+    use_mmap 传给 load_file；监视的输入随时会被改写，应以 use_mmap=False 读入内存，不保留文件映射。
+    """
+    fmt = loaders.detect_format(path)
+    with trace.span('load', path=os.path.basename(path), format=fmt) as span:
+        if fmt == 'bin':
+            data = load_file(path, progress, use_mmap, checksums)
+            span.add_bytes(len(data))
+            return data
+        image = loaders.LOADERS[fmt](path, progress)
+        span.add_bytes(len(image))
+    if checksums is not None:
+        with trace.span('checksum', len(image)):
+            for chunk in image.iter_chunks():
+                checksums.update(chunk)
+    return image
+
+
+def load_file_with_checksums(path, algorithms=checksum.DEFAULT_ALGORITHMS, progress=None, cache=None,
+                             use_mmap=None):
+    """读取输入文件（任意支持的格式）并在读取过程中计算校验和，返回 (数据, {算法: 结果})
+
+    cache 为 checksum.ChecksumCache 时，文件大小和修改时间未变则直接使用缓存结果，不再计算。
+    use_mmap 见 load_input。
+    """
+    key = checksum.ChecksumCache.file_key(path) if cache is not None else None
+    cached = cache.get(key, algorithms) if key is not None else None
+    if cached is not None:
+        return load_input(path, progress, use_mmap=use_mmap), cached
+
+    checksums = checksum.ChecksumSet(algorithms)
+    data = load_input(path, progress, checksums, use_mmap)
+    results = checksums.results()
+    # 读取期间文件被修改时不写入缓存
+    if key is not None and checksum.ChecksumCache.file_key(path) == key:
+        cache.put(key, results)
+    return data, results
+
+
+def input_extent(region, data):
+    """输入数据在合并镜像中的绝对地址范围 (起始, 结束)
+
+    BIN 数据从区域起始地址开始；SparseImage（HEX/S-record/ELF）使用自身记录的地址。
+    """
+    if isinstance(data, SparseImage):
+        return data.base_address, data.end_address
+    return region.start, region.start + len(data)
+
+
+def check_input(layout, name, data):
+    """检查区域 name 的输入数据能否放入该区域，返回区域"""
+    region = layout.check_data(name, len(data))
+    start, end = input_extent(region, data)
+    if not region.contains(start, end - start):
+        raise LayoutError(f"{name}数据地址范围(0x{start:08X}-0x{end:08X})超出区域"
+                          f"(0x{region.start:08X}-0x{region.end:08X})")
+    return region
+
+
+def write_input(merged, region, data):
+    """把区域的输入数据写入合并镜像（引用，不复制）"""
+    if isinstance(data, SparseImage):
+        for address, segment in data.segments():
+            merged.write(address, segment)
+    else:
+        merged.write(region.start, data)
+
+
+def fix_region_vectors(merged, region, data):
+    """修复合并镜像中区域的中断向量表，返回新的复位向量，无需修复时返回 None
+
+    区域指定了 link_address 时先平移全部处理程序，复位向量仍不在区域内时再按原规则修复。
+    """
+    with trace.span('vector_fix', region=region.name):
+        # 向量表位于区域起始地址，从合并结果中读取
+        _, end = input_extent(region, data)
+        app_data = merged.slice(region.start, end - region.start)
+        reset_vector = None
+        if region.link_address is not None:
+            table = vectors.analyze(app_data, region.start, region.end, link_address=region.link_address)
+            reset_vector = vectors.relocate(merged, table, region.link_address)
+            app_data = merged.slice(region.start, end - region.start)
+        return fix_interrupt_vector_table(merged, app_data, region.start) or reset_vector
+
+
+def write_sector_table(merged, layout, inputs):
+    """按 layout.sector_table 在合并镜像中写入镜像头和扇区 CRC 表，返回镜像头字段（见 sectorcrc）
+
+    覆盖范围从区域起始地址到区域数据的结束地址，按扇区大小向上取整，不超过区域结束地址。
+    """
+    config = layout.sector_table
+    region = layout.get(config.region)
+    data = inputs.get(region.name)
+    if data is None:
+        raise LayoutError(f"{region.name}没有数据，无法生成扇区 CRC 表")
+    _, end = input_extent(region, data)
+    sectors = -(-(end - region.start) // config.sector_size)
+    length = min(sectors * config.sector_size, region.size)
+    return sectorcrc.embed(merged, config, region.start, length)
+
+
+# 合并结果的格式版本，合并结果缓存（mergecache）的键包含此值。
+# 修改 merge_layout、向量表修复（fix_region_vectors、vectors）或扇区 CRC 表（sectorcrc）使同样的输入得到不同的合并结果时，
+# 必须在同一提交中加 1，否则会从缓存中读到旧的合并结果。
+# 2: 向量表重定位按区域的链接地址判断外部中断数量
+MERGE_FORMAT = 2
+
+
+def merge_layout(layout, inputs, fix_vector=True):
+    """按布局合并各区域数据，返回 MergeResult
+
+    inputs 为 {区域名: 数据}，没有数据的区域保持填充值。
+    合并范围从最低区域起始地址到最高区域结束地址，空隙填充 layout.fill。
+    结果是 SparseImage，只引用输入数据，不会按地址跨度分配内存。
+    布局指定了 sector_table 时，在修复向量表之后写入镜像头和扇区 CRC 表。
+    """
+    with trace.span('merge', sum(len(data) for data in inputs.values()), regions=len(layout)):
+        layout.validate()
+        for name, data in inputs.items():
+            check_input(layout, name, data)
+
+        merged = SparseImage(layout.start, layout.end - layout.start, layout.fill)
+        for region in layout:
+            data = inputs.get(region.name)
+            if data is not None:
+                write_input(merged, region, data)
+
+        reset_vectors = {}
+        if fix_vector:
+            for region in layout:
+                data = inputs.get(region.name)
+                if region.vector_table and data is not None:
+                    reset_vector = fix_region_vectors(merged, region, data)
+                    if reset_vector is not None:
+                        reset_vectors[region.name] = reset_vector
+
+        if layout.sector_table is not None:
+            write_sector_table(merged, layout, inputs)
+
+        return MergeResult(merged, layout.start, reset_vectors)
+
+
+def two_region_layout(boot_start, boot_size, app_start, app_size, app_link_address=None, sector_table=None):
+    """BOOT + APP1 两区域布局，APP1 修复中断向量表（指定 app_link_address 时重定位全部处理程序）"""
+    return Layout([Region(BOOT_REGION, boot_start, boot_size),
+                   Region(APP_REGION, app_start, app_size, vector_table=True, link_address=app_link_address)],
+                  FILL_BYTE, sector_table)
+
+
+def merge_images(boot_data, boot_start, boot_size, app_data, app_start, app_size, fix_vector=True):
+    """合并 BOOT 和 APP 数据，返回 MergeResult
+
+    合并范围从 BOOT 起始地址到 APP 区域结束地址，空隙填充 0xFF。
+    """
+    layout = two_region_layout(boot_start, boot_size, app_start, app_size)
+    return merge_layout(layout, {BOOT_REGION: boot_data, APP_REGION: app_data}, fix_vector)
+
+
+def fix_interrupt_vector_table(merged, app_data, app_start):
+    """修复合并镜像中APP的中断向量表，返回新的复位向量，无需修复时返回 None"""
+    if not app_data or len(app_data) < MIN_VECTOR_TABLE_SIZE:
+        return None
+
+    # 对于STM32，前两个字是初始堆栈指针和复位向量
+    # 复位向量应该指向APP区域的复位处理程序
+    reset_vector = struct.unpack('<I', bytes(app_data[4:8]))[0]
+    if app_start <= reset_vector < app_start + len(app_data):
+        return None
+
+    # 计算新的复位向量（假设复位处理程序在APP起始地址+1处）
+    new_reset_vector = app_start + 1
+    merged.write(app_start + 4, struct.pack('<I', new_reset_vector))
+    return new_reset_vector
+
+
+def compute_checksums(data):
+    """计算 CRC32 和 MD5，返回 (crc32, md5_hex)"""
+    results = checksum.compute(iter_chunks(data), ('crc32', 'md5'))
+    return results['crc32'], results['md5']
+
+
+def save_file(path, data, algorithms=SAVE_ALGORITHMS, fmt=None, base_address=0,
+              record_length=DEFAULT_RECORD_LENGTH, progress=None):
+    """保存合并后的数据，返回 {算法: 结果}，默认包含 crc32、md5 和 sha256
+
+    fmt 为 'bin'、'ihex' 或 'srec'，为 None 时按扩展名选择（.hex 为 Intel HEX，.srec/.s19 等为 S-record，其余为 BIN）。
+    HEX/S-record 跳过填充区段，地址取自 SparseImage，普通缓冲区使用 base_address；校验和始终针对镜像数据。
+    写入是流式的，文件通过临时文件加重命名原子替换。
+    progress(已处理字节数, 总字节数) 用于报告进度，抛出异常（例如 Cancelled）时停止写入，目标文件保持不变。
+    """
+    fmt = fmt or output_format(path)
+    with trace.span('save', len(data), path=os.path.basename(path), format=fmt):
+        if fmt == 'bin':
+            return write_image(path, data, algorithms=algorithms, progress=progress)
+        return write_records(path, data, fmt, base_address, record_length, algorithms, progress)
@@ -0,0 +1,179 @@
+"""镜像比较
+
+比较两个镜像（BIN 数据，或 HEX/S-record/ELF 加载得到的 SparseImage），按地址对齐后报告内容不同的地址区间，
+例如两个版本的合并文件，或合并文件与从 Flash 读回的数据。
+
+先把共同的地址范围按 BLOCK_SIZE 分块整块比较（内存比较在 C 中完成），相同的块直接跳过；
+只有不同的块才逐字节定位：两块转换为大整数后异或，结果中非零字节的连续区段就是不同的区间，用正则表达式查找。
+两个镜像大部分相同时，耗时只取决于整块比较，64MB 在几十毫秒内完成。
+稀疏镜像的空隙按填充值参与比较，与保存为 BIN 文件后的内容一致。
+只有一个镜像覆盖的地址按另一个镜像的填充值比较，例如 BIN 文件末尾的 0xFF 与导出的 HEX 文件没有记录的部分视为相同。
+"""
+import re
+import json
+
+from .image import SparseImage
+
+BLOCK_SIZE = 64 * 1024
+_NONZERO = re.compile(b'[^\x00]+')
+
+# 区间类型
+CHANGED = 'changed'
+ONLY_A = 'only_a'
+ONLY_B = 'only_b'
+KIND_LABELS = {CHANGED: "内容不同", ONLY_A: "仅A有", ONLY_B: "仅B有"}
+
+
+class DiffRange:
+    """不同的地址区间 [address, address + length)"""
+    def __init__(self, address, length, kind=CHANGED):
+        self.address = address
+        self.length = length
+        self.kind = kind
+
+    @property
+    def end(self):
+        return self.address + self.length
+
+    def __repr__(self):
+        return f"DiffRange(0x{self.address:08X}, {self.length}, {self.kind!r})"
+
+    def to_dict(self):
+        return {'address': f"0x{self.address:08X}", 'end': f"0x{self.end:08X}",
+                'length': self.length, 'kind': self.kind}
+
+
+class DiffResult:
+    """比较结果，a、b 为参与比较的镜像（SparseImage）"""
+    def __init__(self, a, b, ranges):
+        self.a = a
+        self.b = b
+        self.ranges = ranges
+
+    @property
+    def identical(self):
+        return not self.ranges
+
+    @property
+    def changed_bytes(self):
+        """共同地址范围内不同的字节数"""
+        return sum(r.length for r in self.ranges if r.kind == CHANGED)
+
+    @property
+    def start(self):
+        return min(self.a.base_address, self.b.base_address)
+
+    @property
+    def end(self):
+        return max(self.a.end_address, self.b.end_address)
+
+    def summary(self):
+        if self.identical:
+            return "两个镜像完全相同"
+        text = f"{len(self.ranges)} 个不同区间，共同地址范围内 {self.changed_bytes} 字节不同"
+        extra = sum(r.length for r in self.ranges if r.kind != CHANGED)
+        if extra:
+            text += f"，地址范围不一致的部分 {extra} 字节"
+        return text
+
+    def to_dict(self):
+        return {
+            'a': {'start': f"0x{self.a.base_address:08X}", 'size': self.a.size},
+            'b': {'start': f"0x{self.b.base_address:08X}", 'size': self.b.size},
+            'identical': self.identical,
+            'changed_bytes': self.changed_bytes,
+            'ranges': [r.to_dict() for r in self.ranges],
+        }
+
+
+def as_image(data, base_address=0):
+    """把 BIN 数据包装为从 base_address 开始的 SparseImage（不复制），SparseImage 原样返回"""
+    if isinstance(data, SparseImage):
+        return data
+    image = SparseImage(base_address, len(data))
+    image.write(base_address, data)
+    return image
+
+
+def aligned(image, start, end):
+    """把镜像扩展到 [start, end)（共享数据），用于按相同地址并排显示两个镜像"""
+    result = SparseImage(start, end - start, image.fill)
+    for address, data in image.segments():
+        result.write(address, data)
+    return result
+
+
+def _extent_ranges(image, start, end, kind, fill, block_size=BLOCK_SIZE):
+    """镜像中位于共同范围 [start, end) 之外、且不等于 fill（另一个镜像的填充值）的部分"""
+    not_fill = re.compile(b'[^' + re.escape(bytes([fill])) + b']+')
+    ranges = []
+    spans = [(image.base_address, min(image.end_address, start)), (max(image.base_address, end), image.end_address)]
+    for span_start, span_end in spans:
+        for address in range(span_start, span_end, block_size):
+            n = min(block_size, span_end - address)
+            data = bytes(image.read(address, n))
+            if data.count(fill) == n:
+                continue
+            for match in not_fill.finditer(data):
+                first = address + match.start()
+                if ranges and ranges[-1].end == first:
+                    ranges[-1].length += match.end() - match.start()
+                else:
+                    ranges.append(DiffRange(first, match.end() - match.start(), kind))
+    return ranges
+
+
+def compare(a, b, base_a=0, base_b=0, block_size=BLOCK_SIZE, progress=None):
+    """比较两个镜像，返回 DiffResult
+
+    a、b 为 SparseImage 或 BIN 数据（BIN 数据分别从 base_a、base_b 开始）。
+    相邻的不同字节合并为一个区间，区间按地址排序。progress(已比较字节数, 总字节数) 每块调用一次。
+    """
+    a = as_image(a, base_a)
+    b = as_image(b, base_b)
+    start = max(a.base_address, b.base_address)
+    end = min(a.end_address, b.end_address)
+
+    ranges = (_extent_ranges(a, start, end, ONLY_A, b.fill, block_size) +
+              _extent_ranges(b, start, end, ONLY_B, a.fill, block_size))
+    changed = []
+    for address in range(start, end, block_size):
+        n = min(block_size, end - address)
+        x = bytes(a.read(address, n))
+        y = bytes(b.read(address, n))
+        if x != y:
+            diff = (int.from_bytes(x, 'big') ^ int.from_bytes(y, 'big')).to_bytes(n, 'big')
+            for match in _NONZERO.finditer(diff):
+                first = address + match.start()
+                if changed and changed[-1].end == first:
+                    # 跨块的区间与前一块末尾的区间合并
+                    changed[-1].length += match.end() - match.start()
+                else:
+                    changed.append(DiffRange(first, match.end() - match.start()))
+        if progress:
+            progress(address + n - start, end - start)
+
+    ranges.extend(changed)
+    ranges.sort(key=lambda r: r.address)
+    return DiffResult(a, b, ranges)
+
+
+def format_report(result, limit=None):
+    """生成文本报告的行，limit 限制列出的区间数"""
+    lines = [
+        f"A: 0x{result.a.base_address:08X}-0x{result.a.end_address:08X} ({result.a.size} 字节)",
+        f"B: 0x{result.b.base_address:08X}-0x{result.b.end_address:08X} ({result.b.size} 字节)",
+        result.summary(),
+    ]
+    ranges = result.ranges if limit is None else result.ranges[:limit]
+    for r in ranges:
+        lines.append(f"  0x{r.address:08X}-0x{r.end - 1:08X}  {r.length:>10} 字节  {KIND_LABELS[r.kind]}")
+    if len(ranges) < len(result.ranges):
+        lines.append(f"  ... 其余 {len(result.ranges) - len(ranges)} 个区间未列出")
+    return lines
+
+
+def write_report(path, result):
+    """把比较结果写成 JSON 报告"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result.to_dict(), f, indent=4, ensure_ascii=False)
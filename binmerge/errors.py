@@ -0,0 +1,13 @@
+"""异常类型"""
+
+
+class MergeError(Exception):
+    """合并参数或输入数据不合法"""
+
+
+class LayoutError(MergeError):
+    """布局描述不合法（区域重叠、数据超出区域等）"""
+
+
+class Cancelled(MergeError):
+    """操作被取消（进度回调中检查到取消请求时抛出）"""
@@ -0,0 +1,226 @@
+"""Intel HEX 和 Motorola S-record 输出
+
+直接从合并镜像生成文本记录：稀疏镜像的空隙以及数据中不短于一条记录的填充值（0xFF）区段都会跳过，
+烧录器不必擦写这些区域。
+
+记录按批生成：一批记录的地址、数据和计数字段通过步长切片赋值填进预先分配的缓冲区，
+校验和按列累加（每条记录占一个整数"通道"，各列拼成大整数后相加，与 loaders 中的校验相同），
+最后用 bytes.hex() 一次性转换成文本，没有逐条记录、逐字节的 Python 循环。
+生成的文本按批写入临时文件，内存占用与镜像大小无关。
+"""
+import os
+import re
+import struct
+
+from .checksum import ChecksumSet
+from .errors import MergeError
+from .image import SparseImage, iter_chunks
+from .loaders import EXTENSIONS, lane_width
+from .writer import SAVE_ALGORITHMS, atomic_write
+
+DEFAULT_RECORD_LENGTH = 16
+# Intel HEX 记录长度字段为 1 字节；S-record 的计数字段还包含地址和校验和
+MAX_RECORD_LENGTH = 255
+MAX_SREC_RECORD_LENGTH = 250
+
+# 每批格式化的记录数
+BATCH_RECORDS = 4096
+
+# 校验和表：按列求和后的低字节 -> 校验和字节
+_IHEX_CHECKSUM = bytes(-s & 0xFF for s in range(256))
+_SREC_CHECKSUM = bytes(~s & 0xFF for s in range(256))
+
+# S-record 数据记录类型：地址字节数 -> (数据记录, 计数记录外的结束记录)
+_SREC_TYPES = {2: (b'S1', b'S9'), 3: (b'S2', b'S8'), 4: (b'S3', b'S7')}
+
+
+def _check_record_length(record_length, limit):
+    if not 1 <= record_length <= limit:
+        raise MergeError(f"记录长度必须在 1-{limit} 字节之间: {record_length}")
+
+
+def _format_records(marker, address, data, record_length, addr_size, count, record_type, checksum_table):
+    """把 data 切成 record_length 字节的记录，批量格式化为文本行
+
+    data 长度必须是 record_length 的整数倍（record_length 为 0 时生成一条不含数据的记录）。记录布局为
+    [计数][地址 addr_size 字节][类型（Intel HEX）][数据][校验和]，行首为 marker。
+    """
+    data = bytes(data)
+    n = len(data) // record_length if record_length else 1
+    head = 1 + addr_size + (record_type is not None)
+    length = head + record_length + 1
+    raw = bytearray(n * length)
+
+    raw[0::length] = bytes([count]) * n
+    step = record_length or 1
+    packed = struct.pack(f'>{n}I', *range(address, address + n * step, step))
+    for k in range(addr_size):
+        raw[1 + k::length] = packed[4 - addr_size + k::4]
+    if record_type is not None:
+        raw[head - 1::length] = bytes([record_type]) * n
+    for j in range(record_length):
+        raw[head + j::length] = data[j::record_length]
+
+    width = lane_width(length - 1)
+    lanes = bytearray(width * n)
+    total = 0
+    for j in range(length - 1):
+        lanes[width - 1::width] = raw[j::length]
+        total += int.from_bytes(lanes, 'big')
+    raw[length - 1::length] = total.to_bytes(width * n, 'big')[width - 1::width].translate(checksum_table)
+
+    text = raw.hex('\n', length).upper().encode('ascii')
+    return marker + text.replace(b'\n', b'\n' + marker) + b'\n'
+
+
+def _iter_records(marker, address, data, record_length, addr_size, count_extra, record_type, checksum_table,
+                  reached=None):
+    """按批格式化一段连续数据，最后不足一条记录的部分单独成行；reached(地址) 在每批之后调用"""
+    view = memoryview(data)
+    batch = BATCH_RECORDS * record_length
+    full = len(view) - len(view) % record_length
+    for offset in range(0, full, batch):
+        chunk = view[offset:min(offset + batch, full)]
+        yield _format_records(marker, address + offset, chunk, record_length, addr_size,
+                              record_length + count_extra, record_type, checksum_table)
+        if reached:
+            reached(address + offset + len(chunk))
+    if full < len(view):
+        rest = len(view) - full
+        yield _format_records(marker, address + full, view[full:], rest, addr_size,
+                              rest + count_extra, record_type, checksum_table)
+
+
+def data_ranges(data, base_address=0, fill=0xFF, min_gap=DEFAULT_RECORD_LENGTH):
+    """产生 (地址, memoryview)，跳过稀疏镜像的空隙和长度不小于 min_gap 的填充值区段"""
+    if isinstance(data, SparseImage):
+        segments = data.segments()
+        fill = data.fill
+    else:
+        segments = [(base_address, memoryview(data).cast('B'))]
+    # 以 min_gap 个填充字节的字面量开头，正则引擎可以用快速前缀查找跳过普通数据
+    fill_byte = re.escape(bytes([fill]))
+    gap = re.compile(fill_byte * min_gap + fill_byte + b'*')
+    for start, view in segments:
+        pos = 0
+        for match in gap.finditer(view):
+            if match.start() > pos:
+                yield start + pos, view[pos:match.start()]
+            pos = match.end()
+        if pos < len(view):
+            yield start + pos, view[pos:]
+
+
+def _image_end(data, base_address):
+    return data.end_address if isinstance(data, SparseImage) else base_address + len(data)
+
+
+def _progress_reporter(progress, start, end):
+    """把已处理到的地址换算为 progress(已处理字节数, 总字节数)"""
+    if progress is None:
+        return None
+    return lambda address: progress(address - start, end - start)
+
+
+def iter_ihex(data, base_address=0, record_length=DEFAULT_RECORD_LENGTH, progress=None):
+    """生成 Intel HEX 文本块（bytes），SparseImage 使用自身的基地址
+
+    记录不跨越 64KB 边界，每进入新的 64KB 段输出一条扩展线性地址记录（类型 04）。
+    progress(已处理字节数, 总字节数) 按已处理到的地址报告进度。
+    """
+    _check_record_length(record_length, MAX_RECORD_LENGTH)
+    if isinstance(data, SparseImage):
+        base_address = data.base_address
+    end = _image_end(data, base_address)
+    if end > 1 << 32:
+        raise MergeError("地址超出 Intel HEX 的 32 位地址范围")
+    reached = _progress_reporter(progress, base_address, end)
+
+    upper = None
+    for address, view in data_ranges(data, base_address, min_gap=record_length):
+        range_end = address + len(view)
+        offset = 0
+        while address + offset < range_end:
+            page_address = address + offset
+            page_end = min(range_end, (page_address | 0xFFFF) + 1)
+            if page_address >> 16 != upper:
+                upper = page_address >> 16
+                yield _format_records(b':', 0, upper.to_bytes(2, 'big'), 2, 2, 2, 4, _IHEX_CHECKSUM)
+            yield from _iter_records(b':', page_address & 0xFFFF, view[offset:page_end - address],
+                                     record_length, 2, 0, 0, _IHEX_CHECKSUM)
+            offset = page_end - address
+            if reached:
+                reached(page_end)
+    yield b':00000001FF\n'
+
+
+def iter_srec(data, base_address=0, record_length=DEFAULT_RECORD_LENGTH, header=b'bin_merger', progress=None):
+    """生成 Motorola S-record 文本块（bytes），SparseImage 使用自身的基地址
+
+    按镜像结束地址选择 S1/S2/S3 记录，最后输出记录计数（S5/S6）和结束记录（S9/S8/S7）。
+    progress(已处理字节数, 总字节数) 按已处理到的地址报告进度。
+    """
+    _check_record_length(record_length, MAX_SREC_RECORD_LENGTH)
+    if isinstance(data, SparseImage):
+        base_address = data.base_address
+    end = _image_end(data, base_address)
+    addr_size = next((size for size in (2, 3, 4) if end <= 1 << (8 * size)), None)
+    if addr_size is None:
+        raise MergeError("地址超出 S-record 的 32 位地址范围")
+    data_marker, end_marker = _SREC_TYPES[addr_size]
+    reached = _progress_reporter(progress, base_address, end)
+
+    yield _format_records(b'S0', 0, header, len(header), 2, len(header) + 3, None, _SREC_CHECKSUM)
+    records = 0
+    for address, view in data_ranges(data, base_address, min_gap=record_length):
+        records += -(-len(view) // record_length)
+        yield from _iter_records(data_marker, address, view, record_length, addr_size, addr_size + 1,
+                                 None, _SREC_CHECKSUM, reached)
+    if records <= 0xFFFF:
+        yield _format_records(b'S5', records, b'', 0, 2, 3, None, _SREC_CHECKSUM)
+    elif records <= 0xFFFFFF:
+        yield _format_records(b'S6', records, b'', 0, 3, 4, None, _SREC_CHECKSUM)
+    yield _format_records(end_marker, 0, b'', 0, addr_size, addr_size + 1, None, _SREC_CHECKSUM)
+
+
+WRITERS = {
+    'ihex': iter_ihex,
+    'srec': iter_srec,
+}
+
+OUTPUT_FORMATS = ('bin', 'ihex', 'srec')
+
+# 保存对话框的过滤器 -> (格式, 默认扩展名)
+SAVE_FILTERS = {
+    "BIN Files (*.bin)": ('bin', '.bin'),
+    "Intel HEX (*.hex)": ('ihex', '.hex'),
+    "S-Record (*.srec *.s19 *.s28 *.s37 *.mot)": ('srec', '.srec'),
+}
+
+
+def output_format(path):
+    """按扩展名选择输出格式，不是 HEX/S-record 扩展名时为 'bin'"""
+    fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    return fmt if fmt in WRITERS else 'bin'
+
+
+def write_records(path, data, fmt, base_address=0, record_length=DEFAULT_RECORD_LENGTH,
+                  algorithms=SAVE_ALGORITHMS, progress=None):
+    """把镜像以 Intel HEX（fmt='ihex'）或 S-record（fmt='srec'）格式原子写入 path
+
+    返回镜像数据（含填充，与保存为 BIN 时相同）的 {算法: 结果}。
+    progress(已处理字节数, 总字节数) 先后报告计算校验和与生成文本两遍的进度（总数为镜像大小的两倍）。
+    """
+    total = 2 * len(data)
+    checksums = ChecksumSet(algorithms)
+    done = 0
+    for chunk in iter_chunks(data):
+        checksums.update(chunk)
+        done += len(chunk)
+        if progress:
+            progress(done, total)
+    text_progress = (lambda done, _: progress(len(data) + done, total)) if progress else None
+    with atomic_write(path) as f:
+        for text in WRITERS[fmt](data, base_address, record_length, progress=text_progress):
+            f.write(text)
+    return checksums.results()
@@ -0,0 +1,222 @@
+"""稀疏镜像模型
+
+镜像只保存数据段（按地址排序的 memoryview），段之间的空隙视为填充值，
+读取、校验和导出时才按需生成填充字节。合并耗时和内存占用只与数据量有关，
+与地址跨度无关，因此 0x08000000 与 0x90000000 这类相距很远的布局也能直接处理。
+"""
+from bisect import bisect_left, bisect_right
+
+# 迭代输出时每块的最大字节数
+CHUNK_SIZE = 1024 * 1024
+
+
+class SparseImage:
+    """稀疏镜像
+
+    覆盖地址范围 [base_address, base_address + size)，未写入的部分读出为 fill。
+    写入的数据以 memoryview 引用保存，不复制；后写入的数据覆盖先写入的重叠部分。
+    支持 len() 和按偏移切片，可以直接交给 HexViewer 和十六进制转储使用。
+    """
+    def __init__(self, base_address, size, fill=0xFF):
+        if size < 0:
+            raise ValueError(f"镜像大小不能为负数: {size}")
+        self.base_address = base_address
+        self.size = size
+        self.fill = fill
+        self._starts = []
+        self._segments = []
+        self._fill_block = None
+
+    @property
+    def end_address(self):
+        return self.base_address + self.size
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return (f"SparseImage(base=0x{self.base_address:08X}, size=0x{self.size:X}, "
+                f"segments={len(self._segments)})")
+
+    def __getstate__(self):
+        """序列化（用于在进程间传递）时把数据段复制为 bytes，memoryview 本身不能序列化"""
+        state = self.__dict__.copy()
+        state['_segments'] = [bytes(data) for data in self._segments]
+        state['_fill_block'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._segments = [memoryview(data) for data in self._segments]
+
+    def _first_overlap(self, address):
+        """返回第一个结束地址大于 address 的段的下标"""
+        i = bisect_right(self._starts, address) - 1
+        if i < 0 or self._starts[i] + len(self._segments[i]) <= address:
+            i += 1
+        return i
+
+    def write(self, address, data):
+        """在 address 处写入数据（引用，不复制）"""
+        view = memoryview(data).cast('B')
+        end = address + len(view)
+        if address < self.base_address or end > self.end_address:
+            raise ValueError(f"写入范围 0x{address:08X}-0x{end:08X} 超出镜像范围 "
+                             f"0x{self.base_address:08X}-0x{self.end_address:08X}")
+        if not view:
+            return
+
+        lo = self._first_overlap(address)
+        hi = bisect_left(self._starts, end)
+        starts = []
+        segments = []
+        if lo < hi:
+            # 保留被覆盖段的左、右剩余部分
+            first_start, first_data = self._starts[lo], self._segments[lo]
+            if first_start < address:
+                starts.append(first_start)
+                segments.append(first_data[:address - first_start])
+        starts.append(address)
+        segments.append(view)
+        if lo < hi:
+            last_start, last_data = self._starts[hi - 1], self._segments[hi - 1]
+            if last_start + len(last_data) > end:
+                starts.append(end)
+                segments.append(last_data[end - last_start:])
+        self._starts[lo:hi] = starts
+        self._segments[lo:hi] = segments
+
+    def erase(self, address, length):
+        """把 [address, address + length) 恢复为填充值（删除该范围内的数据引用）"""
+        end = address + length
+        if length <= 0:
+            return
+        lo = self._first_overlap(address)
+        hi = bisect_left(self._starts, end)
+        if lo >= hi:
+            return
+        starts = []
+        segments = []
+        first_start, first_data = self._starts[lo], self._segments[lo]
+        if first_start < address:
+            starts.append(first_start)
+            segments.append(first_data[:address - first_start])
+        last_start, last_data = self._starts[hi - 1], self._segments[hi - 1]
+        if last_start + len(last_data) > end:
+            starts.append(end)
+            segments.append(last_data[end - last_start:])
+        self._starts[lo:hi] = starts
+        self._segments[lo:hi] = segments
+
+    def segments(self):
+        """返回 [(地址, memoryview)]，按地址排序"""
+        return list(zip(self._starts, self._segments))
+
+    def fill_ranges(self):
+        """返回未写入的空隙 [(地址, 长度)]"""
+        ranges = []
+        address = self.base_address
+        for start, data in zip(self._starts, self._segments):
+            if start > address:
+                ranges.append((address, start - address))
+            address = start + len(data)
+        if address < self.end_address:
+            ranges.append((address, self.end_address - address))
+        return ranges
+
+    @property
+    def data_size(self):
+        """实际数据字节数（不含填充）"""
+        return sum(len(data) for data in self._segments)
+
+    def read(self, address, length):
+        """读取 [address, address + length)，完全落在一个段内时返回零拷贝的 memoryview"""
+        end = address + length
+        if length < 0 or address < self.base_address or end > self.end_address:
+            raise ValueError(f"读取范围 0x{address:08X}-0x{end:08X} 超出镜像范围")
+
+        lo = self._first_overlap(address)
+        hi = bisect_left(self._starts, end)
+        if hi - lo == 1:
+            start, data = self._starts[lo], self._segments[lo]
+            if start <= address and end <= start + len(data):
+                return data[address - start:end - start]
+
+        out = bytearray([self.fill]) * length
+        for i in range(lo, hi):
+            start, data = self._starts[i], self._segments[i]
+            src_lo = max(address, start)
+            src_hi = min(end, start + len(data))
+            out[src_lo - address:src_hi - address] = data[src_lo - start:src_hi - start]
+        return out
+
+    def __getitem__(self, key):
+        """按相对 base_address 的偏移读取，与 bytes 的下标语义一致"""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            if step != 1:
+                raise ValueError("SparseImage 不支持步长切片")
+            return self.read(self.base_address + start, max(0, stop - start))
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError("SparseImage 下标越界")
+        return self.read(self.base_address + key, 1)[0]
+
+    def slice(self, address, size):
+        """截取 [address, address + size) 为新的稀疏镜像（共享数据，不复制）"""
+        end = address + size
+        if size < 0 or address < self.base_address or end > self.end_address:
+            raise ValueError(f"截取范围 0x{address:08X}-0x{end:08X} 超出镜像范围")
+        image = SparseImage(address, size, self.fill)
+        lo = self._first_overlap(address)
+        hi = bisect_left(self._starts, end)
+        for i in range(lo, hi):
+            start, data = self._starts[i], self._segments[i]
+            src_lo = max(address, start)
+            src_hi = min(end, start + len(data))
+            image._starts.append(src_lo)
+            image._segments.append(data[src_lo - start:src_hi - start])
+        return image
+
+    def _fill_chunk(self, length):
+        if self._fill_block is None:
+            self._fill_block = memoryview(bytes([self.fill]) * CHUNK_SIZE)
+        return self._fill_block[:length]
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """按地址顺序输出覆盖整个镜像的缓冲区，每块不超过 chunk_size 字节"""
+        chunk_size = min(chunk_size, CHUNK_SIZE)
+        address = self.base_address
+        for start, data in zip(self._starts, self._segments):
+            while address < start:
+                n = min(chunk_size, start - address)
+                yield self._fill_chunk(n)
+                address += n
+            for i in range(0, len(data), chunk_size):
+                yield data[i:i + chunk_size]
+            address = start + len(data)
+        while address < self.end_address:
+            n = min(chunk_size, self.end_address - address)
+            yield self._fill_chunk(n)
+            address += n
+
+    def write_to(self, fp):
+        """把整个镜像（含填充）写入二进制文件对象，返回写入的字节数"""
+        for chunk in self.iter_chunks():
+            fp.write(chunk)
+        return self.size
+
+    def tobytes(self):
+        """生成完整的连续字节串"""
+        return b''.join(self.iter_chunks())
+
+
+def iter_chunks(data, chunk_size=CHUNK_SIZE):
+    """按块遍历数据：SparseImage 逐块生成，普通缓冲区切成零拷贝的 memoryview"""
+    if isinstance(data, SparseImage):
+        yield from data.iter_chunks(chunk_size)
+        return
+    view = memoryview(data).cast('B')
+    for i in range(0, len(view), chunk_size):
+        yield view[i:i + chunk_size]
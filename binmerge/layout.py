@@ -0,0 +1,242 @@
+"""内存布局
+
+布局由任意数量的命名区域组成（BOOT、APP A/B、配置、校准、OTA 暂存区等）。
+区域按起始地址排序保存，起始地址列表作为区间索引：
+重叠检查排序后一次扫描完成，按地址查找区域用二分查找。
+
+布局文件为 JSON:
+    {
+        "fill": "0xFF",
+        "regions": [
+            {"name": "BOOT", "start": "0x08000000", "size": "0x20000", "file": "boot.bin"},
+            {"name": "APP1", "start": "0x08020000", "size": "0x60000", "file": "app.bin", "vector_table": true},
+            {"name": "CONFIG", "start": "0x08080000", "size": "0x800"}
+        ]
+    }
+地址和大小可以写成整数或字符串（支持 0x 前缀），file 为相对布局文件所在目录的路径。
+APP 按其他地址链接时，在区域中写 "link_address": "0x08000000"，合并时向量表中的全部处理程序平移到区域内。
+需要 bootloader 按扇区校验 APP 时，在布局中加上
+    "sector_crc": {"address": "0x0807F800", "region": "APP1", "sector_size": "0x800", "version": 3}
+合并时在 address 处写入镜像头和该区域的扇区 CRC 表（见 sectorcrc），sector_size 和 version 可以省略。
+"""
+import os
+import json
+from bisect import bisect_right
+
+from .errors import LayoutError
+
+# 扇区 CRC 表的默认扇区大小
+DEFAULT_SECTOR_SIZE = 0x800
+
+
+def parse_int(value):
+    """解析整数或 "0x..." 形式的字符串"""
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value), 0)
+    except ValueError:
+        raise LayoutError(f"无效的地址或大小: {value}")
+
+
+class Region:
+    """命名的内存区域 [start, start + size)"""
+    def __init__(self, name, start, size, path=None, vector_table=False, link_address=None):
+        self.name = name
+        self.start = start
+        self.size = size
+        # 区域的输入文件，可为 None
+        self.path = path
+        # 合并时是否修复该区域的中断向量表
+        self.vector_table = vector_table
+        # 区域数据的链接地址，不为 None 时合并时重定位向量表中的全部处理程序
+        self.link_address = link_address
+
+    @property
+    def end(self):
+        return self.start + self.size
+
+    def contains(self, address, length=0):
+        return self.start <= address and address + length <= self.end
+
+    def __repr__(self):
+        return f"Region({self.name!r}, 0x{self.start:08X}, 0x{self.size:X})"
+
+    def to_dict(self):
+        entry = {'name': self.name, 'start': f"0x{self.start:08X}", 'size': f"0x{self.size:X}"}
+        if self.path:
+            entry['file'] = self.path
+        if self.vector_table:
+            entry['vector_table'] = True
+        if self.link_address is not None:
+            entry['link_address'] = f"0x{self.link_address:08X}"
+        return entry
+
+
+class SectorTable:
+    """合并时写入的镜像头和扇区 CRC 表：写在 address 处，覆盖区域 region，按 sector_size 分扇区"""
+    def __init__(self, address, region, sector_size=DEFAULT_SECTOR_SIZE, version=0):
+        self.address = address
+        self.region = region
+        self.sector_size = sector_size
+        # 写入镜像头的版本号（由用户指定，例如固件版本）
+        self.version = version
+
+    def __repr__(self):
+        return f"SectorTable(0x{self.address:08X}, {self.region!r}, 0x{self.sector_size:X})"
+
+    def to_dict(self):
+        return {'address': f"0x{self.address:08X}", 'region': self.region,
+                'sector_size': f"0x{self.sector_size:X}", 'version': self.version}
+
+    @classmethod
+    def from_dict(cls, content):
+        try:
+            return cls(parse_int(content['address']), content['region'],
+                       parse_int(content.get('sector_size', DEFAULT_SECTOR_SIZE)), parse_int(content.get('version', 0)))
+        except (KeyError, TypeError, AttributeError):
+            raise LayoutError(f"sector_crc 缺少 address/region: {content}")
+
+
+class Layout:
+    """区域集合，按起始地址排序；sector_table 为 None 或 SectorTable"""
+    def __init__(self, regions=(), fill=0xFF, sector_table=None):
+        self.fill = fill
+        self.sector_table = sector_table
+        self.regions = []
+        self._starts = []
+        self._by_name = {}
+        for region in regions:
+            self.add(region)
+
+    def add(self, region):
+        if region.name in self._by_name:
+            raise LayoutError(f"区域名称重复: {region.name}")
+        i = bisect_right(self._starts, region.start)
+        self._starts.insert(i, region.start)
+        self.regions.insert(i, region)
+        self._by_name[region.name] = region
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    def __len__(self):
+        return len(self.regions)
+
+    def get(self, name):
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise LayoutError(f"布局中没有区域: {name}")
+
+    @property
+    def start(self):
+        return self.regions[0].start if self.regions else 0
+
+    @property
+    def end(self):
+        return max((region.end for region in self.regions), default=0)
+
+    def overlaps(self):
+        """返回重叠的区域对 [(a, b)]
+
+        区域已按起始地址排序，扫描时记录结束地址最大的区域，
+        当前区域起始地址小于它时即发生重叠，总复杂度 O(n)。
+        """
+        pairs = []
+        furthest = None
+        for region in self.regions:
+            if furthest is not None and region.start < furthest.end:
+                pairs.append((furthest, region))
+            if furthest is None or region.end > furthest.end:
+                furthest = region
+        return pairs
+
+    def validate(self):
+        """检查区域大小和重叠，不合法时抛出 LayoutError"""
+        if not self.regions:
+            raise LayoutError("布局中没有任何区域")
+        if not 0 <= self.fill <= 0xFF:
+            raise LayoutError(f"填充值必须在 0-255 之间: {self.fill}")
+        for region in self.regions:
+            if region.size <= 0:
+                raise LayoutError(f"区域 {region.name} 的大小必须大于0")
+            if region.start < 0:
+                raise LayoutError(f"区域 {region.name} 的起始地址不能为负数")
+        pairs = self.overlaps()
+        if pairs:
+            a, b = pairs[0]
+            raise LayoutError(f"区域 {a.name}(0x{a.start:08X}-0x{a.end:08X}) 与 "
+                              f"{b.name}(0x{b.start:08X}-0x{b.end:08X}) 重叠")
+        table = self.sector_table
+        if table is not None:
+            self.get(table.region)
+            if table.sector_size <= 0:
+                raise LayoutError(f"扇区大小必须大于0: {table.sector_size}")
+            if table.address % 4:
+                raise LayoutError(f"扇区 CRC 表地址必须按 4 字节对齐: 0x{table.address:08X}")
+            if not 0 <= table.version <= 0xFFFFFFFF:
+                raise LayoutError(f"镜像版本号超出范围: {table.version}")
+
+    def region_at(self, address):
+        """返回包含 address 的区域，没有时返回 None（区域不重叠时结果唯一）"""
+        i = bisect_right(self._starts, address) - 1
+        if i >= 0 and self.regions[i].contains(address, 1):
+            return self.regions[i]
+        return None
+
+    def check_data(self, name, length):
+        """检查数据是否能放进指定区域"""
+        region = self.get(name)
+        if length > region.size:
+            raise LayoutError(f"{name}文件大小({length}字节)超过分配的空间({region.size}字节)")
+        return region
+
+    @classmethod
+    def from_dict(cls, content, base_dir=None):
+        try:
+            entries = content['regions']
+        except (KeyError, TypeError):
+            raise LayoutError("布局缺少 regions 列表")
+        regions = []
+        for entry in entries:
+            try:
+                name = entry['name']
+                start = parse_int(entry['start'])
+                size = parse_int(entry['size'])
+            except (KeyError, TypeError):
+                raise LayoutError(f"区域描述缺少 name/start/size: {entry}")
+            path = entry.get('file')
+            if path and base_dir and not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            link_address = entry.get('link_address')
+            if link_address is not None:
+                link_address = parse_int(link_address)
+            regions.append(Region(name, start, size, path, bool(entry.get('vector_table', False)), link_address))
+        sector_table = content.get('sector_crc')
+        if sector_table is not None:
+            sector_table = SectorTable.from_dict(sector_table)
+        fill = parse_int(content.get('fill', 0xFF))
+        if not 0 <= fill <= 0xFF:
+            raise LayoutError(f"填充值必须在 0-255 之间: {content['fill']}")
+        return cls(regions, fill, sector_table)
+
+    def to_dict(self):
+        content = {'fill': f"0x{self.fill:02X}", 'regions': [region.to_dict() for region in self.regions]}
+        if self.sector_table is not None:
+            content['sector_crc'] = self.sector_table.to_dict()
+        return content
+
+    @classmethod
+    def load(cls, path):
+        """从 JSON 文件加载布局"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except ValueError as e:
+            raise LayoutError(f"布局文件格式错误: {e}")
+        return cls.from_dict(content, os.path.dirname(os.path.abspath(path)))
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
@@ -0,0 +1,413 @@
+"""Intel HEX、Motorola S-record 和 ELF 输入加载
+
+解析结果是 SparseImage（地址为文件中记录的绝对地址），可以直接参与合并，无需先转换为 BIN。
+
+文本格式按大块读取（每块 READ_BLOCK_SIZE 字节，只保留不完整的最后一行到下一块），
+每块内用 bytes.fromhex 一次性解码所有记录，再按记录长度字段切分。
+连续的等长数据记录（工具链输出的绝大部分内容）按列批量校验和提取，不逐条处理；
+地址连续的数据合并到同一个 bytearray，内存占用只与有效数据量有关。
+ELF 文件通过 mmap 读取，PT_LOAD 段直接引用映射中的数据，不复制。
+"""
+import os
+import mmap
+import struct
+
+from .errors import MergeError
+from .image import SparseImage
+
+# 文本格式每次读取的块大小
+READ_BLOCK_SIZE = 4 * 1024 * 1024
+
+# 扩展名到格式的映射，未列出的扩展名按内容判断，仍无法识别时作为 BIN 处理
+EXTENSIONS = {
+    '.hex': 'ihex', '.ihex': 'ihex', '.ihx': 'ihex',
+    '.srec': 'srec', '.s19': 'srec', '.s28': 'srec', '.s37': 'srec', '.mot': 'srec',
+    '.elf': 'elf', '.axf': 'elf', '.out': 'elf',
+    '.bin': 'bin',
+}
+
+# 文件选择对话框的过滤器
+FILE_FILTER = ("Firmware Files (*.bin *.hex *.ihex *.ihx *.srec *.s19 *.s28 *.s37 *.mot *.elf *.axf *.out);;"
+               "BIN Files (*.bin);;Intel HEX (*.hex *.ihex *.ihx);;S-Record (*.srec *.s19 *.s28 *.s37 *.mot);;"
+               "ELF Files (*.elf *.axf *.out);;All Files (*)")
+
+
+class FormatError(MergeError):
+    """输入文件格式错误"""
+
+
+def detect_format(path):
+    """返回 'bin'、'ihex'、'srec' 或 'elf'"""
+    fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt:
+        return fmt
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    if head == b'\x7fELF':
+        return 'elf'
+    if head[:1] == b':':
+        return 'ihex'
+    if head[:1] == b'S' and head[1:2].isdigit():
+        return 'srec'
+    return 'bin'
+
+
+class SegmentBuilder:
+    """收集 (地址, 数据)，地址连续的数据合并为一段"""
+    def __init__(self):
+        self.segments = []
+        self._start = None
+        self._next = None
+        self._buffer = None
+
+    def add(self, address, data):
+        if address != self._next:
+            self._flush()
+            self._start = address
+            self._buffer = bytearray()
+        self._buffer += data
+        self._next = address + len(data)
+
+    def _flush(self):
+        if self._buffer:
+            self.segments.append((self._start, self._buffer))
+        self._buffer = None
+
+    def build(self, path, fill=0xFF):
+        """返回包含全部数据的 SparseImage，没有任何数据时抛出 FormatError（path 用于错误信息）"""
+        self._flush()
+        if not self.segments:
+            raise FormatError(f"{path}: 文件中没有数据记录")
+        start = min(address for address, _ in self.segments)
+        end = max(address + len(data) for address, data in self.segments)
+        image = SparseImage(start, end - start, fill)
+        for address, data in self.segments:
+            image.write(address, data)
+        return image
+
+
+def iter_line_blocks(path, progress=None):
+    """按块读取文本文件，产生 (块, 块首行号)，每块只包含完整的行"""
+    total = os.path.getsize(path)
+    done = 0
+    line_number = 1
+    tail = b''
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            done += len(block)
+            block = tail + block
+            cut = block.rfind(b'\n') + 1
+            if cut == 0:
+                tail = block
+                continue
+            tail = block[cut:]
+            yield block[:cut], line_number
+            line_number += block.count(b'\n', 0, cut)
+            if progress:
+                progress(done, total)
+    if tail.strip():
+        yield tail, line_number
+    if progress:
+        progress(total, total)
+
+
+def _locate_bad_line(block, first_line, check):
+    """块解码失败时逐行定位错误，check(line) 对错误行抛出 ValueError"""
+    for i, line in enumerate(block.split(b'\n')):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            check(line)
+        except (ValueError, UnicodeDecodeError) as e:
+            return first_line + i, e
+    return first_line, None
+
+
+# 连续等长数据记录达到此数量时使用按列批量处理
+MIN_RUN = 8
+# 每次批量处理的最大记录数（扩展地址记录通常每 64KB 出现一次）
+MAX_RUN = 16384
+
+
+def _leading_count(column, value):
+    """column 开头连续等于 value 的字节数"""
+    return len(column) - len(column.lstrip(bytes([value])))
+
+
+def lane_width(columns):
+    """按列累加 columns 个字节时每条记录所需的通道字节数（保证和不会进位到相邻通道）"""
+    return 2 if columns * 0xFF <= 0xFFFF else 3
+
+
+def _uniform_run(records, pos, length, type_offset, data_type, count_offset, limit):
+    """从 pos 开始长度相同、类型为数据记录的连续记录数（最多 limit 条）"""
+    n = min((len(records) - pos) // length, limit)
+    end = pos + n * length
+    counts = records[pos + count_offset:end:length]
+    types = records[pos + type_offset:end:length]
+    return min(_leading_count(counts, counts[0]), _leading_count(types, data_type))
+
+
+def _decode_run(records, pos, n, length, addr_offset, addr_size, data_offset, data_size, sum_offset, sum_value):
+    """按列批量校验并提取最多 n 条等长数据记录
+
+    只处理开头地址连续递增的记录，返回 (记录数, 首记录地址, 数据)；
+    连续的记录少于 MIN_RUN 条或校验和有错误时返回 None，由调用方逐条处理。
+    校验和按列累加：每条记录占一个整数"通道"，各列拼成大整数后相加，
+    一次大整数加法就完成了所有记录同一列的求和，通道足够宽不会相互进位（见 lane_width）。
+    """
+    end = pos + n * length
+    address_bytes = bytearray(n * addr_size)
+    for k in range(addr_size):
+        address_bytes[k::addr_size] = records[pos + addr_offset + k:end:length]
+    first = int.from_bytes(address_bytes[:addr_size], 'big')
+    n = min(n, ((1 << (8 * addr_size)) - first) // data_size)
+    packed = struct.pack(f'>{n}I', *range(first, first + n * data_size, data_size))
+    if addr_size == 4:
+        expected = packed
+    else:
+        expected = bytearray(n * addr_size)
+        for k in range(addr_size):
+            expected[k::addr_size] = packed[4 - addr_size + k::4]
+    size = n * addr_size
+    # 大端整数异或后的最高位对应第一个不同的字节，由此得到地址连续的记录数
+    diff = int.from_bytes(address_bytes[:size], 'big') ^ int.from_bytes(expected, 'big')
+    n = (size - (diff.bit_length() + 7) // 8) // addr_size if diff else n
+    if n < MIN_RUN:
+        return None
+    end = pos + n * length
+
+    width = lane_width(length - sum_offset)
+    lanes = bytearray(width * n)
+    total = 0
+    for j in range(sum_offset, length):
+        lanes[width - 1::width] = records[pos + j:end:length]
+        total += int.from_bytes(lanes, 'big')
+    if total.to_bytes(width * n, 'big')[width - 1::width] != bytes([sum_value]) * n:
+        return None
+
+    data = bytearray(n * data_size)
+    for j in range(data_size):
+        data[j::data_size] = records[pos + data_offset + j:end:length]
+    return n, first, data
+
+
+def load_ihex(path, progress=None):
+    """加载 Intel HEX 文件"""
+    builder = SegmentBuilder()
+    upper = 0
+    finished = False
+    # 批量处理的扫描窗口：成功时加倍，失败时减半，记录地址频繁不连续时避免反复扫描大窗口
+    window = MAX_RUN
+
+    def check_line(line):
+        if line[:1] != b':':
+            raise ValueError("记录不以 ':' 开头")
+        record = bytes.fromhex(line[1:].decode('ascii'))
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise ValueError("记录长度错误")
+        if sum(record) & 0xFF:
+            raise ValueError("校验和错误")
+
+    def fail(block, first_line, reason):
+        line_number, error = _locate_bad_line(block, first_line, check_line)
+        raise FormatError(f"{path}: 第{line_number}行格式错误: {error or reason}")
+
+    for block, first_line in iter_line_blocks(path, progress):
+        if finished:
+            if block.strip():
+                raise FormatError(f"{path}: 文件结束记录之后还有数据 (第{first_line}行附近)")
+            continue
+        # 一次性解码整个块（fromhex 会跳过空白），冒号数量必须与记录数一致
+        try:
+            records = bytes.fromhex(block.translate(None, b':').decode('ascii'))
+        except (ValueError, UnicodeDecodeError):
+            fail(block, first_line, "无法解码")
+
+        view = memoryview(records)
+        total = len(records)
+        pos = 0
+        count = 0
+        while pos < total:
+            length = records[pos] + 5
+            end = pos + length
+            if end > total:
+                fail(block, first_line, "记录长度错误")
+            record_type = records[pos + 3]
+            if record_type == 0 and length > 5:
+                n = _uniform_run(records, pos, length, 3, 0, 0, window)
+                run = None
+                if n >= MIN_RUN:
+                    run = _decode_run(records, pos, n, length, 1, 2, 4, length - 5, 0, 0)
+                if run is not None:
+                    n, address, data = run
+                    builder.add(upper + address, data)
+                    pos += n * length
+                    count += n
+                    window = min(window * 2, MAX_RUN)
+                    continue
+                window = max(window // 2, MIN_RUN)
+            if sum(view[pos:end]) & 0xFF:
+                fail(block, first_line, "校验和错误")
+            if record_type == 0:
+                builder.add(upper + (records[pos + 1] << 8 | records[pos + 2]), view[pos + 4:end - 1])
+            elif record_type == 4:
+                upper = (records[pos + 4] << 8 | records[pos + 5]) << 16
+            elif record_type == 2:
+                upper = (records[pos + 4] << 8 | records[pos + 5]) << 4
+            elif record_type == 1:
+                finished = True
+            elif record_type not in (3, 5):
+                raise FormatError(f"{path}: 不支持的记录类型 {record_type:02X}")
+            count += 1
+            pos = end
+            if finished:
+                break
+
+        if count != block.count(b':'):
+            fail(block, first_line, "记录与行不对应")
+        if pos < total:
+            raise FormatError(f"{path}: 文件结束记录之后还有数据")
+
+    return builder.build(path)
+
+
+# S-record 类型 -> 地址字节数（只列出数据记录）
+_SREC_DATA_TYPES = {1: 2, 2: 3, 3: 4}
+# 头记录、计数记录和起始地址记录，不包含数据
+_SREC_OTHER_TYPES = {0, 5, 6, 7, 8, 9}
+# 把记录开头的 "Sn" 变为 "0n"，整块解码后每条记录以类型字节开头
+_SREC_PREFIX = bytes.maketrans(b'S', b'0')
+
+
+def load_srec(path, progress=None):
+    """加载 Motorola S-record 文件"""
+    builder = SegmentBuilder()
+    window = MAX_RUN
+
+    def check_line(line):
+        if line[:1] != b'S' or not line[1:2].isdigit():
+            raise ValueError("记录不以 'S0'-'S9' 开头")
+        record = bytes.fromhex(line[2:].decode('ascii'))
+        if not record or len(record) != record[0] + 1:
+            raise ValueError("记录长度错误")
+        if sum(record) & 0xFF != 0xFF:
+            raise ValueError("校验和错误")
+
+    def fail(block, first_line, reason):
+        line_number, error = _locate_bad_line(block, first_line, check_line)
+        raise FormatError(f"{path}: 第{line_number}行格式错误: {error or reason}")
+
+    for block, first_line in iter_line_blocks(path, progress):
+        try:
+            records = bytes.fromhex(block.translate(_SREC_PREFIX).decode('ascii'))
+        except (ValueError, UnicodeDecodeError):
+            fail(block, first_line, "无法解码")
+
+        view = memoryview(records)
+        total = len(records)
+        pos = 0
+        count = 0
+        while pos < total:
+            if pos + 2 > total:
+                fail(block, first_line, "记录长度错误")
+            record_type = records[pos]
+            length = records[pos + 1] + 2
+            end = pos + length
+            if end > total:
+                fail(block, first_line, "记录长度错误")
+            address_size = _SREC_DATA_TYPES.get(record_type)
+            if address_size and length > address_size + 3:
+                n = _uniform_run(records, pos, length, 0, record_type, 1, window)
+                run = None
+                if n >= MIN_RUN:
+                    run = _decode_run(records, pos, n, length, 2, address_size, 2 + address_size,
+                                      length - address_size - 3, 1, 0xFF)
+                if run is not None:
+                    n, address, data = run
+                    builder.add(address, data)
+                    pos += n * length
+                    count += n
+                    window = min(window * 2, MAX_RUN)
+                    continue
+                window = max(window // 2, MIN_RUN)
+            if sum(view[pos + 1:end]) & 0xFF != 0xFF:
+                fail(block, first_line, "校验和错误")
+            if address_size:
+                address = int.from_bytes(view[pos + 2:pos + 2 + address_size], 'big')
+                builder.add(address, view[pos + 2 + address_size:end - 1])
+            elif record_type not in _SREC_OTHER_TYPES:
+                fail(block, first_line, "不支持的记录类型")
+            count += 1
+            pos = end
+
+        if count != block.count(b'S'):
+            fail(block, first_line, "记录与行不对应")
+
+    return builder.build(path)
+
+
+PT_LOAD = 1
+
+
+def load_elf(path, progress=None):
+    """加载 ELF 文件中的 PT_LOAD 段（按物理地址 p_paddr 放置）"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 52:
+            raise FormatError(f"{path}: 不是有效的 ELF 文件")
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    if bytes(data[:4]) != b'\x7fELF':
+        raise FormatError(f"{path}: 不是有效的 ELF 文件")
+    elf_class, elf_data = data[4], data[5]
+    if elf_class not in (1, 2) or elf_data not in (1, 2):
+        raise FormatError(f"{path}: 不支持的 ELF 类型")
+    endian = '<' if elf_data == 1 else '>'
+
+    try:
+        if elf_class == 1:
+            phoff, = struct.unpack_from(endian + 'I', data, 28)
+            phentsize, phnum = struct.unpack_from(endian + 'HH', data, 42)
+            header = endian + 'IIIIIIII'
+        else:
+            phoff, = struct.unpack_from(endian + 'Q', data, 32)
+            phentsize, phnum = struct.unpack_from(endian + 'HH', data, 54)
+            header = endian + 'IIQQQQQQ'
+
+        builder_segments = []
+        for i in range(phnum):
+            fields = struct.unpack_from(header, data, phoff + i * phentsize)
+            if elf_class == 1:
+                p_type, p_offset, _, p_paddr, p_filesz = fields[:5]
+            else:
+                p_type, _, p_offset, _, p_paddr, p_filesz = fields[:6]
+            if p_type != PT_LOAD or p_filesz == 0:
+                continue
+            if p_offset + p_filesz > size:
+                raise FormatError(f"{path}: 程序段超出文件范围")
+            builder_segments.append((p_paddr, data[p_offset:p_offset + p_filesz]))
+    except struct.error:
+        raise FormatError(f"{path}: ELF 程序头损坏")
+
+    if progress:
+        progress(size, size)
+    if not builder_segments:
+        raise FormatError(f"{path}: 文件中没有可加载的程序段")
+    start = min(address for address, _ in builder_segments)
+    end = max(address + len(segment) for address, segment in builder_segments)
+    image = SparseImage(start, end - start)
+    for address, segment in sorted(builder_segments, key=lambda item: item[0]):
+        image.write(address, segment)
+    return image
+
+
+LOADERS = {
+    'ihex': load_ihex,
+    'srec': load_srec,
+    'elf': load_elf,
+}
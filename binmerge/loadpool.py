@@ -0,0 +1,148 @@
+"""输入文件加载池
+
+LoaderPool 用固定数量的工作线程同时加载任意多个输入文件（core.load_file_with_checksums），
+按字节汇总全部任务的进度，可以取消单个或全部任务，并可为任务设置超时。
+文件读取、CRC32 和摘要计算都在 C 代码中释放 GIL，多个文件真正并行加载，界面线程在加载大文件时也保持响应。
+
+取消和超时借助加载函数的进度回调实现：每处理一块数据回调一次，任务已取消或超时时抛出 LoadCancelled/LoadTimeout，
+加载在下一块数据处停止；排队中尚未开始的任务直接取消。用同一个键（例如区域名）重新提交时，旧任务自动取消。
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import checksum
+from .core import load_file_with_checksums
+from .errors import Cancelled
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class LoadCancelled(Cancelled):
+    """加载被取消"""
+
+
+class LoadTimeout(LoadCancelled):
+    """加载超时"""
+
+
+class LoadJob:
+    """一个输入文件的加载任务，结束后 result() 返回 (数据, {算法: 结果}) 或抛出加载时的异常
+
+    timeout 为从开始加载（不含排队时间）起允许的秒数，None 表示不限制。
+    use_mmap 见 core.load_input。
+    """
+    def __init__(self, key, path, algorithms=checksum.DEFAULT_ALGORITHMS, timeout=None, cache=None, use_mmap=None):
+        self.key = key
+        self.path = path
+        self.algorithms = tuple(algorithms)
+        self.timeout = timeout
+        self.cache = cache
+        self.use_mmap = use_mmap
+        try:
+            self.total = os.path.getsize(path)
+        except OSError:
+            self.total = 0
+        self.done = 0
+        self.started = None
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        """取消任务，正在加载时在处理下一块数据时停止"""
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def _check(self, done, total):
+        self.done = done
+        if self.cancelled:
+            raise LoadCancelled(f"已取消加载 {self.path}")
+        if self.timeout is not None and time.monotonic() - self.started > self.timeout:
+            raise LoadTimeout(f"加载 {self.path} 超时（超过 {self.timeout:g} 秒）")
+
+    def run(self):
+        """在当前线程中加载"""
+        self.started = time.monotonic()
+        self._check(0, self.total)
+        result = load_file_with_checksums(self.path, self.algorithms, self._check, self.cache, self.use_mmap)
+        self.done = self.total
+        if self.cancelled:
+            raise LoadCancelled(f"已取消加载 {self.path}")
+        return result
+
+    def finished(self):
+        return self.future is not None and self.future.done()
+
+    def result(self, timeout=None):
+        """等待任务结束并返回结果；排队时被取消的任务抛出 LoadCancelled"""
+        if self.future.cancelled():
+            raise LoadCancelled(f"已取消加载 {self.path}")
+        return self.future.result(timeout)
+
+
+class LoaderPool:
+    """在 workers 个工作线程中加载输入文件的任务池"""
+    def __init__(self, workers=DEFAULT_WORKERS, timeout=None, cache=None):
+        self.timeout = timeout
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='loader')
+        self._lock = threading.Lock()
+        # {键: 最新的任务}
+        self._jobs = {}
+        # 汇总进度的任务（从任务池空闲后第一次提交起）
+        self._batch = []
+
+    def submit(self, key, path, algorithms=checksum.DEFAULT_ALGORITHMS, timeout=None, done=None, use_mmap=None):
+        """提交加载任务并返回 LoadJob；同一键的旧任务被取消
+
+        done(job) 在任务结束（完成、失败或取消）后调用，通常在工作线程中执行。
+        """
+        job = LoadJob(key, path, algorithms, self.timeout if timeout is None else timeout, self.cache, use_mmap)
+        with self._lock:
+            previous = self._jobs.get(key)
+            if previous is not None:
+                previous.cancel()
+            if all(old.finished() for old in self._batch):
+                self._batch = []
+            self._jobs[key] = job
+            self._batch.append(job)
+            job.future = self._executor.submit(job.run)
+        if done is not None:
+            job.future.add_done_callback(lambda future: done(job))
+        return job
+
+    def progress(self):
+        """返回 (已处理字节数, 总字节数)，汇总当前这批任务中未取消的任务"""
+        with self._lock:
+            jobs = [job for job in self._batch if not job.cancelled]
+        return sum(job.done for job in jobs), sum(job.total for job in jobs)
+
+    def pending(self):
+        """尚未结束的任务数"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished())
+
+    def cancel(self, key=None):
+        """取消键为 key 的任务，key 为 None 时取消全部任务"""
+        with self._lock:
+            jobs = list(self._jobs.values()) if key is None else [self._jobs.get(key)]
+        for job in jobs:
+            if job is not None:
+                job.cancel()
+
+    def shutdown(self, wait=False):
+        """取消全部任务并关闭工作线程"""
+        self.cancel()
+        self._executor.shutdown(wait=wait)
+
+
+def load_all(paths, algorithms=checksum.DEFAULT_ALGORITHMS, workers=DEFAULT_WORKERS, timeout=None, cache=None):
+    """同时加载 {名称: 路径}，返回 {名称: (数据, {算法: 结果})}；任一文件失败时取消其余任务并抛出该异常"""
+    pool = LoaderPool(workers, timeout, cache)
+    try:
+        jobs = [pool.submit(name, path, algorithms) for name, path in paths.items()]
+        return {job.key: job.result() for job in jobs}
+    finally:
+        pool.shutdown()
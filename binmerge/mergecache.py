@@ -0,0 +1,277 @@
+"""合并结果缓存
+
+合并结果按内容寻址保存在用户缓存目录（可通过 BIN_MERGER_CACHE_DIR 覆盖）下的 merges 目录中，GUI、命令行和批量合并共用。
+键是以下内容的 SHA256：合并结果的格式版本（core.MERGE_FORMAT）、布局参数（区域地址、大小、向量表设置和填充值，
+不含文件路径）、是否修复向量表，以及每个输入内容的 SHA256 和形状（BIN 的长度，HEX/S-record/ELF 的地址范围和段表）。
+输入文件换了路径或重新生成但内容不变时仍然命中。
+
+每个条目由两个文件组成:
+    <键>.bin   合并镜像的各数据段依次拼接（不含段之间的填充，稀疏布局不会按地址跨度占用空间）
+    <键>.json  镜像地址、大小、填充值、段表、复位向量、已知的校验和，以及 .bin 文件的大小和 CRC32
+读取时检查 .bin 的大小和 CRC32，不一致或无法解析的条目视为未命中并删除；命中时直接返回保存的校验和，
+保存输出文件时不再计算。缓存总大小超过上限时按最近使用时间（命中时更新 .json 的修改时间）删除最久未用的条目。
+"""
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+
+from . import trace
+from .core import MERGE_FORMAT, MergeResult, load_file, merge_layout, save_file
+from .hexwriter import DEFAULT_RECORD_LENGTH
+from .image import SparseImage, iter_chunks
+from .paths import user_cache_dir
+from .writer import SAVE_ALGORITHMS, atomic_write
+
+# 输入内容摘要的算法，加载输入时与其他校验和一起计算（并由校验和缓存保存）
+KEY_ALGORITHM = 'sha256'
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# 只有 .bin 没有 .json 的条目（写入中途退出）超过此时间（秒）后删除
+ORPHAN_AGE = 3600
+
+
+def _input_key(data, digest):
+    if isinstance(data, SparseImage):
+        return {'digest': digest, 'base': data.base_address, 'size': len(data),
+                'segments': [[address, len(segment)] for address, segment in data.segments()]}
+    return {'digest': digest, 'size': len(data)}
+
+
+def merge_key(layout, inputs, digests, fix_vector=True):
+    """合并的缓存键（十六进制字符串）；任一输入没有摘要时返回 None
+
+    inputs 为 {区域名: 数据}，digests 为 {区域名: 内容的 SHA256}。
+    """
+    if any(not digests.get(name) for name in inputs):
+        return None
+    layout_dict = layout.to_dict()
+    layout_dict['regions'] = [{k: v for k, v in region.items() if k != 'file'} for region in layout_dict['regions']]
+    content = {
+        'version': MergeCache.VERSION,
+        'merge_format': MERGE_FORMAT,
+        'layout': layout_dict,
+        'fix_vector': bool(fix_vector),
+        'inputs': {name: _input_key(data, digests[name]) for name, data in inputs.items()},
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class MergeCache:
+    """磁盘上的合并结果缓存，总大小不超过 max_bytes"""
+    VERSION = 1
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _paths(self, key):
+        return (os.path.join(self.directory, key + '.bin'), os.path.join(self.directory, key + '.json'))
+
+    def _read_meta(self, meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != self.VERSION:
+            raise ValueError("缓存版本不一致")
+        return meta
+
+    def _write_meta(self, meta_path, meta):
+        with atomic_write(meta_path) as f:
+            f.write(json.dumps(meta).encode('utf-8'))
+
+    def get(self, key, progress=None):
+        """命中时返回 MergeResult（cached 为 True，checksums 为保存的校验和），否则返回 None
+
+        progress(已读取字节数, 总字节数) 报告读取缓存数据的进度。
+        """
+        with trace.span('cache', operation='get'):
+            return self._get(key, progress)
+
+    def _get(self, key, progress):
+        data_path, meta_path = self._paths(key)
+        try:
+            meta = self._read_meta(meta_path)
+            data = load_file(data_path, progress)
+            if len(data) != meta['data_size'] or zlib.crc32(data) != meta['data_crc32']:
+                raise ValueError("缓存数据损坏")
+            image = SparseImage(meta['base_address'], meta['size'], meta['fill'])
+            offset = 0
+            for address, length in meta['segments']:
+                image.write(address, data[offset:offset + length])
+                offset += length
+            # 更新修改时间作为最近使用时间
+            os.utime(meta_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            self.remove(key)
+            return None
+        result = MergeResult(image, meta['base_address'], meta['reset_vectors'])
+        result.cache_key = key
+        result.checksums = dict(meta['checksums'])
+        result.cached = True
+        return result
+
+    def put(self, key, result, checksums=None, progress=None):
+        """保存合并结果，超过缓存上限的结果不保存；写入失败时忽略（缓存不可用不影响合并）
+
+        progress(已写入字节数, 总字节数) 报告写入缓存数据的进度。
+        """
+        image = result.data
+        if isinstance(image, SparseImage):
+            segments = image.segments()
+            fill = image.fill
+        else:
+            segments = [(result.base_address, memoryview(image).cast('B'))]
+            fill = 0xFF
+        data_size = sum(len(segment) for _, segment in segments)
+        if data_size > self.max_bytes:
+            return
+        checksums = {**result.checksums, **(checksums or {})}
+        data_path, meta_path = self._paths(key)
+        try:
+            with trace.span('cache', data_size, operation='put'):
+                os.makedirs(self.directory, exist_ok=True)
+                crc = 0
+                done = 0
+                with atomic_write(data_path) as f:
+                    for _, segment in segments:
+                        for chunk in iter_chunks(segment):
+                            f.write(chunk)
+                            crc = zlib.crc32(chunk, crc)
+                            done += len(chunk)
+                            if progress:
+                                progress(done, data_size)
+                self._write_meta(meta_path, {
+                    'version': self.VERSION,
+                    'base_address': result.base_address,
+                    'size': len(image),
+                    'fill': fill,
+                    'segments': [[address, len(segment)] for address, segment in segments],
+                    'reset_vectors': result.reset_vectors,
+                    'checksums': checksums,
+                    'data_size': data_size,
+                    'data_crc32': crc,
+                })
+        except OSError:
+            return
+        result.cache_key = key
+        result.checksums = checksums
+        self.evict()
+
+    def add_checksums(self, key, checksums):
+        """把保存输出文件时算出的校验和补充到条目中"""
+        _, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                meta = self._read_meta(meta_path)
+                meta['checksums'].update(checksums)
+                self._write_meta(meta_path, meta)
+            except (OSError, ValueError, KeyError, AttributeError):
+                pass
+
+    def remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def entries(self):
+        """返回 [(最近使用时间, 键, 数据大小)]，以及超时的孤立数据文件列表"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return [], []
+        metas = {name[:-5] for name in names if name.endswith('.json')}
+        entries = []
+        orphans = []
+        now = time.time()
+        for name in names:
+            if not name.endswith('.bin'):
+                continue
+            key = name[:-4]
+            try:
+                data_stat = os.stat(os.path.join(self.directory, name))
+                if key not in metas:
+                    if now - data_stat.st_mtime > ORPHAN_AGE:
+                        orphans.append(key)
+                    continue
+                used = os.stat(os.path.join(self.directory, key + '.json')).st_mtime
+            except OSError:
+                # 其他进程正在删除该条目
+                continue
+            entries.append((used, key, data_stat.st_size))
+        return entries, orphans
+
+    def size(self):
+        """缓存数据的总字节数"""
+        return sum(size for _, _, size in self.entries()[0])
+
+    def evict(self):
+        """删除最久未用的条目，直到总大小不超过 max_bytes"""
+        with self._lock:
+            entries, orphans = self.entries()
+            for key in orphans:
+                self.remove(key)
+            total = sum(size for _, _, size in entries)
+            for _, key, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self.remove(key)
+                total -= size
+
+    def clear(self):
+        for _, key, _ in self.entries()[0]:
+            self.remove(key)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """用户缓存目录下的共享合并结果缓存"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = MergeCache(os.path.join(user_cache_dir(), 'merges'))
+        return _default_cache
+
+
+def merge_cached(layout, inputs, digests, fix_vector=True, cache=None, progress=None):
+    """与 core.merge_layout 相同，结果经过缓存；返回的 MergeResult.cached 表示是否命中
+
+    digests 为 {区域名: 输入内容的 SHA256}（load_file_with_checksums 按 KEY_ALGORITHM 计算的结果），
+    任一输入没有摘要时直接合并，不使用缓存。
+    progress(已处理字节数, 总字节数) 报告读取或写入缓存的进度。
+    """
+    cache = cache or default_cache()
+    key = merge_key(layout, inputs, digests, fix_vector)
+    if key is not None:
+        result = cache.get(key, progress)
+        if result is not None:
+            return result
+    result = merge_layout(layout, inputs, fix_vector)
+    if key is not None:
+        cache.put(key, result, progress=progress)
+    return result
+
+
+def save_merged(path, result, algorithms=SAVE_ALGORITHMS, fmt=None, record_length=DEFAULT_RECORD_LENGTH, cache=None,
+                progress=None):
+    """保存合并结果（core.save_file），返回 {算法: 结果}
+
+    缓存中已有全部所需校验和时直接返回，不再计算；否则把保存时算出的校验和补充到缓存条目中。
+    """
+    if all(name in result.checksums for name in algorithms):
+        save_file(path, result.data, (), fmt, result.base_address, record_length, progress)
+        return {name: result.checksums[name] for name in algorithms}
+    sums = save_file(path, result.data, algorithms, fmt, result.base_address, record_length, progress)
+    if result.cache_key is not None:
+        (cache or default_cache()).add_checksums(result.cache_key, sums)
+        result.checksums.update(sums)
+    return sums
@@ -0,0 +1,160 @@
+"""区域占用情况扫描
+
+按 Flash 页（或扇区）把区域分为三类:
+    ERASED  整页都是填充值（擦除状态）
+    MIXED   页内既有数据，也有不短于 MIN_ERASED_RUN 字节的填充值区段（例如程序末尾的最后一页）
+    DATA    整页都是数据
+数据区段用 hexwriter.data_ranges 查找（正则表达式在 C 中跳过填充值区段），整页落在区段内的页用切片赋值一次标记，
+Python 代码只处理区段两端的页。
+
+每个非擦除页还估算熵：同一个 zlib 压缩流中每页之后做一次 Z_FULL_FLUSH（清空字典，各页独立压缩），
+压缩后长度与页大小之比即为每字节位数的估计值（0-8 位缩放到 0-255），不需要逐字节统计直方图。
+
+扫描结果按内容摘要缓存（scan_cached），绘制时只使用预先算好的结果。
+"""
+import zlib
+from collections import OrderedDict
+
+from .hexwriter import data_ranges
+from .image import SparseImage
+
+DEFAULT_PAGE_SIZE = 2048
+# 不短于此长度的填充值区段视为已擦除
+MIN_ERASED_RUN = 32
+
+ERASED = 0
+MIXED = 1
+DATA = 2
+STATE_LABELS = {ERASED: "擦除", MIXED: "部分", DATA: "数据"}
+
+# 每扫描这么多页检查一次是否取消
+_CHECK_PAGES = 256
+
+
+class PageMap:
+    """区域的逐页扫描结果
+
+    states[i]、entropy[i] 为第 i 页的状态和熵估计（0-255 对应每字节 0-8 位，擦除页为 0）。
+    """
+    def __init__(self, start, size, page_size, states, entropy):
+        self.start = start
+        self.size = size
+        self.page_size = page_size
+        self.states = bytes(states)
+        self.entropy = bytes(entropy)
+
+    def __len__(self):
+        return len(self.states)
+
+    def counts(self):
+        """{状态: 页数}"""
+        return {state: self.states.count(state) for state in STATE_LABELS}
+
+    def summary(self):
+        counts = self.counts()
+        return " / ".join(f"{STATE_LABELS[state]} {counts[state]}" for state in (DATA, MIXED, ERASED)) + " 页"
+
+    def columns(self, count):
+        """把所有页平均分成 count 列，返回每列的 [(状态, 最大熵)]
+
+        一列内的页状态都相同时取该状态，否则为 MIXED，用于按像素宽度绘制。
+        """
+        pages = len(self.states)
+        result = []
+        for column in range(count):
+            lo = column * pages // count
+            hi = max(lo + 1, (column + 1) * pages // count)
+            states = self.states[lo:hi]
+            if not states:
+                result.append((ERASED, 0))
+                continue
+            first = states[0]
+            state = first if states.count(first) == len(states) else MIXED
+            result.append((state, max(self.entropy[lo:hi])))
+        return result
+
+
+def scan(data, region_start, region_size, page_size=DEFAULT_PAGE_SIZE, fill=0xFF, cancelled=None):
+    """扫描区域 [region_start, region_start + region_size)，返回 PageMap；cancelled() 返回 True 时返回 None
+
+    data 为 BIN 数据（从 region_start 开始）或 SparseImage（使用自身地址），区域内没有数据的部分视为擦除。
+    """
+    pages = -(-region_size // page_size)
+    states = bytearray(pages)
+    region_end = region_start + region_size
+    full = bytes([DATA]) * pages
+
+    # 页内数据区段 [(页号, 起始偏移, 结束偏移)]，用于计算熵
+    data_pages = []
+    for address, view in data_ranges(data, region_start, fill, MIN_ERASED_RUN):
+        lo = max(address, region_start) - region_start
+        hi = min(address + len(view), region_end) - region_start
+        if lo >= hi:
+            continue
+        first, last = lo // page_size, (hi - 1) // page_size
+        # 中间的页被数据完全覆盖
+        if last - first > 1:
+            states[first + 1:last] = full[:last - first - 1]
+        for page in {first, last}:
+            page_lo = page * page_size
+            page_hi = min(page_lo + page_size, region_size)
+            states[page] = DATA if lo <= page_lo and hi >= page_hi else MIXED
+        data_pages.append((first, last))
+
+    image = data if isinstance(data, SparseImage) else None
+    view = None if image is not None else memoryview(data).cast('B')
+    entropy = bytearray(pages)
+    compressor = zlib.compressobj(1)
+    scanned = 0
+    previous = -1
+    for first, last in data_pages:
+        for page in range(max(first, previous + 1), last + 1):
+            page_lo = page * page_size
+            length = min(page_size, region_size - page_lo)
+            if image is not None:
+                chunk = image.read(region_start + page_lo, length)
+            else:
+                chunk = view[page_lo:page_lo + length]
+            compressed = len(compressor.compress(chunk)) + len(compressor.flush(zlib.Z_FULL_FLUSH))
+            # 压缩流的块头等开销使随机数据略大于原长度
+            entropy[page] = min(255, compressed * 255 // max(1, len(chunk)))
+            scanned += 1
+            if cancelled and scanned % _CHECK_PAGES == 0 and cancelled():
+                return None
+        previous = last
+    return PageMap(region_start, region_size, page_size, states, entropy)
+
+
+# 扫描结果缓存: {(内容摘要, 数据长度, 基地址, 参数): PageMap}
+# 按内容而不是对象缓存，不保存数据引用：大文件的数据映射着输入文件，重新加载后旧映射应当立即释放
+CACHE_SIZE = 16
+_cache = OrderedDict()
+
+
+def _cache_key(data, digest, region_start, region_size, page_size, fill):
+    base_address = data.base_address if isinstance(data, SparseImage) else None
+    return digest, len(data), base_address, region_start, region_size, page_size, fill
+
+
+def cached(data, digest, region_start, region_size, page_size=DEFAULT_PAGE_SIZE, fill=0xFF):
+    """返回缓存的扫描结果，没有时返回 None；digest 为数据内容的摘要（例如 SHA256），为 None 时不使用缓存"""
+    if digest is None:
+        return None
+    key = _cache_key(data, digest, region_start, region_size, page_size, fill)
+    result = _cache.get(key)
+    if result is not None:
+        _cache.move_to_end(key)
+    return result
+
+
+def scan_cached(data, digest, region_start, region_size, page_size=DEFAULT_PAGE_SIZE, fill=0xFF, cancelled=None):
+    """与 scan 相同，内容摘要和参数相同的结果直接从缓存返回（见 cached）"""
+    result = cached(data, digest, region_start, region_size, page_size, fill)
+    if result is not None:
+        return result
+    result = scan(data, region_start, region_size, page_size, fill, cancelled)
+    if result is not None and digest is not None:
+        _cache[_cache_key(data, digest, region_start, region_size, page_size, fill)] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
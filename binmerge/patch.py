@@ -0,0 +1,265 @@
+"""差分升级包
+
+根据旧镜像和新镜像生成差分包，设备（或 apply_patch）用旧镜像加差分包还原出新镜像，
+蜂窝网络下只需下载差分包。
+
+匹配算法与 bsdiff 相同的思路：
+1. 旧镜像按 MATCH_SIZE 字节对齐分块，以块内容为键建立字典；逐字节扫描新镜像，查到的块向前、向后精确扩展成匹配；
+2. 相邻两个匹配之间的区段，从前一个匹配向后、从后一个匹配向前做近似扩展（按相同的地址差值，匹配的字节多于不匹配的字节就继续），
+   固件中代码整体移动后，大部分字节相同、只有跳转地址等少数字节不同，这类区段仍按旧数据差分；
+3. 差分区段保存新旧数据的异或值（大部分为 0），无法匹配的区段原样保存。
+控制信息、异或数据和原样数据分别用 LZMA 压缩。
+
+差分包头部记录新旧镜像的大小和校验和（算法和格式与 save_file 报告的一致，针对保存为 BIN 时的完整内容），
+应用前校验旧镜像，应用后校验结果。
+"""
+import json
+import lzma
+import struct
+
+from . import checksum
+from .errors import MergeError
+from .image import SparseImage, iter_chunks
+from .writer import SAVE_ALGORITHMS, atomic_write
+
+MAGIC = b'BMPATCH1'
+MATCH_SIZE = 16
+# 控制信息：(差分长度, 原样数据长度, 差分对应的旧镜像偏移)
+_CONTROL = struct.Struct('<III')
+_HEADER_SIZE = struct.Struct('<I')
+
+
+class PatchError(MergeError):
+    """差分包格式错误或与镜像不匹配"""
+
+
+def _flat(data):
+    """镜像的完整内容（SparseImage 含填充，与保存为 BIN 时相同）"""
+    return data.tobytes() if isinstance(data, SparseImage) else bytes(data)
+
+
+def _checksums(data, algorithms):
+    results = checksum.compute(iter_chunks(data), algorithms)
+    return {name: checksum.format_value(value) for name, value in results.items()}
+
+
+def _xor(a, b):
+    """等长字节串逐字节异或"""
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+def _common_length(a, i, b, j, limit):
+    """a[i:] 与 b[j:] 相同前缀的长度（不超过 limit），按倍增的块比较，块内用异或定位第一个不同的字节"""
+    n = 0
+    step = 64
+    while n < limit:
+        k = min(step, limit - n)
+        x = a[i + n:i + n + k]
+        y = b[j + n:j + n + k]
+        if x != y:
+            d = int.from_bytes(x, 'little') ^ int.from_bytes(y, 'little')
+            return n + ((d & -d).bit_length() - 1) // 8
+        n += k
+        step = min(step * 2, 1024 * 1024)
+    return n
+
+
+def _find_matches(old, new):
+    """返回新镜像中的精确匹配 [(新偏移, 旧偏移, 长度)]，按新偏移排序且互不重叠"""
+    index = {}
+    for i in range(0, len(old) - MATCH_SIZE + 1, MATCH_SIZE):
+        index.setdefault(old[i:i + MATCH_SIZE], i)
+
+    get = index.get
+    matches = []
+    pos = 0
+    floor = 0
+    delta = 0
+    last = len(new) - MATCH_SIZE
+    while pos <= last:
+        key = new[pos:pos + MATCH_SIZE]
+        old_pos = get(key)
+        if old_pos is None:
+            pos += 1
+            continue
+        # 同样的内容在旧镜像中也按上一个匹配的地址差值出现时，优先沿用该差值
+        if 0 <= pos + delta <= len(old) - MATCH_SIZE and old[pos + delta:pos + delta + MATCH_SIZE] == key:
+            old_pos = pos + delta
+        back = 0
+        while pos - back > floor and old_pos - back > 0 and new[pos - back - 1] == old[old_pos - back - 1]:
+            back += 1
+        length = back + MATCH_SIZE + _common_length(new, pos + MATCH_SIZE, old, old_pos + MATCH_SIZE,
+                                                   min(len(new) - pos, len(old) - old_pos) - MATCH_SIZE)
+        matches.append((pos - back, old_pos - back, length))
+        delta = old_pos - pos
+        pos = floor = pos - back + length
+    return matches
+
+
+def _extend_score(new, old, positions, delta):
+    """沿 positions 逐字节比较 new[p] 与 old[p + delta]，返回使（匹配数 * 2 - 长度）最大的长度"""
+    score = best_score = best = 0
+    for i, p in enumerate(positions):
+        if new[p] == old[p + delta]:
+            score += 1
+        if score * 2 - (i + 1) > best_score * 2 - best:
+            best_score = score
+            best = i + 1
+    return best
+
+
+def _controls(old, new, matches):
+    """把匹配转换为控制信息 [(差分长度, 原样长度, 旧偏移)]"""
+    controls = []
+    # 从新旧镜像的开头（地址差值为 0）开始，第一个匹配之前的区段也可以近似匹配
+    prev_new, prev_old, prev_len = 0, 0, 0
+    for next_new, next_old, next_len in matches + [(len(new), len(old), 0)]:
+        gap_start = prev_new + prev_len
+        gap = next_new - gap_start
+        delta_f = prev_old - prev_new
+        delta_b = next_old - next_new
+        # 近似扩展不能超出旧镜像
+        limit_f = max(0, min(gap, len(old) - (gap_start + delta_f)))
+        limit_b = max(0, min(gap, next_old)) if next_len else 0
+        lenf = _extend_score(new, old, range(gap_start, gap_start + limit_f), delta_f)
+        lenb = _extend_score(new, old, range(next_new - 1, next_new - 1 - limit_b, -1), delta_b)
+        if lenf + lenb > gap:
+            # 两侧扩展重叠时，选择使两侧匹配字节数之和最大的分界点
+            overlap = lenf + lenb - gap
+            start = next_new - lenb
+            score = best_score = lens = 0
+            for i in range(overlap):
+                p = start + i
+                if new[p] == old[p + delta_f]:
+                    score += 1
+                if new[p] == old[p + delta_b]:
+                    score -= 1
+                if score > best_score:
+                    best_score = score
+                    lens = i + 1
+            lenf += lens - overlap
+            lenb -= lens
+        controls.append((prev_len + lenf, gap - lenf - lenb, prev_old))
+        prev_new, prev_old, prev_len = next_new - lenb, next_old - lenb, next_len + lenb
+    return controls
+
+
+def make_patch(old, new, algorithms=SAVE_ALGORITHMS, preset=9):
+    """生成从 old 到 new 的差分包（bytes），old、new 为 BIN 数据或 SparseImage
+
+    新镜像为 SparseImage 时在头部记录它的基地址，还原后可以按原地址保存为 HEX/S-record。
+    """
+    base_address = new.base_address if isinstance(new, SparseImage) else 0
+    old = _flat(old)
+    new = _flat(new)
+    controls = _controls(old, new, _find_matches(old, new))
+
+    control_stream = bytearray()
+    diff_parts = []
+    extra_parts = []
+    pos = 0
+    for diff_len, extra_len, old_pos in controls:
+        control_stream += _CONTROL.pack(diff_len, extra_len, old_pos)
+        diff_parts.append(_xor(new[pos:pos + diff_len], old[old_pos:old_pos + diff_len]))
+        pos += diff_len
+        extra_parts.append(new[pos:pos + extra_len])
+        pos += extra_len
+
+    streams = [lzma.compress(part, preset=preset)
+               for part in (bytes(control_stream), b''.join(diff_parts), b''.join(extra_parts))]
+    header = {
+        'version': 1,
+        'old_size': len(old),
+        'new_size': len(new),
+        'base_address': base_address,
+        'old_checksums': _checksums(old, algorithms),
+        'new_checksums': _checksums(new, algorithms),
+        'streams': [len(stream) for stream in streams],
+    }
+    header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    return MAGIC + _HEADER_SIZE.pack(len(header)) + header + b''.join(streams)
+
+
+def read_header(patch):
+    """解析差分包头部，返回 (头部字典, 数据流列表)"""
+    patch = bytes(patch)
+    if not patch.startswith(MAGIC) or len(patch) < len(MAGIC) + _HEADER_SIZE.size:
+        raise PatchError("不是差分包文件")
+    offset = len(MAGIC) + _HEADER_SIZE.size
+    (size,) = _HEADER_SIZE.unpack_from(patch, len(MAGIC))
+    try:
+        header = json.loads(patch[offset:offset + size].decode('utf-8'))
+        lengths = header['streams']
+        header['old_size'], header['new_size'], header['old_checksums'], header['new_checksums']
+        header.setdefault('base_address', 0)
+    except (ValueError, KeyError, TypeError):
+        raise PatchError("差分包头部损坏")
+    offset += size
+    streams = []
+    for length in lengths:
+        streams.append(patch[offset:offset + length])
+        offset += length
+    if offset != len(patch):
+        raise PatchError("差分包长度不正确")
+    return header, streams
+
+
+def _check(actual, expected, what):
+    for name, value in expected.items():
+        if actual.get(name) != value:
+            raise PatchError(f"{what}的{checksum.LABELS.get(name, name)}不一致: {actual.get(name)}（应为 {value}）")
+
+
+def apply_patch(old, patch):
+    """把差分包应用到 old，返回新镜像（bytes）；旧镜像或结果与差分包记录的校验和不一致时抛出 PatchError"""
+    header, streams = read_header(patch)
+    old = _flat(old)
+    algorithms = tuple(header['old_checksums'])
+    if len(old) != header['old_size']:
+        raise PatchError(f"旧镜像大小({len(old)}字节)与差分包不一致（应为 {header['old_size']} 字节）")
+    _check(_checksums(old, algorithms), header['old_checksums'], "旧镜像")
+
+    try:
+        control_stream, diff, extra = (lzma.decompress(stream) for stream in streams)
+    except (lzma.LZMAError, ValueError):
+        raise PatchError("差分包数据损坏")
+    if len(control_stream) % _CONTROL.size:
+        raise PatchError("差分包控制信息损坏")
+
+    out = bytearray(header['new_size'])
+    pos = diff_pos = extra_pos = 0
+    for diff_len, extra_len, old_pos in _CONTROL.iter_unpack(control_stream):
+        if (pos + diff_len + extra_len > len(out) or old_pos + diff_len > len(old) or
+                diff_pos + diff_len > len(diff) or extra_pos + extra_len > len(extra)):
+            raise PatchError("差分包控制信息超出范围")
+        out[pos:pos + diff_len] = _xor(old[old_pos:old_pos + diff_len], diff[diff_pos:diff_pos + diff_len])
+        pos += diff_len
+        diff_pos += diff_len
+        out[pos:pos + extra_len] = extra[extra_pos:extra_pos + extra_len]
+        pos += extra_len
+        extra_pos += extra_len
+    if pos != len(out):
+        raise PatchError("差分包数据不完整")
+
+    _check(_checksums(out, algorithms), header['new_checksums'], "还原的新镜像")
+    return bytes(out)
+
+
+def verify_patch(old, new, patch):
+    """检查差分包能否由 old 还原出与 new 完全相同的内容"""
+    try:
+        return apply_patch(old, patch) == _flat(new)
+    except PatchError:
+        return False
+
+
+def write_patch(path, old, new, algorithms=SAVE_ALGORITHMS):
+    """生成差分包并原子写入 path，写入前先验证能还原出新镜像，返回头部字典"""
+    patch = make_patch(old, new, algorithms)
+    if not verify_patch(old, new, patch):
+        raise PatchError("生成的差分包校验失败")
+    with atomic_write(path) as f:
+        f.write(patch)
+    header, _ = read_header(patch)
+    header['size'] = len(patch)
+    return header
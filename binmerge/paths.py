@@ -0,0 +1,19 @@
+"""用户数据目录"""
+import os
+import sys
+
+APP_NAME = 'bin_merger'
+
+
+def user_cache_dir():
+    """缓存目录，可通过环境变量 BIN_MERGER_CACHE_DIR 覆盖"""
+    override = os.environ.get('BIN_MERGER_CACHE_DIR')
+    if override:
+        return override
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, APP_NAME)
@@ -0,0 +1,234 @@
+"""字节模式和字符串搜索
+
+模式写法（parse_pattern）:
+    DE AD BE EF        十六进制字节，空格可省略（DEADBEEF）
+    DE ?? BE EF        ?? 匹配任意字节
+    D? AD ?F           ? 匹配半个字节
+    "BOOT"             ASCII/UTF-8 字符串
+    u"BOOT"            UTF-16LE 字符串
+
+多个模式一次遍历数据完成搜索。数据按块（CHUNK_SIZE）处理，块之间保留足够的重叠，跨块的匹配也能找到。
+每块先做一次过滤：用 bytes.translate 把每个字节映射为一个位图——每个模式选取最有区分度的 FILTER_WIDTH 个连续字节作为"窗口"，
+第 j 个位置对第 g 组模式可接受的字节在位图中对应 2j + g 位；把整块位图看作一个大整数，
+右移 10、20、30 位后与自身相与，结果中某字节的第 g 位非零，表示从该位置开始的 4 个字节同时满足第 g 组中某个模式的窗口。
+translate、整数转换、移位和按位与都在 C 中完成，Python 代码只处理极少数的候选位置，再用预编译的正则表达式逐个确认。
+模式超过两组时使用多张位图（每张 2 组）。
+"""
+import re
+
+from .image import SparseImage
+
+# 块较小时 translate 结果和移位产生的大整数都留在 CPU 缓存中
+CHUNK_SIZE = 64 * 1024
+# 过滤窗口的字节数和每张位图的模式组数（FILTER_WIDTH * GROUPS_PER_PLANE 不超过 8 位）
+FILTER_WIDTH = 4
+GROUPS_PER_PLANE = 2
+# 每组模式数达到此值时再增加一张位图（组内模式越多，需要确认的候选位置越多）
+PATTERNS_PER_GROUP = 32
+_HEX_DIGITS = '0123456789abcdefABCDEF'
+
+
+class PatternError(ValueError):
+    """模式写法错误"""
+
+
+class Pattern:
+    """搜索模式
+
+    accept 为每个位置可接受的字节值（bytes），None 表示任意字节。
+    """
+    def __init__(self, text, accept):
+        if not accept:
+            raise PatternError(f"空的搜索模式: {text}")
+        self.text = text
+        self.accept = accept
+        self.regex = re.compile(b''.join(_regex_item(values) for values in accept), re.DOTALL)
+
+    def __len__(self):
+        return len(self.accept)
+
+    def __repr__(self):
+        return f"Pattern({self.text!r})"
+
+    def window(self):
+        """过滤窗口的起始偏移：可接受字节组合数最少的 FILTER_WIDTH 个连续位置"""
+        if len(self.accept) <= FILTER_WIDTH:
+            return 0
+        counts = [256 if values is None else len(values) for values in self.accept]
+
+        def combinations(offset):
+            product = 1
+            for count in counts[offset:offset + FILTER_WIDTH]:
+                product *= count
+            return product
+        return min(range(len(counts) - FILTER_WIDTH + 1), key=combinations)
+
+
+def _regex_item(values):
+    if values is None:
+        return b'.'
+    if len(values) == 1:
+        return re.escape(values)
+    return b'[' + b''.join(re.escape(bytes([value])) for value in values) + b']'
+
+
+def _parse_hex_byte(token):
+    """解析 "DE"、"??"、"D?"、"?E"，返回可接受的字节值"""
+    if token == '??':
+        return None
+    if any(c not in _HEX_DIGITS + '?' for c in token):
+        raise PatternError(f"无效的十六进制字节: {token}")
+    if '?' not in token:
+        return bytes([int(token, 16)])
+    if token[0] == '?':
+        low = int(token[1], 16)
+        return bytes(high << 4 | low for high in range(16))
+    high = int(token[0], 16)
+    return bytes(high << 4 | low for low in range(16))
+
+
+def parse_pattern(text):
+    """按模块说明中的写法解析模式"""
+    text = text.strip()
+    for prefix, encoding in (('u"', 'utf-16-le'), ('"', 'utf-8')):
+        if text.startswith(prefix) and text.endswith('"') and len(text) > len(prefix):
+            literal = text[len(prefix):-1].encode(encoding)
+            return Pattern(text, [bytes([value]) for value in literal])
+
+    digits = ''.join(text.split())
+    if digits.lower().startswith('0x'):
+        digits = digits[2:]
+    if len(digits) % 2:
+        raise PatternError(f"十六进制模式的位数必须是偶数: {text}")
+    return Pattern(text, [_parse_hex_byte(digits[i:i + 2]) for i in range(0, len(digits), 2)])
+
+
+def _iter_runs(data, base_address):
+    """产生 (地址, [memoryview])：地址连续的数据，SparseImage 中未写入的填充区域不参与搜索"""
+    if not isinstance(data, SparseImage):
+        if len(data):
+            yield base_address, [memoryview(data).cast('B')]
+        return
+    run_address = None
+    views = []
+    end = None
+    for address, view in data.segments():
+        if address != end and views:
+            yield run_address, views
+            views = []
+        if not views:
+            run_address = address
+        views.append(view)
+        end = address + len(view)
+    if views:
+        yield run_address, views
+
+
+class PatternSet:
+    """一组同时搜索的模式"""
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        if not self.patterns:
+            raise PatternError("没有搜索模式")
+        # 块之间的重叠：保证任何匹配（含过滤窗口）都完整落在某一块内
+        self.overlap = max(max(len(p), FILTER_WIDTH) for p in self.patterns) - 1
+
+        groups = max(GROUPS_PER_PLANE, -(-len(self.patterns) // PATTERNS_PER_GROUP))
+        planes = -(-groups // GROUPS_PER_PLANE)
+        # 每张位图: (translate 表, [(组位, [(模式, 窗口偏移)])])
+        self.planes = []
+        for plane in range(planes):
+            table = bytearray(256)
+            members = [(g, []) for g in range(GROUPS_PER_PLANE)]
+            self.planes.append((table, members))
+        for i, pattern in enumerate(self.patterns):
+            table, members = self.planes[(i // GROUPS_PER_PLANE) % planes]
+            g = i % GROUPS_PER_PLANE
+            offset = pattern.window()
+            members[g][1].append((pattern, offset))
+            for j in range(FILTER_WIDTH):
+                position = offset + j
+                values = pattern.accept[position] if position < len(pattern) else None
+                bit = 1 << (j * GROUPS_PER_PLANE + g)
+                for value in (range(256) if values is None else values):
+                    table[value] |= bit
+        self.planes = [(bytes(table), members) for table, members in self.planes]
+        self._mask = None
+
+    def _group_mask(self, length):
+        """每个字节低 GROUPS_PER_PLANE 位为 1 的整数"""
+        if self._mask is None or self._mask[0] < length:
+            size = max(length, CHUNK_SIZE + self.overlap)
+            self._mask = (size, int.from_bytes(bytes([(1 << GROUPS_PER_PLANE) - 1]) * size, 'little'))
+        return self._mask[1]
+
+    def _candidates(self, chunk):
+        """产生 (位置, 可能匹配的 [(模式, 窗口偏移)])"""
+        mask = self._group_mask(len(chunk))
+        shift = 8 + GROUPS_PER_PLANE
+        for table, members in self.planes:
+            x = int.from_bytes(chunk.translate(table), 'little')
+            y = x & mask
+            for j in range(1, FILTER_WIDTH):
+                y &= x >> (shift * j)
+            if not y:
+                continue
+            hits = y.to_bytes(len(chunk), 'little')
+            # 候选字节的值就是命中的组位组合，按值分别查找
+            for bits in range(1, 1 << GROUPS_PER_PLANE):
+                groups = [group for g, group in members if bits >> g & 1]
+                value = bytes([bits])
+                position = hits.find(value)
+                while position >= 0:
+                    for group in groups:
+                        yield position, group
+                    position = hits.find(value, position + 1)
+
+    def _search_chunk(self, chunk, carry, final):
+        """在一块中搜索，返回 [(块内偏移, 模式)]，已在上一块中找到的匹配（完全落在重叠部分内）不重复返回"""
+        found = []
+        for position, group in self._candidates(chunk):
+            for pattern, offset in group:
+                start = position - offset
+                if start >= 0 and start + max(len(pattern), FILTER_WIDTH) > carry and \
+                        pattern.regex.match(chunk, start):
+                    found.append((start, pattern))
+        if final:
+            # 过滤窗口超出数据末尾的短模式在最后几个位置直接确认
+            for pattern in self.patterns:
+                if len(pattern) < FILTER_WIDTH:
+                    for start in range(max(0, len(chunk) - FILTER_WIDTH + 1), len(chunk)):
+                        if start + FILTER_WIDTH > carry and pattern.regex.match(chunk, start):
+                            found.append((start, pattern))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def search(self, data, base_address=0, cancelled=None, progress=None):
+        """在 data（bytes/memoryview/SparseImage）中搜索，按地址顺序产生 (地址, 模式)
+
+        SparseImage 使用自身的基地址。cancelled() 返回 True 时停止；progress(已处理字节数) 每块调用一次。
+        """
+        if isinstance(data, SparseImage):
+            base_address = data.base_address
+        done = 0
+        for run_address, views in _iter_runs(data, base_address):
+            carry = b''
+            address = run_address
+            pieces = [(view, i) for view in views for i in range(0, len(view), CHUNK_SIZE)]
+            for index, (view, i) in enumerate(pieces):
+                if cancelled and cancelled():
+                    return
+                chunk = carry + bytes(view[i:i + CHUNK_SIZE])
+                chunk_address = address - len(carry)
+                for offset, pattern in self._search_chunk(chunk, len(carry), index == len(pieces) - 1):
+                    yield chunk_address + offset, pattern
+                address += len(chunk) - len(carry)
+                done += len(chunk) - len(carry)
+                carry = chunk[-self.overlap:] if self.overlap else b''
+                if progress:
+                    progress(done)
+
+
+def searchable_size(data):
+    """参与搜索的字节数（SparseImage 不含填充区域），用于计算进度"""
+    return data.data_size if isinstance(data, SparseImage) else len(data)
@@ -0,0 +1,201 @@
+"""镜像头与扇区 CRC 表
+
+合并时可以在指定地址写入镜像头和一个区域（通常是 APP）按 Flash 扇区计算的 CRC32 表。
+bootloader 启动时先校验镜像头，再逐扇区比对 CRC：升级后只需校验内容变化的扇区，不必每次对整个区域计算 CRC。
+
+格式（小端，地址须按 4 字节对齐）:
+    偏移  大小
+    0     4    魔数 "BMCT"
+    4     2    格式版本 (1)
+    6     2    镜像头长度 (44)
+    8     4    镜像版本号（用户指定）
+    12    4    镜像头所在地址
+    16    4    覆盖范围的起始地址（区域起始地址）
+    20    4    覆盖长度（区域数据按扇区大小向上取整，不超过区域结束地址）
+    24    4    整个覆盖范围的 CRC32
+    28    4    扇区大小
+    32    4    扇区数（最后一个扇区可以不满）
+    36    4    CRC 表的 CRC32
+    40    4    镜像头前 40 字节的 CRC32
+    44    4×N  各扇区的 CRC32
+CRC32 与界面显示的相同（zlib CRC-32，初值和结果异或 0xFFFFFFFF）。
+镜像头和 CRC 表只能写在填充区域（或上次写入的表所在位置），不能与覆盖范围或其他数据重叠。
+
+各扇区的切片和 CRC 计算都通过 map 交给 C 代码循环，不按扇区执行 Python 代码。
+"""
+import re
+import zlib
+import struct
+
+from . import trace
+from .errors import LayoutError, MergeError
+from .image import SparseImage
+
+MAGIC = b'BMCT'
+FORMAT_VERSION = 1
+# 镜像头中除自身 CRC 以外的字段
+_FIELDS = struct.Struct('<4sHHIIIIIIII')
+_CRC = struct.Struct('<I')
+HEADER_SIZE = _FIELDS.size + _CRC.size
+
+
+class SectorTableError(MergeError):
+    """镜像头或扇区 CRC 表损坏"""
+
+
+def sector_crcs(data, sector_size):
+    """data 按 sector_size 分扇区的 CRC32 列表，最后一个扇区可以不满"""
+    view = memoryview(data).cast('B')
+    starts = range(0, len(view), sector_size)
+    stops = range(sector_size, len(view) + sector_size, sector_size)
+    return list(map(zlib.crc32, map(view.__getitem__, map(slice, starts, stops))))
+
+
+def _read(data, address, length, base_address):
+    """读取镜像中 [address, address + length)，超出镜像范围时返回 None"""
+    if isinstance(data, SparseImage):
+        base_address = data.base_address
+    offset = address - base_address
+    if offset < 0 or offset + length > len(data):
+        return None
+    if isinstance(data, SparseImage):
+        return data.read(address, length)
+    return memoryview(data).cast('B')[offset:offset + length]
+
+
+def build_table(data, start, length, sector_size, version, address, base_address=0):
+    """计算 [start, start + length) 的扇区 CRC 表，返回镜像头加 CRC 表（bytes）"""
+    covered = _read(data, start, length, base_address)
+    if covered is None:
+        raise LayoutError(f"扇区 CRC 表的覆盖范围 0x{start:08X}-0x{start + length:08X} 超出镜像范围")
+    with trace.span('checksum', length, algorithms='sector-crc32'):
+        crcs = sector_crcs(covered, sector_size)
+        table = struct.pack(f'<{len(crcs)}I', *crcs)
+        fields = _FIELDS.pack(MAGIC, FORMAT_VERSION, HEADER_SIZE, version, address, start, length,
+                              zlib.crc32(covered), sector_size, len(crcs), zlib.crc32(table))
+    return fields + _CRC.pack(zlib.crc32(fields)) + table
+
+
+def parse_header(header):
+    """解析镜像头（HEADER_SIZE 字节），返回字段字典；魔数、版本或镜像头 CRC 不正确时抛出 SectorTableError"""
+    header = bytes(header)
+    if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+        raise SectorTableError("没有找到镜像头")
+    (magic, format_version, header_size, version, address, start, length, image_crc32, sector_size, sector_count,
+     table_crc32) = _FIELDS.unpack_from(header)
+    (header_crc32,) = _CRC.unpack_from(header, _FIELDS.size)
+    if header_crc32 != zlib.crc32(header[:_FIELDS.size]):
+        raise SectorTableError("镜像头 CRC 不正确")
+    if format_version != FORMAT_VERSION or header_size != HEADER_SIZE:
+        raise SectorTableError(f"不支持的镜像头格式: 版本 {format_version}，长度 {header_size}")
+    if sector_size <= 0 or sector_count != -(-length // sector_size):
+        raise SectorTableError("镜像头的扇区数与覆盖长度不一致")
+    return {
+        'version': version,
+        'address': address,
+        'start': start,
+        'length': length,
+        'image_crc32': image_crc32,
+        'sector_size': sector_size,
+        'sector_count': sector_count,
+        'table_crc32': table_crc32,
+        'size': HEADER_SIZE + 4 * sector_count,
+    }
+
+
+def read_table(data, address, base_address=0):
+    """读取 address 处的镜像头和 CRC 表，返回字段字典（'crcs' 为各扇区的 CRC32 列表）"""
+    header = _read(data, address, HEADER_SIZE, base_address)
+    if header is None:
+        raise SectorTableError(f"镜像头地址 0x{address:08X} 超出镜像范围")
+    info = parse_header(header)
+    if info['address'] != address:
+        raise SectorTableError(f"镜像头记录的地址 0x{info['address']:08X} 与所在地址 0x{address:08X} 不一致")
+    table = _read(data, address + HEADER_SIZE, 4 * info['sector_count'], base_address)
+    if table is None:
+        raise SectorTableError("CRC 表超出镜像范围")
+    if zlib.crc32(table) != info['table_crc32']:
+        raise SectorTableError("CRC 表的 CRC 不正确")
+    info['crcs'] = list(struct.unpack(f'<{info["sector_count"]}I', table))
+    return info
+
+
+def find_table(data, address=None, base_address=None):
+    """在镜像中查找镜像头，返回 (字段字典, 基地址)
+
+    SparseImage 使用自身的基地址；BIN 数据未指定 base_address 时按镜像头中记录的自身地址推算。
+    address 不为 None 时只接受位于该地址的镜像头。
+    """
+    magic = re.compile(re.escape(MAGIC))
+    candidates = []
+    if isinstance(data, SparseImage):
+        for segment_address, segment in data.segments():
+            candidates += [(segment_address + match.start(), data.base_address) for match in magic.finditer(segment)]
+    else:
+        view = memoryview(data).cast('B')
+        for match in magic.finditer(view):
+            offset = match.start()
+            base = base_address
+            if base is None:
+                try:
+                    base = parse_header(view[offset:offset + HEADER_SIZE])['address'] - offset
+                except SectorTableError:
+                    continue
+            candidates.append((base + offset, base))
+
+    error = SectorTableError("镜像中没有找到有效的镜像头")
+    for candidate, base in candidates:
+        if address is not None and candidate != address:
+            continue
+        try:
+            return read_table(data, candidate, base), base
+        except SectorTableError as e:
+            error = e
+    raise error
+
+
+def table_size(data, address, base_address=0):
+    """address 处已有的镜像头和 CRC 表的字节数，没有有效的镜像头时返回 0"""
+    header = _read(data, address, HEADER_SIZE, base_address)
+    try:
+        return parse_header(header)['size'] if header is not None else 0
+    except SectorTableError:
+        return 0
+
+
+def embed(image, config, start, length):
+    """计算 [start, start + length) 的扇区 CRC 表，写入合并镜像（SparseImage）中 config.address 处，返回字段字典
+
+    目标位置已有上次写入的表时先恢复为填充值；目标位置有其他数据或与覆盖范围重叠时抛出 LayoutError。
+    """
+    address = config.address
+    end = address + HEADER_SIZE + 4 * -(-length // config.sector_size)
+    if address < start + length and end > start:
+        raise LayoutError(f"扇区 CRC 表 0x{address:08X}-0x{end:08X} 与覆盖范围 "
+                          f"0x{start:08X}-0x{start + length:08X} 重叠")
+    if address < image.base_address or end > image.end_address:
+        raise LayoutError(f"扇区 CRC 表 0x{address:08X}-0x{end:08X} 超出镜像范围 "
+                          f"0x{image.base_address:08X}-0x{image.end_address:08X}")
+    old_size = table_size(image, address)
+    if old_size:
+        image.erase(address, old_size)
+    if bytes(image.read(address, end - address)).count(image.fill) != end - address:
+        raise LayoutError(f"扇区 CRC 表 0x{address:08X}-0x{end:08X} 与已有数据重叠")
+    table = build_table(image, start, length, config.sector_size, config.version, address)
+    image.write(address, table)
+    info = parse_header(table)
+    info['crcs'] = list(struct.unpack(f'<{info["sector_count"]}I', table[HEADER_SIZE:]))
+    return info
+
+
+def verify(data, address=None, base_address=None):
+    """按镜像中的镜像头和 CRC 表重新校验，返回 (字段字典, 不一致的扇区序号列表, 整个覆盖范围的 CRC 是否一致)"""
+    info, base_address = find_table(data, address, base_address)
+    covered = _read(data, info['start'], info['length'], base_address)
+    if covered is None:
+        raise SectorTableError(f"覆盖范围 0x{info['start']:08X}-0x{info['start'] + info['length']:08X} 超出镜像范围")
+    with trace.span('checksum', info['length'], algorithms='sector-crc32'):
+        actual = sector_crcs(covered, info['sector_size'])
+        image_ok = zlib.crc32(covered) == info['image_crc32']
+    bad = [] if actual == info['crcs'] else [i for i, (a, b) in enumerate(zip(actual, info['crcs'])) if a != b]
+    return info, bad, image_ok
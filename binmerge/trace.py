@@ -0,0 +1,237 @@
+"""阶段计时与跟踪导出
+
+在加载、校验、合并、向量表修复、绘制、压缩和保存等阶段外包一层 span:
+
+    with trace.span('merge') as s:
+        ...
+        s.add_bytes(len(data))
+
+跟踪关闭时 span() 返回共享的空对象，只多一次全局变量判断，不计时、不分配；
+开启后（trace.enable()）每个 span 记录开始时间、耗时、处理的字节数、线程和结束时进程的峰值内存（RSS）。
+结果可以汇总为一行文字（summary），也可以导出为 Chrome 跟踪格式的 JSON（chrome://tracing 或 Perfetto 打开）。
+嵌套的阶段（例如合并中的向量表修复）在汇总时各自计算，外层的耗时包含内层。
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+# 阶段名称和显示名称，汇总按此顺序排列
+STAGE_LABELS = {
+    'load': "加载",
+    'checksum': "校验",
+    'merge': "合并",
+    'vector_fix': "向量表",
+    'render': "绘制",
+    'compress': "压缩",
+    'save': "保存",
+    'cache': "缓存",
+}
+
+
+def peak_rss():
+    """进程的峰值内存（字节），无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _windows_peak_rss():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except (ImportError, AttributeError, OSError):
+        return None
+
+
+def format_size(nbytes):
+    if nbytes < 1024 * 1024:
+        return f"{nbytes / 1024:.1f} KB"
+    return f"{nbytes / 1024 / 1024:.1f} MB"
+
+
+class TraceEvent:
+    """一个已结束的阶段"""
+    __slots__ = ('name', 'start', 'duration', 'nbytes', 'thread', 'peak_rss', 'args')
+
+    def __init__(self, name, start, duration, nbytes, thread, peak_rss, args):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.nbytes = nbytes
+        self.thread = thread
+        self.peak_rss = peak_rss
+        self.args = args
+
+
+class Span:
+    """计时中的阶段，退出 with 块时记录到 Tracer"""
+    __slots__ = ('tracer', 'name', 'nbytes', 'args', 'start')
+
+    def __init__(self, tracer, name, nbytes, args):
+        self.tracer = tracer
+        self.name = name
+        self.nbytes = nbytes
+        self.args = args
+        self.start = None
+
+    def add_bytes(self, n):
+        self.nbytes += n
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.tracer.add(TraceEvent(self.name, self.start, duration, self.nbytes, threading.get_ident(),
+                                   peak_rss(), self.args))
+        return False
+
+
+class _NullSpan:
+    """跟踪关闭时使用的空阶段"""
+    __slots__ = ()
+
+    def add_bytes(self, n):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """收集阶段记录，可被多个线程同时写入"""
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self._events = []
+        self._lock = threading.Lock()
+
+    def add(self, event):
+        with self._lock:
+            self._events.append(event)
+
+    def mark(self):
+        """当前记录数，之后可用 events(mark) 只取此后的记录"""
+        with self._lock:
+            return len(self._events)
+
+    def events(self, since=0):
+        with self._lock:
+            return self._events[since:]
+
+    def clear(self):
+        with self._lock:
+            self._events = []
+
+    def totals(self, since=0):
+        """按阶段汇总，返回 {阶段: (次数, 总耗时, 总字节数)}，按 STAGE_LABELS 的顺序排列"""
+        totals = {}
+        for event in self.events(since):
+            count, seconds, nbytes = totals.get(event.name, (0, 0.0, 0))
+            totals[event.name] = (count + 1, seconds + event.duration, nbytes + event.nbytes)
+        order = list(STAGE_LABELS)
+        return dict(sorted(totals.items(), key=lambda item: (order.index(item[0]) if item[0] in order else len(order),
+                                                            item[0])))
+
+    def summary(self, since=0):
+        """汇总为一行文字，例如 "加载 12.3 ms (16.0 MB) | 合并 0.2 ms | 峰值内存 80.5 MB"，没有记录时为空字符串"""
+        events = self.events(since)
+        if not events:
+            return ""
+        parts = []
+        for name, (count, seconds, nbytes) in self.totals(since).items():
+            text = f"{STAGE_LABELS.get(name, name)} {seconds * 1000:.1f} ms"
+            if count > 1:
+                text += f" ×{count}"
+            if nbytes:
+                text += f" ({format_size(nbytes)})"
+            parts.append(text)
+        peaks = [event.peak_rss for event in events if event.peak_rss is not None]
+        if peaks:
+            parts.append(f"峰值内存 {format_size(max(peaks))}")
+        return " | ".join(parts)
+
+    def to_chrome(self):
+        """Chrome 跟踪格式（完整事件 "X"，时间单位为微秒）"""
+        pid = os.getpid()
+        trace_events = []
+        for event in self.events():
+            args = dict(event.args)
+            args['bytes'] = event.nbytes
+            if event.peak_rss is not None:
+                args['peak_rss'] = event.peak_rss
+            trace_events.append({
+                'name': event.name,
+                'cat': 'binmerge',
+                'ph': 'X',
+                'ts': round((event.start - self.origin) * 1e6, 3),
+                'dur': round(event.duration * 1e6, 3),
+                'pid': pid,
+                'tid': event.thread,
+                'args': args,
+            })
+        totals = {name: {'count': count, 'seconds': round(seconds, 6), 'bytes': nbytes}
+                  for name, (count, seconds, nbytes) in self.totals().items()}
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms', 'otherData': {'totals': totals}}
+
+    def export(self, path):
+        """导出为 Chrome 跟踪 JSON 文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome(), f, ensure_ascii=False)
+
+
+_tracer = None
+
+
+def enable():
+    """开启跟踪，返回 Tracer（已开启时返回现有的）"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def disable():
+    """关闭跟踪，返回之前的 Tracer（未开启时为 None）"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def current():
+    """当前的 Tracer，未开启时为 None"""
+    return _tracer
+
+
+def span(name, nbytes=0, **args):
+    """阶段计时的上下文管理器，args 会写入导出的跟踪事件"""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, nbytes, args)
@@ -0,0 +1,244 @@
+"""Cortex-M 中断向量表分析与重定位
+
+向量表位于镜像开头：第 0 项为初始堆栈指针，之后是复位及各系统异常的处理程序，第 16 项起为外部中断。
+整张表用一次 struct.unpack_from 解码，按内核型号（PROFILES）给出每一项的名称，并检查:
+  - 初始堆栈指针是否 4 字节对齐且位于 SRAM 地址范围；
+  - 处理程序地址是否设置了 Thumb 位（最低位为 1）、是否落在 APP 区域内；
+  - 保留项是否为 0。
+外部中断的数量未指定时自动判断：从第 16 项开始，遇到既不是 0、也不是有效处理程序的字即认为向量表结束。
+
+APP 按其他地址链接（例如按 0x08000000 链接后放到 0x08020000）时，所有处理程序都偏离同一个差值，
+relocate 把链接地址范围内的处理程序整体平移到 APP 区域。
+分析结果按内容摘要缓存（analyze_cached），同一镜像重复打开向量表时不再解码。
+"""
+import struct
+from collections import OrderedDict
+
+# Cortex-M 地址空间中的 SRAM 区域，初始堆栈指针应在此范围内（栈顶可以等于结束地址）
+SRAM_RANGE = (0x20000000, 0x40000000)
+
+# 系统异常名称：序号 -> 名称，未列出的 1-15 项为保留项
+_ARMV6M = {0: "Initial SP", 1: "Reset", 2: "NMI", 3: "HardFault", 11: "SVCall", 14: "PendSV", 15: "SysTick"}
+_ARMV7M = {**_ARMV6M, 4: "MemManage", 5: "BusFault", 6: "UsageFault", 12: "DebugMonitor"}
+_ARMV8M_MAIN = {**_ARMV7M, 7: "SecureFault"}
+
+SYSTEM_VECTORS = 16
+
+
+class CoreProfile:
+    """内核型号：系统异常表和外部中断的最大数量"""
+    def __init__(self, label, system, max_irqs):
+        self.label = label
+        self.system = system
+        self.max_irqs = max_irqs
+
+    def vector_name(self, index):
+        if index >= SYSTEM_VECTORS:
+            return f"IRQ{index - SYSTEM_VECTORS}"
+        return self.system.get(index)
+
+    def __repr__(self):
+        return f"CoreProfile({self.label!r})"
+
+
+PROFILES = {
+    'cortex-m0': CoreProfile("Cortex-M0/M0+", _ARMV6M, 32),
+    'cortex-m3': CoreProfile("Cortex-M3", _ARMV7M, 240),
+    'cortex-m4': CoreProfile("Cortex-M4", _ARMV7M, 240),
+    'cortex-m7': CoreProfile("Cortex-M7", _ARMV7M, 240),
+    'cortex-m23': CoreProfile("Cortex-M23", _ARMV6M, 240),
+    'cortex-m33': CoreProfile("Cortex-M33", _ARMV8M_MAIN, 480),
+}
+DEFAULT_PROFILE = 'cortex-m4'
+
+# 表项状态
+OK = 'ok'
+UNUSED = 'unused'
+RESERVED = 'reserved'
+BAD_SP = 'bad_sp'
+NO_THUMB = 'no_thumb'
+OUT_OF_REGION = 'out_of_region'
+RESERVED_NONZERO = 'reserved_nonzero'
+STATUS_LABELS = {
+    OK: "正常",
+    UNUSED: "未使用",
+    RESERVED: "保留",
+    BAD_SP: "堆栈指针无效",
+    NO_THUMB: "缺少Thumb位",
+    OUT_OF_REGION: "超出APP区域",
+    RESERVED_NONZERO: "保留项非0",
+}
+# 需要提示的状态
+PROBLEMS = (BAD_SP, NO_THUMB, OUT_OF_REGION, RESERVED_NONZERO)
+
+
+class VectorEntry:
+    """向量表中的一项"""
+    def __init__(self, index, name, value, status):
+        self.index = index
+        self.name = name
+        self.value = value
+        self.status = status
+
+    @property
+    def offset(self):
+        return self.index * 4
+
+    @property
+    def handler(self):
+        """处理程序地址（去掉 Thumb 位）"""
+        return self.value & ~1
+
+    def __repr__(self):
+        return f"VectorEntry({self.index}, {self.name!r}, 0x{self.value:08X}, {self.status!r})"
+
+
+class VectorTable:
+    """向量表分析结果"""
+    def __init__(self, profile, region_start, region_end, entries):
+        self.profile = profile
+        self.region_start = region_start
+        self.region_end = region_end
+        self.entries = entries
+
+    @property
+    def initial_sp(self):
+        return self.entries[0].value if self.entries else None
+
+    @property
+    def reset_vector(self):
+        return self.entries[1].value if len(self.entries) > 1 else None
+
+    @property
+    def irq_count(self):
+        return max(0, len(self.entries) - SYSTEM_VECTORS)
+
+    def problems(self):
+        return [entry for entry in self.entries if entry.status in PROBLEMS]
+
+    @property
+    def valid(self):
+        return len(self.entries) > 1 and not self.problems()
+
+    def summary(self):
+        if len(self.entries) < 2:
+            return "数据不足，无法解析向量表"
+        text = (f"{self.profile.label}，{len(self.entries)} 项（{self.irq_count} 个外部中断），"
+                f"初始SP: 0x{self.initial_sp:08X}，复位向量: 0x{self.reset_vector:08X}")
+        problems = self.problems()
+        if problems:
+            text += f"，{len(problems)} 项有问题"
+        return text
+
+    def guess_link_address(self):
+        """根据复位向量推测 APP 的链接地址，复位向量在 APP 区域内时为 None"""
+        if self.reset_vector is None:
+            return None
+        return _guess_link_address(self.reset_vector, self.region_start, self.region_end)
+
+    def relocated_values(self, link_address):
+        """把链接地址范围内的处理程序平移到 APP 区域，返回新的表项值列表（初始SP 和范围外的项不变）"""
+        delta = self.region_start - link_address
+        link_end = link_address + (self.region_end - self.region_start)
+        values = []
+        for entry in self.entries:
+            value = entry.value
+            if entry.index > 0 and value and link_address <= entry.handler < link_end:
+                value += delta
+            values.append(value)
+        return values
+
+
+def _guess_link_address(reset, region_start, region_end):
+    """复位向量不在 APP 区域时，取它按区域大小（向上取 2 的幂）对齐后的地址作为链接地址"""
+    if reset == 0 or region_start <= reset < region_end:
+        return None
+    align = 1 << max(0, (region_end - region_start - 1).bit_length())
+    return reset & ~(align - 1)
+
+
+def _handler_status(value, region_start, region_end):
+    if value == 0:
+        return UNUSED
+    if not value & 1:
+        return NO_THUMB
+    if not region_start <= value & ~1 < region_end:
+        return OUT_OF_REGION
+    return OK
+
+
+def analyze(data, region_start, region_end=None, profile=DEFAULT_PROFILE, irq_count=None,
+            sp_range=SRAM_RANGE, link_address=None):
+    """解析位于 data 开头的向量表，返回 VectorTable
+
+    region_start/region_end 为 APP 区域（处理程序应落在其中，region_end 默认为 region_start + len(data)）。
+    irq_count 为外部中断数量，None 时自动判断；链接地址范围内（link_address 为 None 时由复位向量推测）的处理程序
+    仍标记为超出区域，但判断长度时视为向量表的一部分。
+    """
+    if isinstance(profile, str):
+        profile = PROFILES[profile]
+    if region_end is None:
+        region_end = region_start + len(data)
+    max_irqs = profile.max_irqs if irq_count is None else min(irq_count, profile.max_irqs)
+    count = min(len(data) // 4, SYSTEM_VECTORS + max_irqs)
+    values = struct.unpack_from(f'<{count}I', bytes(data[:count * 4]))
+
+    # 按其他地址链接的 APP，处理程序都在链接地址范围内，判断向量表长度时也视为有效
+    if link_address is None and len(values) > 1:
+        link_address = _guess_link_address(values[1], region_start, region_end)
+    link_end = None if link_address is None else link_address + (region_end - region_start)
+
+    entries = []
+    for index, value in enumerate(values):
+        name = profile.vector_name(index)
+        if index == 0:
+            status = OK if value % 4 == 0 and sp_range[0] < value <= sp_range[1] else BAD_SP
+        elif name is None:
+            status = RESERVED if value == 0 else RESERVED_NONZERO
+            name = "保留"
+        else:
+            status = _handler_status(value, region_start, region_end)
+            relocatable = status == OUT_OF_REGION and link_end is not None and link_address <= value & ~1 < link_end
+            if index >= SYSTEM_VECTORS and irq_count is None and status not in (OK, UNUSED) and not relocatable:
+                # 自动判断长度：第一个无效的外部中断项之后不再属于向量表
+                break
+        entries.append(VectorEntry(index, name, value, status))
+    if irq_count is None:
+        # 向量表之后的 0 填充不计入外部中断
+        while len(entries) > SYSTEM_VECTORS and entries[-1].status == UNUSED:
+            entries.pop()
+    return VectorTable(profile, region_start, region_end, entries)
+
+
+def relocate(image, table, link_address):
+    """把镜像中的向量表按 link_address 重定位（原地写入 image），返回新的复位向量
+
+    image 需支持 write(address, data)（SparseImage），向量表位于 table.region_start。
+    """
+    values = table.relocated_values(link_address)
+    image.write(table.region_start, struct.pack(f'<{len(values)}I', *values))
+    return values[1] if len(values) > 1 else None
+
+
+# 分析结果缓存: {(内容摘要, 数据长度, 基地址, 参数): VectorTable}
+# 按内容而不是对象缓存，不保存数据引用：大文件的数据映射着输入文件，重新加载后旧映射应当立即释放
+CACHE_SIZE = 8
+_cache = OrderedDict()
+
+
+def analyze_cached(data, digest, region_start, region_end=None, profile=DEFAULT_PROFILE, irq_count=None,
+                   sp_range=SRAM_RANGE, link_address=None):
+    """与 analyze 相同，内容摘要（例如 SHA256）和参数相同的结果直接从缓存返回；digest 为 None 时不使用缓存"""
+    if digest is None:
+        return analyze(data, region_start, region_end, profile, irq_count, sp_range, link_address)
+    base_address = getattr(data, 'base_address', None)
+    key = (digest, len(data), base_address, region_start, region_end, profile, irq_count, sp_range, link_address)
+    table = _cache.get(key)
+    if table is not None:
+        _cache.move_to_end(key)
+        return table
+    table = analyze(data, region_start, region_end, profile, irq_count, sp_range, link_address)
+    _cache[key] = table
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return table
@@ -0,0 +1,198 @@
+"""监视模式：输入文件变化后增量重新合并
+
+IncrementalMerge 保存合并结果，某个输入变化时只把该区域恢复为填充值、写入新数据并重新修复该区域的向量表，
+其他区域保持不变（区域互不重叠，结果与完整合并逐字节一致）。布局带扇区 CRC 表时同时重新写入镜像头和 CRC 表。
+
+CRC32 按区段（各区域以及区域之间的空隙）分别计算，再用 crc32_combine 组合成整个镜像的 CRC32；
+输入变化后只重新计算该区域的区段。MD5、SHA256 等摘要无法组合，需要时对整个镜像重新计算。
+
+InputWatcher 轮询输入文件的大小和修改时间（只调用 os.stat，不读取内容），
+变化后连续两次检查都不再变化才报告，避免读到编译器尚未写完的文件。
+"""
+import os
+import time
+import zlib
+
+from . import sectorcrc, trace
+from .core import (check_input, fix_region_vectors, load_input, merge_layout, save_file, write_input,
+                   write_sector_table)
+from .hexwriter import DEFAULT_RECORD_LENGTH
+
+# CRC-32 多项式（反转形式）
+_CRC32_POLY = 0xEDB88320
+# _zero_operators[k] 为在 CRC 之后追加 2^k 个 0 字节的 GF(2) 矩阵
+_zero_operators = []
+
+DEFAULT_INTERVAL = 0.1
+
+
+def _gf2_times(matrix, vector):
+    result = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return result
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+def _zero_operator(k):
+    if not _zero_operators:
+        # 追加 1 个 0 比特的矩阵，平方三次得到 1 个 0 字节
+        matrix = [_CRC32_POLY] + [1 << n for n in range(31)]
+        for _ in range(3):
+            matrix = _gf2_square(matrix)
+        _zero_operators.append(matrix)
+    while len(_zero_operators) <= k:
+        _zero_operators.append(_gf2_square(_zero_operators[-1]))
+    return _zero_operators[k]
+
+
+def crc32_combine(crc1, crc2, length2):
+    """已知 crc32(A) 和 crc32(B)，返回 crc32(A + B)，length2 为 B 的长度（与 zlib 的 crc32_combine 相同）"""
+    k = 0
+    while length2:
+        if length2 & 1:
+            crc1 = _gf2_times(_zero_operator(k), crc1)
+        length2 >>= 1
+        k += 1
+    return crc1 ^ crc2
+
+
+class IncrementalMerge:
+    """可按区域增量更新的合并结果
+
+    inputs 为 {区域名: 数据}；result 为已有的合并结果（须由相同的布局和输入得到），为 None 时重新合并。
+    """
+    def __init__(self, layout, inputs, fix_vector=True, result=None):
+        self.layout = layout
+        self.inputs = dict(inputs)
+        self.fix_vector = fix_vector
+        self.result = result or merge_layout(layout, self.inputs, fix_vector)
+        # 区段 [(起始, 结束)] 和各区段的 CRC32（None 表示需要重新计算）
+        bounds = {layout.start, layout.end}
+        for region in layout:
+            bounds.update((region.start, region.end))
+        bounds = sorted(bounds)
+        self.spans = list(zip(bounds, bounds[1:]))
+        self._span_crcs = [None] * len(self.spans)
+
+    @property
+    def data(self):
+        return self.result.data
+
+    def update(self, name, data):
+        """用新数据替换区域 name 的输入，原地更新合并镜像，返回变化的地址范围 (起始, 结束)
+
+        数据不能放入区域时抛出 LayoutError，合并镜像保持不变。
+        """
+        with trace.span('merge', len(data), region=name, incremental=True):
+            region = check_input(self.layout, name, data)
+            merged = self.result.data
+            table = self.layout.sector_table
+            # 重新写入的扇区 CRC 表可能比原来的短，原来的范围也要重新计算 CRC
+            table_end = table.address + sectorcrc.table_size(merged, table.address) if table else None
+            merged.erase(region.start, region.size)
+            write_input(merged, region, data)
+            self.inputs[name] = data
+
+            reset_vectors = self.result.reset_vectors
+            reset_vectors.pop(name, None)
+            if self.fix_vector and region.vector_table:
+                reset_vector = fix_region_vectors(merged, region, data)
+                if reset_vector is not None:
+                    reset_vectors[name] = reset_vector
+            if table is not None:
+                table_end = max(table_end, table.address + write_sector_table(merged, self.layout, self.inputs)['size'])
+
+        for i, (start, end) in enumerate(self.spans):
+            if (start < region.end and end > region.start) or (table and start < table_end and end > table.address):
+                self._span_crcs[i] = None
+        # 内容已变化，缓存的键和校验和都不再适用
+        self.result.cache_key = None
+        self.result.checksums = {}
+        self.result.cached = False
+        return region.start, region.end
+
+    def crc32(self):
+        """整个镜像的 CRC32，只重新计算变化过的区段"""
+        merged = self.result.data
+        crc = 0
+        with trace.span('checksum', algorithms='crc32', incremental=True) as span:
+            for i, (start, end) in enumerate(self.spans):
+                span_crc = self._span_crcs[i]
+                if span_crc is None:
+                    span_crc = 0
+                    for chunk in merged.slice(start, end - start).iter_chunks():
+                        span_crc = zlib.crc32(chunk, span_crc)
+                    self._span_crcs[i] = span_crc
+                    span.add_bytes(end - start)
+                crc = crc32_combine(crc, span_crc, end - start)
+        return crc
+
+    def save(self, path, algorithms=('crc32',), fmt=None, record_length=DEFAULT_RECORD_LENGTH):
+        """保存合并结果，返回 {算法: 结果}；CRC32 增量计算，其他算法在写入时计算"""
+        others = tuple(name for name in algorithms if name != 'crc32')
+        sums = save_file(path, self.result.data, others, fmt, self.result.base_address, record_length)
+        if 'crc32' in algorithms:
+            sums['crc32'] = self.crc32()
+        sums = {name: sums[name] for name in algorithms}
+        self.result.checksums = dict(sums)
+        return sums
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class InputWatcher:
+    """轮询输入文件 {区域名: 路径} 的变化"""
+    def __init__(self, paths, interval=DEFAULT_INTERVAL):
+        self.paths = dict(paths)
+        self.interval = interval
+        self._states = {name: _file_state(path) for name, path in self.paths.items()}
+        # 已发现变化、等待稳定的区域
+        self._pending = set()
+
+    def poll(self):
+        """检查一次，返回已变化且写入完成的区域名列表"""
+        changed = []
+        for name, path in self.paths.items():
+            state = _file_state(path)
+            if state != self._states[name]:
+                self._states[name] = state
+                self._pending.add(name)
+            elif name in self._pending and state is not None:
+                self._pending.discard(name)
+                changed.append(name)
+        return changed
+
+    def wait(self):
+        """阻塞直到有输入变化，返回变化的区域名列表"""
+        while True:
+            changed = self.poll()
+            if changed:
+                return changed
+            time.sleep(self.interval)
+
+
+def reload_changed(merger, names, paths):
+    """重新加载变化的输入并增量更新合并结果，返回 [(区域名, 起始, 结束)]
+
+    输入读入内存而不是映射文件：合并结果引用输入数据，文件之后还会被改写或截断。
+    """
+    updated = []
+    for name in names:
+        start, end = merger.update(name, load_input(paths[name], use_mmap=False))
+        updated.append((name, start, end))
+    return updated
+
@@ -0,0 +1,71 @@
+"""流式写入合并镜像
+
+数据（包括稀疏镜像中的填充空隙）按大块顺序写入临时文件，写入的同时更新校验和（默认 CRC32、MD5 和 SHA-256），
+全部写完并刷到磁盘后再重命名为目标文件。整个过程只遍历数据一次，内存占用与镜像大小无关。
+"""
+import os
+from contextlib import contextmanager
+
+from .checksum import ChecksumSet
+from .image import iter_chunks
+
+# 每次写入的块大小
+BLOCK_SIZE = 1024 * 1024
+
+# 保存时默认计算的校验和
+SAVE_ALGORITHMS = ('crc32', 'md5', 'sha256')
+
+# 进程的 umask。os.umask 只能在设置的同时读取，而 umask 是整个进程共享的，
+# 所以只在导入时（core 在启动时导入本模块，还没有工作线程）读取一次，之后不再修改
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _target_mode(path):
+    """新文件的权限：覆盖已有文件时沿用其权限，否则按 umask 计算（mkstemp 默认只有 0600）"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+@contextmanager
+def atomic_write(path, block_size=BLOCK_SIZE):
+    """以二进制方式写入 path 的临时文件，退出时刷盘并重命名为 path；出错时删除临时文件，目标文件保持不变"""
+    # tempfile 会连带导入 random、shutil 等模块，只在写入时导入，缩短 GUI 启动时间
+    import tempfile
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb', buffering=block_size) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _target_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_image(path, data, block_size=BLOCK_SIZE, algorithms=SAVE_ALGORITHMS, progress=None):
+    """把 data（bytes/bytearray/memoryview/SparseImage）原子写入 path
+
+    返回 {算法: 结果}，例如 {'crc32': int, 'md5': str, 'sha256': str}。
+    写入失败时目标文件保持不变，临时文件会被删除。
+    progress(已写入字节数, 总字节数) 每写一块调用一次。
+    """
+    checksums = ChecksumSet(algorithms)
+    total = len(data)
+    done = 0
+    with atomic_write(path, block_size) as f:
+        for chunk in iter_chunks(data, block_size):
+            f.write(chunk)
+            checksums.update(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    return checksums.results()
@@ -0,0 +1,37 @@
+"""批量合并测试"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from binmerge import batch, checksum, core
+
+
+class RunBatchTest(unittest.TestCase):
+    def setUp(self):
+        # 作业通过 checksum.default_cache() 加载输入，改用临时目录中的缓存，不写入用户的缓存目录
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = checksum.ChecksumCache(os.path.join(directory.name, 'checksums.json'))
+        patcher = mock.patch.object(checksum, '_default_cache', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unexpected_error_only_fails_its_job(self):
+        layout = core.two_region_layout(0x08000000, 0x1000, 0x08001000, 0x1000)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'app.bin')
+            with open(path, 'wb') as f:
+                f.write(b'\x00' * 0x100)
+            jobs = [batch.Job('bad', layout, {core.APP_REGION: path}, os.path.join(directory, 'bad.out'),
+                              fmt='unknown', use_cache=False),
+                    batch.Job('good', layout, {core.APP_REGION: path}, os.path.join(directory, 'good.bin'),
+                              use_cache=False)]
+            results = batch.run_batch(jobs, workers=1)
+            self.assertTrue(os.path.exists(os.path.join(directory, 'good.bin')))
+        self.assertEqual([result['status'] for result in results], ['error', 'ok'])
+        self.assertIn('KeyError', results[0]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""校验和缓存测试"""
+import json
+import os
+import tempfile
+import unittest
+
+from binmerge import checksum
+
+KEY = ('/data/app.bin', 1024, 123456789)
+
+
+class ChecksumCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'checksums.json')
+
+    def cache_with(self, entries):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': checksum.ChecksumCache.VERSION, 'entries': entries}, f)
+        return checksum.ChecksumCache(self.path)
+
+    def test_hit(self):
+        cache = checksum.ChecksumCache(self.path)
+        cache.put(KEY, {'crc32': 0x1234, 'md5': 'abcd'})
+        self.assertEqual(checksum.ChecksumCache(self.path).get(KEY, ('crc32',)), {'crc32': 0x1234})
+
+    def test_malformed_entries_are_misses(self):
+        malformed = [
+            {'mtime_ns': KEY[2], 'checksums': {'crc32': 1}},
+            {'size': KEY[1], 'checksums': {'crc32': 1}},
+            {'size': KEY[1], 'mtime_ns': KEY[2]},
+            {'size': KEY[1], 'mtime_ns': KEY[2], 'checksums': [1]},
+            {'size': KEY[1], 'mtime_ns': KEY[2], 'checksums': {'crc32': None}},
+            {'size': str(KEY[1]), 'mtime_ns': KEY[2], 'checksums': {'crc32': 1}},
+            'entry',
+        ]
+        for entry in malformed:
+            cache = self.cache_with({KEY[0]: entry})
+            self.assertIsNone(cache.get(KEY, ('crc32',)), entry)
+            # 格式错误的条目被新结果替换
+            cache.put(KEY, {'crc32': 2})
+            self.assertEqual(cache.get(KEY, ('crc32',)), {'crc32': 2})
+
+    def test_malformed_entry_table(self):
+        self.assertIsNone(self.cache_with([KEY[0]]).get(KEY, ('crc32',)))
+
+
+if __name__ == '__main__':
+    unittest.main()
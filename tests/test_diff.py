@@ -0,0 +1,44 @@
+"""镜像比较测试"""
+import os
+import tempfile
+import unittest
+
+from binmerge import core, diff
+
+BASE = 0x08000000
+
+
+def sample_image():
+    """两段数据之间和末尾都是填充值的 BIN 数据"""
+    data = bytearray(b'\xFF' * 0x30000)
+    data[:0x1000] = bytes(range(256)) * 16
+    data[0x20000:0x20400] = b'\x5A' * 0x400
+    return bytes(data)
+
+
+class CompareTest(unittest.TestCase):
+    def test_bin_identical_to_hex_round_trip(self):
+        data = sample_image()
+        with tempfile.TemporaryDirectory() as directory:
+            bin_path = os.path.join(directory, 'merged.bin')
+            hex_path = os.path.join(directory, 'merged.hex')
+            core.save_file(bin_path, data)
+            core.save_file(hex_path, data, base_address=BASE)
+            a = core.load_input(bin_path)
+            b = core.load_input(hex_path)
+            result = diff.compare(a, b, BASE, BASE)
+        self.assertLess(b.end_address, BASE + len(data))
+        self.assertTrue(result.identical, diff.format_report(result))
+
+    def test_reports_data_outside_common_range(self):
+        a = sample_image()
+        b = a[:0x10000]
+        result = diff.compare(a, b, BASE, BASE)
+        self.assertEqual([(r.address, r.length, r.kind) for r in result.ranges],
+                         [(BASE + 0x20000, 0x400, diff.ONLY_A)])
+        result = diff.compare(b, a, BASE, BASE)
+        self.assertEqual([r.kind for r in result.ranges], [diff.ONLY_B])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+"""布局测试"""
+import unittest
+
+from binmerge.errors import LayoutError
+from binmerge.layout import Layout, Region
+
+REGIONS = [{'name': 'BOOT', 'start': '0x08000000', 'size': '0x4000'}]
+
+
+class FillTest(unittest.TestCase):
+    def test_accepts_byte_values(self):
+        self.assertEqual(Layout.from_dict({'fill': '0xFF', 'regions': REGIONS}).fill, 0xFF)
+        self.assertEqual(Layout.from_dict({'fill': 0, 'regions': REGIONS}).fill, 0)
+        self.assertEqual(Layout.from_dict({'regions': REGIONS}).fill, 0xFF)
+
+    def test_rejects_out_of_range(self):
+        for fill in (256, -1, '0x100', 'FF', None):
+            with self.assertRaises(LayoutError, msg=fill):
+                Layout.from_dict({'fill': fill, 'regions': REGIONS})
+
+    def test_validate_rejects_out_of_range(self):
+        with self.assertRaises(LayoutError):
+            Layout([Region('BOOT', 0x08000000, 0x4000)], fill=0x1FF).validate()
+
+
+if __name__ == '__main__':
+    unittest.main()
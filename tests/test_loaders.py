@@ -0,0 +1,51 @@
+"""输入文件加载测试"""
+import os
+import struct
+import tempfile
+import unittest
+
+from binmerge import loaders
+from binmerge.loaders import FormatError
+
+
+def elf_without_load_segments():
+    """只有 ELF 头、没有程序头的 32 位小端 ELF 文件"""
+    header = b'\x7fELF\x01\x01\x01' + b'\x00' * 9
+    header += struct.pack('<HHIIIIIHHHHHH', 2, 40, 1, 0, 52, 0, 0, 52, 32, 0, 40, 0, 0)
+    return header
+
+
+class EmptyFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_ihex_without_data_records(self):
+        path = self.write('empty.hex', b':020000040800F2\n:00000001FF\n')
+        with self.assertRaisesRegex(FormatError, '没有数据'):
+            loaders.load_ihex(path)
+
+    def test_srec_without_data_records(self):
+        path = self.write('empty.srec', b'S00600004844521B\nS9030000FC\n')
+        with self.assertRaisesRegex(FormatError, '没有数据'):
+            loaders.load_srec(path)
+
+    def test_elf_without_load_segments(self):
+        path = self.write('empty.elf', elf_without_load_segments())
+        with self.assertRaisesRegex(FormatError, '没有可加载'):
+            loaders.load_elf(path)
+
+    def test_ihex_with_data(self):
+        path = self.write('data.hex', b':020000040800F2\n:0400000001020304F2\n:00000001FF\n')
+        image = loaders.load_ihex(path)
+        self.assertEqual((image.base_address, bytes(image.read(0x08000000, 4))), (0x08000000, b'\x01\x02\x03\x04'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+"""合并结果缓存测试"""
+import unittest
+from unittest import mock
+
+from binmerge import core, mergecache
+
+
+class MergeKeyTest(unittest.TestCase):
+    def test_key_depends_on_merge_format(self):
+        layout = core.two_region_layout(0x08000000, 0x1000, 0x08001000, 0x1000)
+        inputs = {core.APP_REGION: b'\x00' * 0x100}
+        digests = {core.APP_REGION: '00' * 32}
+        key = mergecache.merge_key(layout, inputs, digests)
+        self.assertEqual(mergecache.merge_key(layout, inputs, digests), key)
+        with mock.patch.object(mergecache, 'MERGE_FORMAT', core.MERGE_FORMAT + 1):
+            self.assertNotEqual(mergecache.merge_key(layout, inputs, digests), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+"""区域占用扫描测试"""
+import gc
+import unittest
+import weakref
+
+from binmerge import occupancy
+
+
+class Buffer(bytearray):
+    """可以建立弱引用的 bytearray"""
+
+
+class ScanCachedTest(unittest.TestCase):
+    def test_cache_does_not_keep_data(self):
+        data = Buffer(b'\x00' * 0x1000 + b'\xFF' * 0x1000)
+        page_map = occupancy.scan_cached(data, 'digest-a', 0x08000000, 0x4000)
+        ref = weakref.ref(data)
+        del data
+        gc.collect()
+        self.assertIsNone(ref())
+
+        # 内容摘要相同的另一份数据命中缓存
+        same = bytearray(b'\x00' * 0x1000 + b'\xFF' * 0x1000)
+        self.assertIs(occupancy.cached(same, 'digest-a', 0x08000000, 0x4000), page_map)
+        self.assertIsNone(occupancy.cached(same, 'digest-b', 0x08000000, 0x4000))
+        self.assertIsNone(occupancy.cached(same, None, 0x08000000, 0x4000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""向量表重定位测试"""
+import gc
+import struct
+import unittest
+import weakref
+
+from binmerge import core, vectors
+
+APP_START = 0x08080000
+APP_SIZE = 0x60000
+LINK_ADDRESS = 0x08020000
+
+
+def app_image(irq_handlers):
+    """按 LINK_ADDRESS 链接的 APP：系统异常指向链接地址开头，外部中断为 irq_handlers"""
+    system = [0x20010000, LINK_ADDRESS + 0x101] + [LINK_ADDRESS + 0x201] * 14
+    values = system + irq_handlers
+    return struct.pack(f'<{len(values)}I', *values) + b'\x00' * 0x100
+
+
+class LinkAddressRelocationTest(unittest.TestCase):
+    def test_relocates_handlers_beyond_guessed_range(self):
+        # 按区域大小推测的链接地址为 0x08000000，推测范围到 0x08060000 为止，0x08070001 不在其中
+        irqs = [LINK_ADDRESS + 0x301, 0x08070001, LINK_ADDRESS + 0x401]
+        layout = core.two_region_layout(0x08000000, 0x4000, APP_START, APP_SIZE, app_link_address=LINK_ADDRESS)
+        result = core.merge_layout(layout, {core.APP_REGION: app_image(irqs)})
+
+        table = result.data.read(APP_START, 4 * 19)
+        values = struct.unpack('<19I', bytes(table))
+        delta = APP_START - LINK_ADDRESS
+        self.assertEqual(values[1], LINK_ADDRESS + 0x101 + delta)
+        self.assertEqual(list(values[16:]), [value + delta for value in irqs])
+        self.assertEqual(result.reset_vectors[core.APP_REGION], LINK_ADDRESS + 0x101 + delta)
+
+
+class Buffer(bytearray):
+    """可以建立弱引用的 bytearray"""
+
+
+class AnalyzeCachedTest(unittest.TestCase):
+    def test_cache_does_not_keep_data(self):
+        data = Buffer(app_image([LINK_ADDRESS + 0x301]))
+        table = vectors.analyze_cached(data, 'digest-a', APP_START, APP_START + APP_SIZE)
+        ref = weakref.ref(data)
+        del data
+        gc.collect()
+        self.assertIsNone(ref())
+
+        same = bytearray(app_image([LINK_ADDRESS + 0x301]))
+        self.assertIs(vectors.analyze_cached(same, 'digest-a', APP_START, APP_START + APP_SIZE), table)
+        self.assertIsNot(vectors.analyze_cached(same, None, APP_START, APP_START + APP_SIZE), table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+"""监视模式测试"""
+import os
+import tempfile
+import unittest
+
+from binmerge import core, watch
+
+
+class ReloadChangedTest(unittest.TestCase):
+    def test_large_input_is_not_mapped(self):
+        size = core.MMAP_THRESHOLD + 0x1000
+        layout = core.two_region_layout(0x08000000, 0x4000, 0x08004000, 2 * size)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'app.bin')
+            with open(path, 'wb') as f:
+                f.write(b'\x00' * size)
+            self.assertTrue(core.is_mapped(core.load_input(path)))
+
+            merger = watch.IncrementalMerge(layout, {core.APP_REGION: b''}, fix_vector=False)
+            watch.reload_changed(merger, [core.APP_REGION], {core.APP_REGION: path})
+            self.assertFalse(core.is_mapped(merger.inputs[core.APP_REGION]))
+            self.assertFalse(any(core.is_mapped(segment) for _, segment in merger.data.segments()))
+
+            # 文件被截断后合并结果仍可读取
+            with open(path, 'wb') as f:
+                f.write(b'\x01')
+            self.assertEqual(bytes(merger.data.read(0x08004000 + size - 16, 16)), b'\x00' * 16)
+
+
+if __name__ == '__main__':
+    unittest.main()